@@ -0,0 +1,10 @@
+from .permissions import get_access
+
+
+def user_access(request):
+    """
+    Expose the cached role/permissions of the current user to templates as
+    `access` (e.g. {% if access.is_admin %}), so templates need not load
+    request.user.profile.
+    """
+    return {'access': get_access(request)}
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:44
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# The normalization of accounts/search.py as it stood when these keys were added
+def normalize_phone(phone):
+    if not phone or not phone.is_valid():
+        return None
+    return phone.as_e164
+
+
+def normalize_email(email):
+    return email.strip().lower() if email else None
+
+
+def normalize_name(*parts):
+    text = ' '.join(part for part in parts if part)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'[^\w]+', ' ', text.lower()).strip()
+
+
+def fill_lookup_keys(apps, schema_editor):
+    Customer = apps.get_model('accounts', 'Customer')
+    batch = []
+    for customer in Customer.objects.iterator(chunk_size=1000):
+        customer.phone_e164 = normalize_phone(customer.phone)
+        customer.email_normalized = normalize_email(customer.email)
+        customer.search_name = normalize_name(customer.first_name, customer.last_name)
+        customer.search_name_reversed = normalize_name(customer.last_name, customer.first_name)
+        batch.append(customer)
+        if len(batch) == 1000:
+            Customer.objects.bulk_update(batch, [
+                'phone_e164', 'email_normalized', 'search_name', 'search_name_reversed'
+            ])
+            batch = []
+    if batch:
+        Customer.objects.bulk_update(batch, [
+            'phone_e164', 'email_normalized', 'search_name', 'search_name_reversed'
+        ])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_profile_telephone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='email_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_e164',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_name_reversed',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.RunPython(fill_lookup_keys, migrations.RunPython.noop),
+    ]
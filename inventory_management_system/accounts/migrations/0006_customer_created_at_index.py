@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customer_lookup_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_at'], name='accounts_cu_created_242e5c_idx'),
+        ),
+    ]
@@ -16,6 +16,7 @@ from imagekit.processors import ResizeToFill
 # ResizeToFill(150,150): forces profile pictures to always be exactly 150×150
 
 from phonenumber_field.modelfields import PhoneNumberField
+from .search import normalize_email, normalize_name, normalize_phone
 import uuid
 # Python’s built-in module to generate unique random IDs
 
@@ -244,6 +245,12 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Normalized lookup keys, filled in save() (see accounts/search.py)
+    phone_e164 = models.CharField(max_length=16, blank=True, null=True, db_index=True, editable=False)
+    email_normalized = models.CharField(max_length=254, blank=True, null=True, db_index=True, editable=False)
+    search_name = models.CharField(max_length=201, blank=True, default='', db_index=True, editable=False)
+    search_name_reversed = models.CharField(max_length=201, blank=True, default='', db_index=True, editable=False)
+
     class Meta:
         ordering = ['last_name', 'first_name']
         verbose_name = _('Customer')
@@ -254,6 +261,9 @@ class Customer(models.Model):
                 name='unique_customer'
             )
         ]
+        indexes = [
+            models.Index(fields=['created_at']),  # Cursor pages of the customer list
+        ]
 
         # constraints: The constraints list is used to define custom database-level constraints. 
         # In this case, it ensures that the combination of first_name, last_name, and email 
@@ -291,3 +301,15 @@ class Customer(models.Model):
         # Ensure that either an email or phone number is provided
         if not self.email and not self.phone:
             raise ValidationError(_('Customer must have either an email or phone number.'))
+
+    def save(self, *args, **kwargs):
+        self.phone_e164 = normalize_phone(self.phone)
+        self.email_normalized = normalize_email(self.email)
+        self.search_name = normalize_name(self.first_name, self.last_name)
+        self.search_name_reversed = normalize_name(self.last_name, self.first_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                'phone_e164', 'email_normalized', 'search_name', 'search_name_reversed'
+            }
+        super().save(*args, **kwargs)
@@ -0,0 +1,134 @@
+"""
+Module: permissions.py
+
+One place to answer "may this user do that?".
+
+The role (Profile.role) and Django permissions of a user are resolved once,
+kept in the cache for USER_ACCESS_CACHE_TIMEOUT seconds and memoized on the
+request, so update/delete views and templates stop querying the profile on
+every check. The signals in accounts/signals.py drop a user's entry when
+their profile or account changes, and drop every entry when group or
+permission assignments change.
+
+Classes:
+- UserAccess: The resolved role and permissions of one user.
+- AdminRequiredMixin: Lets superusers, admins, holders of an optional
+  permission and (opt-in) staff through; replaces the per-view test_func
+  copies.
+
+Functions:
+- resolve_access: Returns the UserAccess of a user (cached).
+- get_access: Returns the UserAccess of the request's user (memoized).
+- forget_access: Drops the cached access of one user.
+- forget_all_access: Drops the cached access of every user.
+"""
+
+from django.conf import settings
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.core.cache import cache
+
+from .models import Profile
+
+
+VERSION_KEY = 'user-access-version'
+
+
+class UserAccess:
+    """The role and permissions of one user, as plain picklable data."""
+
+    def __init__(self, user_id=None, is_superuser=False, is_staff=False, is_active=False, role=None, permissions=()):
+        self.user_id = user_id
+        self.is_superuser = is_superuser
+        self.is_staff = is_staff
+        self.is_active = is_active
+        self.role = role
+        self.permissions = frozenset(permissions)
+
+    def __repr__(self):
+        return f"<UserAccess user={self.user_id} role={self.role} superuser={self.is_superuser}>"
+
+    @property
+    def is_admin(self):
+        """Superusers and profiles with the Admin role."""
+        return self.is_active and (self.is_superuser or self.role == Profile.Role.ADMIN)
+
+    @property
+    def is_executive(self):
+        return self.is_active and self.role == Profile.Role.EXECUTIVE
+
+    @property
+    def role_display(self):
+        if self.role:
+            return Profile.Role(self.role).label
+        return ''
+
+    def has_perm(self, perm):
+        """Same answer as user.has_perm(perm) for the model backend."""
+        return self.is_active and (self.is_superuser or perm in self.permissions)
+
+
+ANONYMOUS = UserAccess()
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def _key(user_id):
+    return f'user-access:{_version()}:{user_id}'
+
+
+def resolve_access(user):
+    """Return the UserAccess of `user`, from the cache when possible."""
+    if not user.is_authenticated:
+        return ANONYMOUS
+
+    key = _key(user.pk)
+    access = cache.get(key)
+    if access is None:
+        access = UserAccess(
+            user_id=user.pk,
+            is_superuser=user.is_superuser,
+            is_staff=user.is_staff,
+            is_active=user.is_active,
+            role=Profile.objects.filter(user_id=user.pk).values_list('role', flat=True).first(),
+            permissions=user.get_all_permissions(),
+        )
+        cache.set(key, access, settings.USER_ACCESS_CACHE_TIMEOUT)
+    return access
+
+
+def get_access(request):
+    """Return the UserAccess of the request's user, resolved once per request."""
+    access = getattr(request, '_user_access', None)
+    if access is None:
+        access = request._user_access = resolve_access(request.user)
+    return access
+
+
+def forget_access(user_id):
+    cache.delete(_key(user_id))
+
+
+def forget_all_access():
+    """Invalidate every cached entry by moving to a new key version."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+class AdminRequiredMixin(UserPassesTestMixin):
+    """
+    Allow superusers and admins, plus users holding `permission_required`
+    when a view sets it (e.g. 'store.change_item'), and staff users when it
+    sets `allow_staff`.
+    """
+    permission_required = None
+    allow_staff = False
+
+    def test_func(self):
+        access = get_access(self.request)
+        if access.is_admin or (self.allow_staff and access.is_active and access.is_staff):
+            return True
+        return bool(self.permission_required) and access.has_perm(self.permission_required)
@@ -0,0 +1,141 @@
+"""
+Module: search.py
+
+Customer lookup on normalized, indexed columns.
+
+Customer.save fills the lookup keys: phone_e164, email_normalized and
+search_name / search_name_reversed ("first last" and "last first"). A
+cashier's term is matched against them exactly or as a prefix, which the
+column indexes can answer. Only when that finds nobody does the lookup fall
+back to the old substring scan over names, email and phone.
+
+Functions:
+- normalize_phone: E.164 form of a stored phone number.
+- normalize_email: Lowercased email address.
+- normalize_name: Accent-free, lowercased name with single spaces.
+- phone_prefixes: E.164 prefixes a typed (possibly partial) phone may start.
+- lookup_customers: Filters a Customer queryset by a search term.
+"""
+
+import re
+import unicodedata
+
+import phonenumbers
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+
+NON_DIGIT_RE = re.compile(r'\D')
+NON_WORD_RE = re.compile(r'[^\w]+')
+
+# Shortest digit run treated as a phone number rather than part of a name
+MIN_PHONE_DIGITS = 3
+
+
+def normalize_phone(phone):
+    """Return the E.164 form of a PhoneNumber (or None if blank or invalid)."""
+    if not phone or not phone.is_valid():
+        return None
+    return phone.as_e164
+
+
+def normalize_email(email):
+    return email.strip().lower() if email else None
+
+
+def normalize_name(*parts):
+    text = ' '.join(part for part in parts if part)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def phone_prefixes(term):
+    """
+    Return the E.164 prefixes a phone number typed as `term` may start with,
+    or [] if the term is not a phone number.
+
+    "+251 91", "0025191" and "091" (national trunk prefix, in the default
+    region) all become "+25191". Bare digits may be either national or
+    international, so both readings are returned.
+    """
+    term = term.strip()
+    if re.search(r'[^\d\s()+.\-]', term):
+        return []
+    digits = NON_DIGIT_RE.sub('', term)
+    if len(digits) < MIN_PHONE_DIGITS:
+        return []
+
+    if term.startswith('+'):
+        return ['+' + digits]
+    if digits.startswith('00'):
+        return ['+' + digits[2:]]
+
+    country_code = phonenumbers.country_code_for_region(settings.PHONENUMBER_DEFAULT_REGION)
+    if digits.startswith('0'):
+        return [f'+{country_code}{digits[1:]}']
+    return [f'+{country_code}{digits}', '+' + digits]
+
+
+def _prefix(field, value):
+    """
+    A prefix match that the column's index can serve.
+
+    SQLite only uses an index for LIKE on NOCASE columns, so there the
+    prefix becomes a range; PostgreSQL serves startswith from the
+    pattern_ops index Django adds for indexed CharFields.
+    """
+    if connection.vendor == 'sqlite':
+        return Q(**{f'{field}__gte': value, f'{field}__lt': value + '\U0010ffff'})
+    return Q(**{f'{field}__startswith': value})
+
+
+def _fast_filter(term):
+    phones = phone_prefixes(term)
+    if phones:
+        query = Q()
+        for prefix in phones:
+            query |= _prefix('phone_e164', prefix)
+        return query
+
+    if '@' in term:
+        return _prefix('email_normalized', normalize_email(term))
+
+    name = normalize_name(term)
+    if not name:
+        return None
+    return (
+        _prefix('search_name', name) |
+        _prefix('search_name_reversed', name) |
+        _prefix('email_normalized', normalize_email(term))
+    )
+
+
+def _slow_filter(term):
+    query = (
+        Q(first_name__icontains=term) |
+        Q(last_name__icontains=term) |
+        Q(email__icontains=term)
+    )
+    digits = NON_DIGIT_RE.sub('', term)
+    if len(digits) >= MIN_PHONE_DIGITS:
+        query |= Q(phone_e164__contains=digits.lstrip('0'))
+    return query
+
+
+def lookup_customers(queryset, term):
+    """
+    Restrict a Customer queryset to customers matching `term`.
+
+    Phone numbers, emails and names are first matched exactly or by prefix
+    on the indexed lookup columns; the substring scan runs only when that
+    finds nobody.
+    """
+    term = term.strip()
+    fast = _fast_filter(term)
+    if fast is not None:
+        matches = queryset.filter(fast)
+        if matches.exists():
+            return matches
+    return queryset.filter(_slow_filter(term))
@@ -1,9 +1,13 @@
 import logging
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from django.core.exceptions import ObjectDoesNotExist
 
+from .permissions import forget_access, forget_all_access
+
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
@@ -35,4 +39,38 @@ def sync_user_profile(sender, instance, created, **kwargs):
             profile.email = instance.email
             profile.save(update_fields=['email'])
     except ObjectDoesNotExist:
-        pass
\ No newline at end of file
+        pass
+
+
+@receiver(post_save, sender='accounts.Profile')
+@receiver(post_delete, sender='accounts.Profile')
+def forget_profile_access(sender, instance, **kwargs):
+    """Drop the cached role/permissions of a user whose profile changed"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: forget_access(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_access(sender, instance, **kwargs):
+    """Drop the cached access of a user whose account (e.g. is_superuser) changed"""
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_access(user_id))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def forget_granted_access(sender, instance, action, reverse, **kwargs):
+    """
+    Drop cached access when permissions or group memberships change.
+    Changes made from the group/permission side can touch many users,
+    so they drop every cached entry.
+    """
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User) and not reverse:
+        user_id = instance.pk
+        transaction.on_commit(lambda: forget_access(user_id))
+    else:
+        transaction.on_commit(forget_all_access)
@@ -6,7 +6,7 @@ from django.urls import reverse_lazy
 
 # Authentication and permissions
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.mixins import LoginRequiredMixin
 
 # Returns the custom User model you define (if any)
 from django.contrib.auth import get_user_model
@@ -37,6 +37,10 @@ from .forms import (
 )
 
 from .tables import ProfileTable
+from .search import lookup_customers
+from .permissions import AdminRequiredMixin, get_access, resolve_access
+from store.conditional import condition_on_versions
+from store.pagination import CursorPaginationMixin
 
 # Enables complex queries with OR/AND conditions
 from django.db.models import Q
@@ -70,35 +74,25 @@ class LogoutView(AuthLogoutView):
 #######################################################
 
 ##########################################################
-class ProfileCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+class ProfileCreateView(LoginRequiredMixin, AdminRequiredMixin, CreateView):
     # This tells Django the model being created is the User model, not just the Profile.
     model = get_user_model()  # Now creating User, not Profile
     form_class = ProfileForm
     template_name = 'accounts/profile_create.html'
     success_url = reverse_lazy('accounts:profile-list')
-    
-    def test_func(self):
-        # Only allow superusers or admins to update profiles
-        user = self.request.user
-        return self.request.user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         response = super().form_valid(form)
         messages.success(self.request, "Profile created successfully")
         return response
     
 
-class ProfileUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class ProfileUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
     model = get_user_model()
     form_class = ProfileUpdateForm
     template_name = 'accounts/profile_update.html'
     success_url = reverse_lazy('accounts:profile-list')
-    
-    def test_func(self):
-        # Only allow superusers or admins to update profiles
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         response = super().form_valid(form)
         messages.success(self.request, "Profile updated successfully")
@@ -135,7 +129,7 @@ class ProfileListView(LoginRequiredMixin, ExportMixin, SingleTableView):
         return {'per_page': self.paginate_by}
         
 
-class ProfileDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class ProfileDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     model = Profile
     template_name = 'accounts/profile_confirm_delete.html'
     success_url = reverse_lazy('accounts:profile-list')
@@ -148,24 +142,24 @@ class ProfileDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         3. Not trying to delete another admin (unless superuser)
         """
         profile_to_delete = self.get_object()
-        user = self.request.user
-        
+        access = get_access(self.request)
+
         # Prevent self-deletion
-        if user == profile_to_delete.user:
+        if access.user_id == profile_to_delete.user_id:
             return False
-        
+
         # Superusers can delete anyone (except themselves)
-        if user.is_superuser:
+        if access.is_superuser and access.is_active:
             return True
-        
+
         # Admins can only delete non-admin, non-superuser profiles
-        if hasattr(user, 'profile') and user.profile.role == 'AD':
-            target_user = profile_to_delete.user
-            return not (target_user.is_superuser or 
-                      (hasattr(target_user, 'profile') and target_user.profile.role == 'AD'))
-        
+        if access.is_admin:
+            # Judged on role alone: an inactive admin is still an admin
+            target = resolve_access(profile_to_delete.user)
+            return not (target.is_superuser or target.role == Profile.Role.ADMIN)
+
         return False
-    
+
     def form_valid(self, form):
         """
         Handle successful form submission (deletion)
@@ -193,17 +187,12 @@ class CustomerCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class CustomerUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class CustomerUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
     model = Customer
     form_class = CustomerUpdateForm
     template_name = 'accounts/customer_form.html'
     success_url = reverse_lazy('accounts:customer_list')
-    
-    def test_func(self):
-        """Only allow superusers and admins to update customers"""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         """Handle successful form submission"""
         response = super().form_valid(form)
@@ -222,16 +211,11 @@ class CustomerUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 
-class CustomerDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class CustomerDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     model = Customer
     template_name = 'accounts/customer_confirm_delete.html'
     success_url = reverse_lazy('accounts:customer_list')
-    
-    def test_func(self):
-        """Only allow superusers and admins to delete customers"""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         """Handle successful deletion"""
         customer = self.get_object()
@@ -251,7 +235,7 @@ class CustomerDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return context
 
 
-class CustomerListView(LoginRequiredMixin, ListView):
+class CustomerListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Customer
     template_name = 'accounts/customer_list.html'
     context_object_name = 'customers'
@@ -261,16 +245,13 @@ class CustomerListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         queryset = super().get_queryset()
         if search := self.request.GET.get('search'):
-            return queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search)
-            )
+            return lookup_customers(queryset, search)
         return queryset
     
 
 @require_http_methods(["GET", "POST"])
 @login_required
+@condition_on_versions('accounts.Customer')
 def get_customers(request):
     term = request.GET.get('term') or request.POST.get('term', '')
     # It prioritizes GET if term is passed as a query parameter.
@@ -278,19 +259,15 @@ def get_customers(request):
     if not term:
         return JsonResponse({'results': []})
 
-    customers = Customer.objects.filter(
-        Q(first_name__icontains=term) |
-        Q(last_name__icontains=term) |
-        Q(email__icontains=term))[:20]
-    # Uses Q objects to allow OR conditions in the filter:
-    # first_name contains term
-    # OR last_name contains term
-    # OR email contains term
+    customers = lookup_customers(Customer.objects.all(), term)[:20]
+    # Matches phone, email and name on the indexed lookup columns first
+    # (exact or prefix), and only scans with icontains when nothing matches
     
     results = [{
         'id': c.id,
         'text': c.get_full_name(),
         'email': c.email,
+        'phone': str(c.phone) if c.phone else '',
         'loyalty_points': c.loyalty_points,
         'is_premium': c.is_premium,
     } for c in customers]
@@ -320,17 +297,12 @@ class VendorCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class VendorUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class VendorUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
     model = Vendor
     form_class = VendorUpdateForm
     template_name = 'accounts/vendor_form.html'
     success_url = reverse_lazy('accounts:vendor-list')
-    
-    def test_func(self):
-        """Only allow superusers and admins to update vendors"""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         """Handle successful form submission"""
         response = super().form_valid(form)
@@ -348,16 +320,11 @@ class VendorUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 
-class VendorDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class VendorDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     model = Vendor
     template_name = 'accounts/vendor_confirm_delete.html'
     success_url = reverse_lazy('accounts:vendor-list')
-    
-    def test_func(self):
-        """Only allow superusers and admins to delete vendors"""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def delete(self, request, *args, **kwargs):
         """Handle successful deletion"""
         vendor = self.get_object()
@@ -1,6 +1,6 @@
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, UpdateView, DeleteView
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 
 from django_tables2 import SingleTableView
@@ -9,6 +9,8 @@ from django_tables2.export.views import ExportMixin
 from .models import Bill     
 from .tables import BillTable
 from accounts.models import Profile
+from accounts.permissions import AdminRequiredMixin
+from store.conditional import ConditionalGetMixin
 
 
 # Created BillBaseView for common settings
@@ -43,14 +45,9 @@ class BillCreateView(BillFormMixin, BillBaseView, CreateView):
     """Create new bills."""
     
 
-class BillUpdateView(BillFormMixin, BillBaseView, UserPassesTestMixin, UpdateView):
+class BillUpdateView(BillFormMixin, BillBaseView, AdminRequiredMixin, UpdateView):
     """Update existing bills."""
-    
-    def test_func(self):
-        """Restrict to superusers and admins."""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         """Handle successful form submission."""
         response = super().form_valid(form)
@@ -69,15 +66,10 @@ class BillUpdateView(BillFormMixin, BillBaseView, UserPassesTestMixin, UpdateVie
         return context
 
 
-class BillDeleteView(BillBaseView, UserPassesTestMixin, DeleteView):
+class BillDeleteView(BillBaseView, AdminRequiredMixin, DeleteView):
     """Delete bills (superusers and admins only)."""
     template_name = 'bills/bill_confirm_delete.html'
-    
-    def test_func(self):
-        """Restrict to superusers and admins."""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def delete(self, request, *args, **kwargs):
         """Handle successful deletion."""
         bill = self.get_object()
@@ -96,10 +88,11 @@ class BillDeleteView(BillBaseView, UserPassesTestMixin, DeleteView):
         return context
     
 
-class BillListView(ExportMixin, BillBaseView, SingleTableView):
+class BillListView(ExportMixin, BillBaseView, ConditionalGetMixin, SingleTableView):
     """List and export bills with pagination."""
     table_class = BillTable
     template_name = 'bills/bill_list.html'
+    etag_models = ('bills.Bill',)
     context_object_name = 'bills'
     paginate_by = 1
     table_pagination = False
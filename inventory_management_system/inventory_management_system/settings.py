@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -87,6 +88,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.user_access',
             ],
         },
     },
@@ -153,6 +155,105 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# Rendered list-page fragments ({% cache %}) kept per process; beyond this
+# many, the least recently used one is evicted
+FRAGMENT_CACHE_ENTRIES = 1000
+
+# Cache tier (see store/cache.py): a small in-process LRU in front of a cache
+# shared by all workers - Redis when REDIS_URL is set, files otherwise (the
+# test runner swaps in process memory)
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'CACHE_DIR', os.path.join(tempfile.gettempdir(), 'inventory_management_system_cache')
+        ),
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'store.cache.TwoLevelCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            # Longest a change made by another worker can go unseen here
+            'LOCAL_TIMEOUT': 5,
+        },
+    },
+    'shared': SHARED_CACHE,
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES': FRAGMENT_CACHE_ENTRIES,
+            # Cull a single entry (the least recently used) when full
+            'CULL_FREQUENCY': FRAGMENT_CACHE_ENTRIES,
+        },
+    },
+}
+
+
+# Runs the tests against process-memory caches (see inventory_management_system/test_runner.py)
+TEST_RUNNER = 'inventory_management_system.test_runner.TestRunner'
+
+
+# Minutes an open cart on the sale screen holds its stock
+STOCK_RESERVATION_MINUTES = 15
+
+# Shard rows per item when striped stock is enabled for a hot item
+STOCK_SHARD_COUNT = 8
+
+# Seconds between folds of striped stock into Item.quantity by the run_tasks worker
+STOCK_FOLD_INTERVAL = 60
+
+# Items below this quantity are reported by the check_low_stock task
+LOW_STOCK_THRESHOLD = 10
+
+# Seconds before a worker rebuilds its item autocomplete index from the database
+ITEM_AUTOCOMPLETE_TTL = 300
+
+# Trigram similarity (0-1) an item name needs to match a misspelt search term
+ITEM_FUZZY_THRESHOLD = 0.3
+
+# Seconds a barcode scan result (or a miss) stays in the cache
+BARCODE_CACHE_TIMEOUT = 300
+
+# Seconds the sale screen's item catalog stays cached between catalog changes
+ITEM_CATALOG_TIMEOUT = 3600
+
+# Paginated lists longer than this (by running total or planner estimate)
+# show an approximate count instead of running COUNT(*)
+APPROXIMATE_COUNT_THRESHOLD = 5000
+
+# Seconds a dropdown's cached option list stays fresh, and options per page
+# of the remote (type-to-search) dropdowns
+CHOICES_CACHE_TIMEOUT = 600
+CHOICES_PAGE_SIZE = 20
+
+# Seconds the dashboard aggregates and the Excel reports stay fresh in the cache
+DASHBOARD_CACHE_TIMEOUT = 300
+REPORT_CACHE_TIMEOUT = 600
+
+# Rows each dashboard counter is striped over, so concurrent sales do not queue on one row
+DASHBOARD_COUNTER_SHARDS = 8
+
+# Seconds a user's resolved role and permissions stay cached (see accounts/permissions.py)
+USER_ACCESS_CACHE_TIMEOUT = 300
+
+# Global search: threads shared by all requests, and seconds each source may take
+GLOBAL_SEARCH_WORKERS = 8
+GLOBAL_SEARCH_TIMEOUT = 0.5
+# Searches one process runs at once; further ones answer "timed out" at once
+GLOBAL_SEARCH_MAX_CONCURRENT = 4
+
+
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'store:dashboard'
 LOGOUT_REDIRECT_URL = 'accounts:login'
@@ -0,0 +1,34 @@
+"""
+Test runner for the project.
+
+Runs the suite with the shared cache tier (see store/cache.py) held in process
+memory, so tests neither need Redis nor read entries left in the cache
+directory by a running server or an earlier test run.
+
+Classes:
+    - TestRunner: DiscoverRunner that overrides CACHES for the test run
+"""
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner that keeps the shared cache in process memory."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        caches = {
+            **settings.CACHES,
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'shared',
+            },
+        }
+        self._cache_override = override_settings(CACHES=caches)
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,10 +1,13 @@
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import DetailView, CreateView, UpdateView, DeleteView
 from django_tables2 import SingleTableView
 from django_tables2.export.views import ExportMixin
 
+from accounts.permissions import AdminRequiredMixin
+from store.choices import use_cached_choices
+from store.conditional import ConditionalGetMixin
 from .models import Invoice
 from .tables import InvoiceTable
 
@@ -27,6 +30,11 @@ class InvoiceFormMixin:
         'shipping'
     ]
 
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        use_cached_choices(form, 'item', 'store.Item', remote=True)
+        return form
+
 
 class InvoiceCreateView(InvoiceFormMixin, InvoiceBaseView, CreateView):
     """Create new invoices"""
@@ -41,14 +49,9 @@ class InvoiceCreateView(InvoiceFormMixin, InvoiceBaseView, CreateView):
         return response
 
 
-class InvoiceUpdateView(InvoiceFormMixin, InvoiceBaseView, UserPassesTestMixin, UpdateView):
+class InvoiceUpdateView(InvoiceFormMixin, InvoiceBaseView, AdminRequiredMixin, UpdateView):
     """Update existing invoices (superusers and admins only)"""
-    
-    def test_func(self):
-        """Allow superusers and admins to update"""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         response = super().form_valid(form)
         messages.success(
@@ -65,15 +68,10 @@ class InvoiceUpdateView(InvoiceFormMixin, InvoiceBaseView, UserPassesTestMixin,
         return context
 
 
-class InvoiceDeleteView(InvoiceBaseView, UserPassesTestMixin, DeleteView):
+class InvoiceDeleteView(InvoiceBaseView, AdminRequiredMixin, DeleteView):
     """Delete invoices (superusers and admins only)"""
     template_name = 'invoice/invoice_confirm_delete.html'
-    
-    def test_func(self):
-        """Restrict to superusers and admins"""
-        user = self.request.user
-        return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'AD')
-    
+
     def form_valid(self, form):
         """Handle successful deletion"""
         invoice = self.get_object()
@@ -92,10 +90,11 @@ class InvoiceDetailView(InvoiceBaseView, DetailView):
     context_object_name = 'invoice'
 
 
-class InvoiceListView(ExportMixin, InvoiceBaseView, SingleTableView):
+class InvoiceListView(ExportMixin, InvoiceBaseView, ConditionalGetMixin, SingleTableView):
     """List and export invoices with pagination"""
     table_class = InvoiceTable
     template_name = 'invoice/invoice_list.html'
+    etag_models = ('invoice.Invoice', 'store.ItemCatalog')
     context_object_name = 'invoices'
     paginate_by = 25
     table_pagination = False
\ No newline at end of file
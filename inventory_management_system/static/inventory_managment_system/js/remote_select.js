@@ -0,0 +1,100 @@
+/*
+ * Remote-paged <select> for large relations (RemoteSelect in store/choices.py).
+ *
+ * Adds a search box above every select[data-remote-choices]. Typing fetches
+ * the matching options from the choices endpoint one page at a time; picking
+ * the "More results" option appends the next page.
+ */
+(function () {
+    const SEARCH_DELAY = 250;
+
+    function setup(select) {
+        const url = select.dataset.remoteChoices;
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-control mb-1';
+        search.placeholder = 'Type to search...';
+        search.setAttribute('aria-label', 'Search options');
+        select.parentNode.insertBefore(search, select);
+
+        let term = '';
+        let page = 1;
+        let latest = 0;
+        let loaded = false;
+        let timer = null;
+        let previous = select.value;
+
+        function clearOptions() {
+            Array.from(select.options).forEach(function (option) {
+                if (option.value && option.value !== select.value) {
+                    option.remove();
+                }
+            });
+        }
+
+        function load(reset) {
+            const request = ++latest;
+            loaded = true;
+            fetch(`${url}?term=${encodeURIComponent(term)}&page=${page}`, {
+                credentials: 'same-origin',
+                headers: {'X-Requested-With': 'XMLHttpRequest'}
+            })
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    // A newer search has been sent since; drop this answer
+                    if (request !== latest) {
+                        return;
+                    }
+                    if (reset) {
+                        clearOptions();
+                    }
+                    select.querySelectorAll('option[data-more]').forEach(function (option) {
+                        option.remove();
+                    });
+                    data.results.forEach(function (result) {
+                        if (!select.querySelector(`option[value="${result.id}"]`)) {
+                            select.add(new Option(result.text, result.id));
+                        }
+                    });
+                    if (data.more) {
+                        const more = new Option('More results...', '');
+                        more.dataset.more = '1';
+                        select.add(more);
+                    }
+                });
+        }
+
+        search.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                term = search.value;
+                page = 1;
+                load(true);
+            }, SEARCH_DELAY);
+        });
+
+        // First page on first use
+        [search, select].forEach(function (element) {
+            element.addEventListener('focus', function () {
+                if (!loaded) {
+                    load(true);
+                }
+            });
+        });
+
+        select.addEventListener('change', function () {
+            const option = select.options[select.selectedIndex];
+            if (option && option.dataset.more) {
+                select.value = previous;
+                page += 1;
+                load(false);
+                return;
+            }
+            previous = select.value;
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-remote-choices]').forEach(setup);
+    });
+})();
@@ -1,5 +1,7 @@
+from django import forms
 from django.contrib import admin
-from .models import Category, Item, Delivery
+from .models import Category, Item, ItemBarcode, Delivery
+from transactions.services import enable_stock_sharding, disable_stock_sharding, save_item
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -9,6 +11,23 @@ class CategoryAdmin(admin.ModelAdmin):
     ordering = ('name',)  # Default sorting
 
 
+class ItemBarcodeInline(admin.TabularInline):
+    """Barcodes / SKUs edited on the item page"""
+    model = ItemBarcode
+    extra = 1
+
+
+class ItemAdminForm(forms.ModelForm):
+    """Item form of the admin, for the change page and the list rows alike."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Striped stock is kept on shard rows; Item.quantity is only folded from them
+        if 'quantity' in self.fields and self.instance.pk and self.instance.stock_sharded:
+            self.fields['quantity'].disabled = True
+            self.fields['quantity'].help_text = "Managed by striped stock"
+
+
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
     """Admin interface for inventory items"""
@@ -20,10 +39,35 @@ class ItemAdmin(admin.ModelAdmin):
         'vendor',
         'expiring_date'
     )
-    search_fields = ('name', 'category__name', 'vendor__name')  # Search across relations
-    list_filter = ('category', 'vendor', 'expiring_date')  # Sidebar filters
-    list_editable = ('quantity', 'price')  # Edit directly in list view
+    search_fields = ('name', 'category__name', 'vendor__name', 'barcodes__code')  # Search across relations
+    list_filter = ('category', 'vendor', 'expiring_date', 'stock_sharded')  # Sidebar filters
+    list_editable = ('quantity', 'price')  # Edit directly in list view (quantity locked for striped items)
+    form = ItemAdminForm
+    readonly_fields = ('stock_sharded',)  # Toggled by the actions below
     ordering = ('name',)
+    actions = ('enable_striped_stock', 'disable_striped_stock')
+    inlines = (ItemBarcodeInline,)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', ItemAdminForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        # Stock counts go through the ledger as adjustments
+        counted = not change or 'quantity' in form.changed_data
+        save_item(obj, form.cleaned_data['quantity'] if counted else None)
+
+    @admin.action(description="Enable striped stock for hot items")
+    def enable_striped_stock(self, request, queryset):
+        for item_id in queryset.values_list('pk', flat=True):
+            enable_stock_sharding(item_id)
+        self.message_user(request, "Striped stock enabled.")
+
+    @admin.action(description="Disable striped stock")
+    def disable_striped_stock(self, request, queryset):
+        for item_id in queryset.filter(stock_sharded=True).values_list('pk', flat=True):
+            disable_stock_sharding(item_id)
+        self.message_user(request, "Striped stock disabled.")
 
 
 @admin.register(Delivery)
@@ -0,0 +1,242 @@
+"""
+Module: autocomplete.py
+
+Process-local prefix index for item autocomplete on the POS screens.
+
+Every word of an item's name and category is kept in one sorted list of
+(word, item id) pairs, so a keystroke is answered with a bisect instead of a
+database query. The JSON payload of each item is kept alongside, and the
+trigrams of each item name are kept as posting lists for typo-tolerant
+matching (same trigrams and similarity as PostgreSQL's pg_trgm).
+
+The index is built on first use and kept current in this process by the
+signals in store/signals.py. Each worker process has its own copy, so
+changes made through another process show up here once the index is older
+than ITEM_AUTOCOMPLETE_TTL seconds and gets rebuilt.
+
+Classes:
+- PrefixIndex: Prefix and trigram index over item names and categories.
+
+Functions:
+- trigrams: The pg_trgm trigrams of a text.
+- autocomplete_items: Returns the JSON payloads of items matching a term.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Item
+
+
+WORD_RE = re.compile(r'\w+')
+
+# Matches examined before ranking; bounds the work for one-letter terms
+MAX_CANDIDATES = 500
+
+
+def _words(text):
+    return WORD_RE.findall((text or '').lower())
+
+
+def trigrams(text):
+    """
+    Return the set of trigrams of `text` the way pg_trgm builds them: each
+    lowercased word padded with two spaces before and one after.
+    """
+    grams = set()
+    for word in _words(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class PrefixIndex:
+    """
+    Sorted (word, item id) pairs and name trigram posting lists, with the
+    item payloads they point to.
+
+    Readers never lock: the structures are swapped wholesale on rebuild and
+    changed with single list/dict operations on update.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._grams = defaultdict(list)
+        self._entries = {}
+        self._built_at = None
+
+    def _entry(self, item):
+        payload = item.to_json()
+        words = tuple(sorted(set(_words(item.name) + _words(item.category.name))))
+        return {
+            'name': item.name.lower(),
+            'words': words,
+            'gram_count': len(trigrams(item.name)),
+            'payload': payload,
+        }
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def ensure_built(self):
+        """Build the index if it is missing or older than the TTL."""
+        if not self._stale():
+            return
+        with self._lock:
+            # Another thread may have rebuilt it while we waited
+            if self._stale():
+                self._rebuild()
+
+    def rebuild(self):
+        """Reload every item from the database."""
+        with self._lock:
+            self._rebuild()
+
+    def _stale(self):
+        built_at = self._built_at
+        return built_at is None or time.monotonic() - built_at > settings.ITEM_AUTOCOMPLETE_TTL
+
+    def _rebuild(self):
+        keys, grams, entries = [], defaultdict(list), {}
+        items = Item.objects.select_related('category').iterator(chunk_size=2000)
+        for item in items:
+            entry = self._entry(item)
+            entries[item.pk] = entry
+            keys.extend((word, item.pk) for word in entry['words'])
+            for gram in trigrams(item.name):
+                grams[gram].append(item.pk)
+        keys.sort()
+        self._keys, self._grams, self._entries = keys, grams, entries
+        self._built_at = time.monotonic()
+
+    def _drop(self, item_id):
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        for word in entry['words']:
+            position = bisect_left(self._keys, (word, item_id))
+            if position < len(self._keys) and self._keys[position] == (word, item_id):
+                del self._keys[position]
+        for gram in trigrams(entry['name']):
+            postings = self._grams.get(gram)
+            if postings and item_id in postings:
+                postings.remove(item_id)
+
+    def update(self, item):
+        """Add or refresh one item. Does nothing until the index is built."""
+        if not self.is_built:
+            return
+        with self._lock:
+            self._drop(item.pk)
+            entry = self._entry(item)
+            for word in entry['words']:
+                insort(self._keys, (word, item.pk))
+            for gram in trigrams(item.name):
+                self._grams[gram].append(item.pk)
+            self._entries[item.pk] = entry
+
+    def remove(self, item_id):
+        """Remove one item. Does nothing until the index is built."""
+        if not self.is_built:
+            return
+        with self._lock:
+            self._drop(item_id)
+
+    def search(self, term, limit=10):
+        """
+        Return the payloads of up to `limit` items that have, for every word
+        of `term`, a name or category word starting with it. Items whose name
+        starts with the term come first, then by name.
+        """
+        words = _words(term)
+        if not words:
+            return []
+
+        # Scan on the longest word, it narrows the range the most
+        lead = max(words, key=len)
+        rest = [word for word in words if word != lead]
+        keys, entries = self._keys, self._entries
+
+        matches = []
+        seen = set()
+        position = bisect_left(keys, (lead,))
+        while position < len(keys) and len(matches) < MAX_CANDIDATES:
+            word, item_id = keys[position]
+            if not word.startswith(lead):
+                break
+            position += 1
+            entry = entries.get(item_id)
+            if entry is None or item_id in seen:
+                continue
+            seen.add(item_id)
+            if all(any(w.startswith(part) for w in entry['words']) for part in rest):
+                matches.append(entry)
+
+        prefix = term.strip().lower()
+        matches.sort(key=lambda entry: (not entry['name'].startswith(prefix), entry['name']))
+        return [entry['payload'] for entry in matches[:limit]]
+
+    def payloads(self, item_ids):
+        """Return the JSON payloads of the given items, in order."""
+        entries = self._entries
+        return [entries[item_id]['payload'] for item_id in item_ids if item_id in entries]
+
+    def similar(self, term, threshold, limit=10):
+        """
+        Return up to `limit` (item id, similarity) pairs whose name shares at
+        least `threshold` of its trigrams with `term` (shared / union, as
+        pg_trgm's similarity()), best first.
+        """
+        wanted = trigrams(term)
+        if not wanted:
+            return []
+
+        grams, entries = self._grams, self._entries
+        shared = Counter()
+        for gram in wanted:
+            shared.update(grams.get(gram, ()))
+
+        scored = []
+        for item_id, count in shared.items():
+            entry = entries.get(item_id)
+            if entry is None:
+                continue
+            similarity = count / (len(wanted) + entry['gram_count'] - count)
+            if similarity >= threshold:
+                scored.append((similarity, item_id))
+        scored.sort(key=lambda pair: (-pair[0], entries[pair[1]]['name']))
+        return [(item_id, similarity) for similarity, item_id in scored[:limit]]
+
+
+index = PrefixIndex()
+
+
+def autocomplete_items(term, limit=10):
+    """
+    Return the JSON payloads of up to `limit` items matching `term`.
+
+    Answers from the prefix index, then from the trigram index so misspelt
+    names still match; only when both come up empty does it fall back to a
+    substring query, so mid-word fragments still find items.
+    """
+    index.ensure_built()
+    results = index.search(term, limit)
+    if results:
+        return results
+
+    similar = index.similar(term, settings.ITEM_FUZZY_THRESHOLD, limit)
+    if similar:
+        return index.payloads(item_id for item_id, _ in similar)
+
+    items = Item.objects.filter(
+        Q(name__icontains=term) | Q(category__name__icontains=term)
+    ).select_related('category')[:limit]
+    return [item.to_json() for item in items]
@@ -0,0 +1,62 @@
+"""
+Module: barcodes.py
+
+Barcode scan lookup for the till.
+
+A scanned code is resolved to the item's to_json() payload through a
+read-through cache in front of the unique index on ItemBarcode.code. Codes
+that match nothing are cached too, so a mis-scan repeated at the till does
+not hit the database again. The signals in store/signals.py drop the cached
+entries of an item's codes whenever the item, its category or its codes
+change.
+
+Functions:
+- normalize_code: Strips scanner whitespace from a code.
+- lookup_barcode: Returns the payload of the item with a code, or None.
+- forget_codes: Drops cached lookups for some codes.
+- forget_item_codes: Drops cached lookups for every code of some items.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ItemBarcode
+
+
+CACHE_PREFIX = 'item-barcode:'
+
+# Cached in place of a payload for codes that match no item
+MISSING = 'missing'
+
+
+def normalize_code(code):
+    return (code or '').strip()
+
+
+def _key(code):
+    return f'{CACHE_PREFIX}{code}'
+
+
+def lookup_barcode(code):
+    """Return the to_json() payload of the item with this code, or None."""
+    code = normalize_code(code)
+    if not code:
+        return None
+
+    payload = cache.get(_key(code))
+    if payload is None:
+        barcode = ItemBarcode.objects.select_related('item__category').filter(code=code).first()
+        payload = barcode.item.to_json() if barcode else MISSING
+        cache.set(_key(code), payload, settings.BARCODE_CACHE_TIMEOUT)
+    return None if payload == MISSING else payload
+
+
+def forget_codes(codes):
+    cache.delete_many([_key(normalize_code(code)) for code in codes])
+
+
+def forget_item_codes(**lookup):
+    """Drop cached lookups for the codes of the items matching `lookup` (e.g. item_id=...)."""
+    codes = list(ItemBarcode.objects.filter(**lookup).values_list('code', flat=True))
+    if codes:
+        forget_codes(codes)
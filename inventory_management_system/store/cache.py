@@ -0,0 +1,206 @@
+"""
+Module: cache.py
+
+The project's cache tier.
+
+TwoLevelCache is the default cache backend: a small in-process LRU (level 1)
+in front of a cache shared by every worker (level 2; Redis when REDIS_URL is
+set, a file-based cache otherwise, and an in-memory stand-in under tests).
+Reads are answered from level 1 when possible; writes, deletes and counters
+go to level 2 and drop or refresh the level 1 copy. Another worker's change
+therefore reaches this worker within LOCAL_TIMEOUT seconds at most.
+
+get_or_compute protects expensive values (dashboard aggregates, reports) from
+stampedes:
+- single flight: when a value is missing or stale, one caller takes a lock
+  in the shared cache and recomputes it; the others serve the stale copy,
+  or wait briefly for the fresh one when there is none
+- probabilistic early refresh (XFetch): as a value nears its expiry, each
+  read has a growing chance to recompute it ahead of time, weighted by how
+  long the computation took, so a popular value is refreshed before it
+  expires instead of by every worker at the moment it does
+
+Classes:
+- TwoLevelCache: Cache backend with an in-process LRU in front of a shared cache.
+
+Functions:
+- get_or_compute: Returns a cached value, recomputing it once when due.
+"""
+
+import math
+import random
+import time
+import uuid
+
+from django.core.cache import cache as default_cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class TwoLevelCache(BaseCache):
+    """
+    OPTIONS:
+    - SHARED: alias of the shared (level 2) cache in CACHES
+    - LOCAL_MAX_ENTRIES: entries kept in process; least recently used go first
+    - LOCAL_TIMEOUT: seconds a value may be served from the process copy
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options['SHARED']
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._local = LocMemCache(f'two-level:{location}', {
+            'TIMEOUT': self._local_timeout,
+            'OPTIONS': {
+                'MAX_ENTRIES': max_entries,
+                # Evict a single entry (the least recently used) when full
+                'CULL_FREQUENCY': max_entries,
+            },
+        })
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_timeout_for(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self._local_timeout
+        return max(0, min(timeout - time.time(), self._local_timeout))
+
+    def get(self, key, default=None, version=None):
+        value = self._local.get(key, self._missing_key, version=version)
+        if value is not self._missing_key:
+            return value
+        value = self.shared.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            return default
+        self._local.set(key, value, self._local_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._local.get(key, self._missing_key, version=version)
+            if value is self._missing_key:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            self._local.set_many(shared, self._local_timeout, version=version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local.set(key, value, self._local_timeout_for(timeout), version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        self._local.set_many(data, self._local_timeout_for(timeout), version=version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Decided and read by the shared cache alone, so add() works as a lock across workers
+        self._local.delete(key, version=version)
+        return self.shared.add(key, value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.delete(key, version=version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local.delete(key, version=version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self._local.delete_many(keys, version=version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self._missing_key, version=version) is not self._missing_key
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._local.set(key, value, self._local_timeout, version=version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop this process's copies only."""
+        self._local.clear()
+
+
+####################################################################################
+
+####################################################################################
+
+
+LOCK_PREFIX = 'compute-lock:'
+
+# How long callers without the lock wait for the first value, between polls
+WAIT_TIMEOUT = 5.0
+WAIT_INTERVAL = 0.05
+
+
+def _store(key, value, delta, timeout, cache):
+    # Kept twice as long as it is fresh, so a stale copy can be served while
+    # one caller recomputes it
+    cache.set(key, (value, delta, time.time() + timeout), timeout * 2)
+
+
+def get_or_compute(key, compute, timeout, beta=1.0, lock_timeout=60, cache=default_cache):
+    """
+    Return the value cached under `key`, calling `compute()` to (re)build
+    it when it is missing or due. The value is fresh for `timeout` seconds.
+
+    `beta` scales the early refresh: 0 turns it off, above 1 refreshes
+    sooner. `lock_timeout` bounds how long one computation may hold the
+    lock before another caller may start its own.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        # XFetch: -log(U) is exponentially distributed, so refreshes start
+        # rarely and become likely as the expiry nears
+        if time.time() - delta * beta * math.log(1.0 - random.random()) < expiry:
+            return value
+
+    lock_key = f'{LOCK_PREFIX}{key}'
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, lock_timeout):
+        try:
+            start = time.monotonic()
+            value = compute()
+            _store(key, value, time.monotonic() - start, timeout, cache)
+            return value
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    # Another caller is recomputing: serve the stale copy if there is one
+    if entry is not None:
+        return entry[0]
+
+    deadline = time.monotonic() + min(WAIT_TIMEOUT, lock_timeout)
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    # The other computation is taking too long; do not keep the request waiting
+    start = time.monotonic()
+    value = compute()
+    _store(key, value, time.monotonic() - start, timeout, cache)
+    return value
@@ -0,0 +1,67 @@
+"""
+Module: catalog.py
+
+The item catalog of the sale screen, as one compact JSON document.
+
+The document is rebuilt from the database only when the catalog version
+(CATALOG in store/versions.py) moves, which sales do not do; otherwise it comes from the cache, already
+serialized and gzipped. Its strong ETag is a hash of the JSON, so every
+worker that builds the same catalog gives it the same tag and clients can
+revalidate with If-None-Match. The sale screen keeps the last copy in
+localStorage and only asks for a new one when the page reports a different
+catalog version.
+
+Each item is a row of FIELDS: [id, name, price]. Stock is left out, since
+it changes with every sale; the sale screen learns what is available from
+the stock reservation it makes for each line.
+
+Functions:
+- get_catalog: Returns the current catalog document.
+"""
+
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Item
+from .versions import CATALOG, get_versions
+
+
+# Only the newest catalog is kept; a new version overwrites it
+CACHE_KEY = 'item-catalog'
+
+FIELDS = ('id', 'name', 'price')
+
+
+def _build():
+    rows = Item.objects.order_by('name', 'id').values_list(*FIELDS)
+    content = json.dumps(
+        {'fields': FIELDS, 'items': [[pk, name, str(price)] for pk, name, price in rows]},
+        separators=(',', ':'),
+        ensure_ascii=False,
+    ).encode('utf-8')
+    return {
+        'etag': '"{}"'.format(hashlib.sha256(content).hexdigest()[:32]),
+        'content': content,
+        # mtime=0 keeps the gzipped bytes identical for identical content
+        'gzipped': gzip.compress(content, mtime=0),
+    }
+
+
+def get_catalog():
+    """
+    Return the catalog as a dict with:
+    - version: the catalog version it was built for
+    - etag: strong ETag of the JSON (the gzipped body adds a suffix)
+    - content: the JSON bytes
+    - gzipped: the same bytes gzipped
+    """
+    version = get_versions(CATALOG)
+    catalog = cache.get(CACHE_KEY)
+    if catalog is None or catalog['version'] != version:
+        catalog = {'version': version, **_build()}
+        cache.set(CACHE_KEY, catalog, settings.ITEM_CATALOG_TIMEOUT)
+    return catalog
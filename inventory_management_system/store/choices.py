@@ -0,0 +1,197 @@
+"""
+Module: choices.py
+
+Cached option lists for the <select> widgets of forms and filters.
+
+Rendering a ModelChoiceField runs its queryset and calls __str__ on every
+row; Item.__str__ also loads the item's category, so a form with an item
+dropdown ran one query per item. Here each relation has a provider that
+builds its (pk, label) list in one query, and the list is cached under the
+versions of the models it reads (store/versions.py), so it is rebuilt once
+per change instead of once per form.
+
+Relations too large for one <select> (items, customers) use RemoteSelect:
+it renders only the selected option, looked up by pk, and the browser pages
+through the options with the choices endpoint as the user types. Each of
+those requests is one query for the names starting with the term, limited
+to a page (plus one row to tell whether more follow), so no keystroke reads
+the whole relation.
+
+Labels leave out stock: the item list is cached under the catalog version
+(store/versions.py), which sales do not move.
+
+Classes:
+- CachedChoiceIterator: Yields a ModelChoiceField's options from the cache.
+- RemoteSelect: Select widget that loads its options page by page.
+- CachedChoicesMixin: Form mixin switching fields to cached options.
+
+Functions:
+- get_choices: Returns the cached (pk, label) list of a relation.
+- search_choices: Returns one page of a relation's options matching a term.
+- label_choices: Returns the options of some rows of a relation, by pk.
+- use_cached_choices: Switches one form field to cached options.
+"""
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+
+from accounts.models import Customer, Vendor
+from accounts.search import normalize_name
+from .cache import get_or_compute
+from .models import Category, Item
+from .versions import CATALOG, get_versions
+
+
+def _item_options(items):
+    rows = items.values_list('pk', 'name', 'category__name')
+    # Item.__str__ without the quantity, and without loading each category
+    return [(pk, f"{name} - Category: {category}") for pk, name, category in rows]
+
+
+def _category_options(categories):
+    return [(pk, f"Category: {name}") for pk, name in categories.values_list('pk', 'name')]
+
+
+def _vendor_options(vendors):
+    return list(vendors.values_list('pk', 'name'))
+
+
+def _customer_options(customers):
+    rows = customers.values_list('pk', 'first_name', 'last_name')
+    return [(pk, ' '.join(name for name in (first, last) if name)) for pk, first, last in rows]
+
+
+def _name_starts_with(term):
+    return Q(name__istartswith=term)
+
+
+def _customer_starts_with(term):
+    # The indexed lookup keys of accounts/search.py, so "lovelace ada" matches too
+    key = normalize_name(term)
+    return Q(search_name__startswith=key) | Q(search_name_reversed__startswith=key)
+
+
+# Relation -> (model, ordering, options of a queryset, filter for a typed
+# term, models whose changes rebuild the cached list)
+PROVIDERS = {
+    'store.Item': (Item, ('name', 'pk'), _item_options, _name_starts_with, (CATALOG, 'store.Category')),
+    'store.Category': (Category, ('name', 'pk'), _category_options, _name_starts_with, ('store.Category',)),
+    'accounts.Vendor': (Vendor, ('name', 'pk'), _vendor_options, _name_starts_with, ('accounts.Vendor',)),
+    'accounts.Customer': (
+        Customer, ('first_name', 'last_name', 'pk'), _customer_options, _customer_starts_with, ('accounts.Customer',)
+    ),
+}
+
+
+def get_choices(provider):
+    """Return the cached [(pk, label), ...] of a relation in PROVIDERS."""
+    model, ordering, options, _, models = PROVIDERS[provider]
+    return get_or_compute(
+        f"choices:{provider}:{get_versions(*models)}",
+        lambda: options(model.objects.order_by(*ordering)),
+        settings.CHOICES_CACHE_TIMEOUT,
+    )
+
+
+def search_choices(provider, term='', page=1):
+    """
+    Return (page of (pk, label) whose name starts with `term`, whether more
+    pages follow), CHOICES_PAGE_SIZE options per page.
+    """
+    model, ordering, options, starts_with, _ = PROVIDERS[provider]
+    rows = model.objects.order_by(*ordering)
+    term = term.strip()
+    if term:
+        rows = rows.filter(starts_with(term))
+    size = settings.CHOICES_PAGE_SIZE
+    start = (max(page, 1) - 1) * size
+    found = options(rows[start:start + size + 1])
+    return found[:size], len(found) > size
+
+
+def label_choices(provider, pks):
+    """Return the (pk, label) options of the rows of a relation with the given pks."""
+    model, ordering, options, _, _ = PROVIDERS[provider]
+    valid = []
+    for pk in pks:
+        try:
+            valid.append(model._meta.pk.to_python(pk))
+        except ValidationError:
+            continue
+    if not valid:
+        return []
+    return options(model.objects.filter(pk__in=valid).order_by(*ordering))
+
+
+class CachedChoiceIterator(ModelChoiceIterator):
+    """ModelChoiceIterator that reads the cached list instead of the queryset."""
+
+    def _choices(self):
+        return get_choices(self.field.choice_provider)
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        yield from self._choices()
+
+    def __len__(self):
+        return len(self._choices()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self._choices())
+
+
+class RemoteSelect(forms.Select):
+    """
+    Renders only the empty and the selected option; remote_select.js adds a
+    search box that fills the list from the choices endpoint page by page.
+    """
+
+    class Media:
+        js = ('inventory_managment_system/js/remote_select.js',)
+
+    def __init__(self, provider, attrs=None):
+        super().__init__(attrs)
+        self.provider = provider
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-remote-choices'] = reverse('store:choices', args=[self.provider])
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        selected = {str(v) for v in value if v not in (None, '')}
+        options = [self.create_option(name, '', '---------', not selected, 0)]
+        for index, (pk, label) in enumerate(label_choices(self.provider, selected), start=1):
+            options.append(self.create_option(name, pk, label, True, index))
+        return [(None, options, 0)]
+
+
+def use_cached_choices(form, field_name, provider, remote=False):
+    """Serve the options of `form.fields[field_name]` from the cached `provider` list."""
+    field = form.fields[field_name]
+    field.choice_provider = provider
+    field.iterator = CachedChoiceIterator
+    if remote:
+        field.widget = RemoteSelect(provider, attrs=field.widget.attrs)
+        field.widget.is_required = field.required
+    field.widget.choices = field.choices
+
+
+class CachedChoicesMixin:
+    """
+    Form mixin: `cached_choices` maps field names to PROVIDERS keys, and
+    fields listed in `remote_choices` also get a RemoteSelect widget.
+    """
+    cached_choices = {}
+    remote_choices = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field_name, provider in self.cached_choices.items():
+            if field_name in self.fields:
+                use_cached_choices(self, field_name, provider, remote=field_name in self.remote_choices)
@@ -0,0 +1,100 @@
+"""
+Module: conditional.py
+
+Conditional GET for list pages and JSON endpoints.
+
+The validator is a weak ETag hashed from the versions of the models a view
+shows (store/versions.py), the full path with its querystring, and the
+parts of the page that belong to the user: their id and role, and the CSRF
+secret embedded in forms. It costs a few cache reads, so a poll whose
+If-None-Match still matches is answered 304 before the view runs a single
+query. Views showing values no version follows closely (stock on hand
+moves with every sale) can add them to the validator as extra parts.
+
+Requests with a flash message waiting get no ETag: the page has to be
+rendered for the message to be shown.
+
+Classes:
+- ConditionalGetMixin: Adds the ETag/304 handling to a class-based view.
+
+Functions:
+- versions_etag: Returns the ETag of a request for some models.
+- condition_on_versions: Decorator adding the ETag/304 handling to a view function.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from accounts.permissions import get_access
+from .versions import get_versions
+
+
+def versions_etag(request, models, extra=()):
+    """
+    Return a weak ETag for `request` on a view showing `models`, or None.
+    `extra` holds further values the page shows, hashed in with the versions.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if len(get_messages(request)):
+        return None
+
+    access = get_access(request)
+    parts = (
+        get_versions(*models),
+        request.get_full_path(),
+        access.user_id,
+        access.role,
+        access.is_superuser,
+        request.META.get('CSRF_COOKIE', ''),
+        *extra,
+    )
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def _conditional(view, etag_func):
+    conditional_view = condition(etag_func=etag_func)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        if response.has_header('ETag'):
+            # Let browsers keep the page, but revalidate before each use
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
+
+
+def condition_on_versions(*models):
+    """
+    Answer GET requests with 304 while the versions of `models` (and the
+    rest of versions_etag) are unchanged:
+
+        @condition_on_versions('accounts.Customer')
+        def get_customers(request): ...
+    """
+    def decorator(view):
+        return _conditional(view, lambda request, *args, **kwargs: versions_etag(request, models))
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests with 304 while the versions of `etag_models` are
+    unchanged. Put it after LoginRequiredMixin, so anonymous users are still
+    redirected.
+    """
+    etag_models = ()
+
+    def get_etag(self, request):
+        return versions_etag(request, self.etag_models)
+
+    def dispatch(self, request, *args, **kwargs):
+        view = _conditional(super().dispatch, lambda request, *args, **kwargs: self.get_etag(request))
+        return view(request, *args, **kwargs)
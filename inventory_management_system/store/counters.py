@@ -0,0 +1,108 @@
+"""
+Module: counters.py
+
+Dashboard metrics kept as running totals instead of per-request aggregates.
+
+Each metric lives in the DashboardCounter table, striped over
+DASHBOARD_COUNTER_SHARDS rows. Writers bump one random stripe inside their
+own transaction, so a counter changes if and only if the change it counts
+commits. The signals in store/signals.py count profiles, items, deliveries,
+sales and sale lines; the stock ledger (transactions/services.py) counts
+stock movements and bulk-inserted sale lines. The dashboard reads every
+metric with one grouped query over the counter table, and the paginators
+of large lists (store/pagination.py) read row counts from it.
+
+Functions:
+- bump: Adds to a counter in the current transaction.
+- read_counters: Returns every counter, summed over its stripes.
+- read_counter: Returns one counter, summed over its stripes.
+- recount: Recomputes every counter from the source tables.
+"""
+
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from accounts.models import Profile
+from transactions.models import Sale, SaleDetail
+from .models import DashboardCounter, Delivery, Item, ItemStockShard
+
+
+PROFILES = 'profiles'
+ITEMS = 'items'
+STOCK_ON_HAND = 'stock_on_hand'
+DELIVERIES = 'deliveries'
+SALES = 'sales'
+SALE_LINES = 'sale_lines'
+
+COUNTERS = (PROFILES, ITEMS, STOCK_ON_HAND, DELIVERIES, SALES, SALE_LINES)
+
+
+def bump(name, delta=1):
+    """Add `delta` to counter `name` as part of the current transaction."""
+    if not delta:
+        return
+    shard = random.randrange(settings.DASHBOARD_COUNTER_SHARDS)
+    stripe = DashboardCounter.objects.filter(name=name, shard=shard)
+    if stripe.update(value=F('value') + delta):
+        return
+
+    # First write to this stripe
+    try:
+        with transaction.atomic():
+            DashboardCounter.objects.create(name=name, shard=shard, value=delta)
+    except IntegrityError:
+        stripe.update(value=F('value') + delta)
+
+
+def read_counters():
+    """Return {counter name: value} for every counter, in one query."""
+    totals = dict.fromkeys(COUNTERS, 0)
+    totals.update(
+        DashboardCounter.objects.order_by().values('name').annotate(
+            total=Sum('value')
+        ).values_list('name', 'total')
+    )
+    return totals
+
+
+def read_counter(name):
+    """Return the value of counter `name`."""
+    return DashboardCounter.objects.filter(name=name).aggregate(total=Sum('value'))['total'] or 0
+
+
+def compute_totals():
+    """
+    Aggregate every counter from the source tables.
+
+    Stock on hand counts Item.quantity for ordinary items and the shard rows
+    for items with striped stock.
+    """
+    plain_stock = Item.objects.filter(stock_sharded=False).aggregate(total=Sum('quantity'))['total']
+    striped_stock = ItemStockShard.objects.filter(item__stock_sharded=True).aggregate(total=Sum('quantity'))['total']
+    return {
+        PROFILES: Profile.objects.count(),
+        ITEMS: Item.objects.count(),
+        STOCK_ON_HAND: (plain_stock or 0) + (striped_stock or 0),
+        DELIVERIES: Delivery.objects.count(),
+        SALES: Sale.objects.count(),
+        SALE_LINES: SaleDetail.objects.count(),
+    }
+
+
+def recount():
+    """
+    Reset every counter to a fresh aggregate of the source tables.
+
+    Writes that commit while the aggregates run can be missed; run it when
+    the shop is quiet (see the recount_dashboard command).
+    """
+    totals = compute_totals()
+    with transaction.atomic():
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create([
+            DashboardCounter(name=name, shard=0, value=value) for name, value in totals.items()
+        ])
+    return totals
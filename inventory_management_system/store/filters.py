@@ -1,5 +1,6 @@
 import django_filters
 from django import forms
+from .choices import CachedChoicesMixin
 from .models import Item, Category, Vendor
 
 class ProductFilter(django_filters.FilterSet):
@@ -47,4 +48,10 @@ class ProductFilter(django_filters.FilterSet):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.filters['category'].queryset = Category.objects.order_by('name')
-        self.filters['vendor'].queryset = Vendor.objects.order_by('name')
\ No newline at end of file
+        self.filters['vendor'].queryset = Vendor.objects.order_by('name')
+
+    def get_form_class(self):
+        # Dropdown options come from the choice cache (store/choices.py)
+        return type('ProductFilterForm', (CachedChoicesMixin, super().get_form_class()), {
+            'cached_choices': {'category': 'store.Category', 'vendor': 'accounts.Vendor'},
+        })
\ No newline at end of file
@@ -10,13 +10,20 @@ Forms:
 """
 
 from django import forms
+from transactions.services import save_item
+from .choices import CachedChoicesMixin
 from .models import Item, Category, Delivery
 
 
-class ItemForm(forms.ModelForm):
+class ItemForm(CachedChoicesMixin, forms.ModelForm):
     """
     Form for creating or updating an Item in the inventory.
+
+    The quantity entered is a stock count: save() applies it through the
+    stock ledger as an adjustment instead of writing Item.quantity.
     """
+    cached_choices = {'category': 'store.Category', 'vendor': 'accounts.Vendor'}
+
     class Meta:
         model = Item
         fields = [
@@ -53,6 +60,21 @@ class ItemForm(forms.ModelForm):
             'vendor': forms.Select(attrs={'class': 'form-control'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Striped stock is kept on shard rows; edits here would be overwritten
+        if self.instance.pk and self.instance.stock_sharded:
+            self.fields['quantity'].disabled = True
+            self.fields['quantity'].help_text = "Managed by striped stock"
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit=False)
+        counted = self.instance._state.adding or 'quantity' in self.changed_data
+        save_item(self.instance, self.cleaned_data['quantity'] if counted else None)
+        self._save_m2m()
+        return self.instance
+
 
 class CategoryForm(forms.ModelForm):
     """
@@ -73,10 +95,13 @@ class CategoryForm(forms.ModelForm):
         }
 
 
-class DeliveryForm(forms.ModelForm):
+class DeliveryForm(CachedChoicesMixin, forms.ModelForm):
     """
     Form for scheduling or updating a Delivery.
     """
+    cached_choices = {'item': 'store.Item'}
+    remote_choices = ('item',)
+
     class Meta:
         model = Delivery
         fields = [
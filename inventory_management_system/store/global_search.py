@@ -0,0 +1,262 @@
+"""
+Module: global_search.py
+
+One search box over every kind of record: items, customers, vendors, sales,
+purchases, invoices and bills.
+
+Each source runs in a shared thread pool and gets GLOBAL_SEARCH_TIMEOUT
+seconds. Sources that miss the budget are reported as timed out instead of
+holding up the response (on PostgreSQL their query is also cancelled by a
+statement_timeout). The hits of all sources are merged into one list ranked
+by how closely their title matches the term. Sources still queued when
+the budget runs out are cancelled, and at most GLOBAL_SEARCH_MAX_CONCURRENT
+searches run per process: past that, a search reports every source as
+timed out without queueing behind the others. A search holds its slot until
+its last source has finished or been cancelled, not just until it answers,
+so sources that overran the budget still count against the limit.
+
+Functions:
+- global_search: Runs every source and returns the merged results.
+
+Sources (term, limit -> list of result dicts):
+- search_items, search_customers, search_vendors, search_sales,
+  search_purchases, search_invoices, search_bills
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.urls import reverse
+from django.utils.text import slugify
+
+from accounts.models import Customer, Vendor
+from accounts.search import lookup_customers
+from bills.models import Bill
+from invoice.models import Invoice
+from transactions.models import Purchase, Sale
+from .models import Item
+from .search import search_items as full_text_search
+
+
+logger = logging.getLogger(__name__)
+
+# "TX-12", "tx12", "#12" or "12"
+SALE_ID_RE = re.compile(r'^(?:tx-?|#)?(\d+)$', re.IGNORECASE)
+# "PO-12", "po12"
+PURCHASE_ID_RE = re.compile(r'^po-?(\d+)$', re.IGNORECASE)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.GLOBAL_SEARCH_WORKERS, thread_name_prefix='global-search'
+)
+_slots = threading.BoundedSemaphore(settings.GLOBAL_SEARCH_MAX_CONCURRENT)
+
+
+def _score(term, text):
+    """3 for an exact title match, 2 for a prefix, 1 for anything else."""
+    term, text = term.casefold(), (text or '').casefold()
+    if text == term:
+        return 3
+    if text.startswith(term):
+        return 2
+    return 1
+
+
+def _result(kind, obj_id, title, subtitle, url, score):
+    return {
+        'type': kind,
+        'id': obj_id,
+        'title': title,
+        'subtitle': subtitle,
+        'url': url,
+        'score': score,
+    }
+
+
+####################################################################################
+
+####################################################################################
+
+
+def search_items(term, limit):
+    queryset = Item.objects.select_related('category').only('name', 'slug', 'quantity', 'category__name')
+    items = full_text_search(queryset, term)
+    if items is None:
+        items = queryset.filter(name__icontains=term)
+    return [
+        _result('item', item.pk, item.name, f"{item.category.name} · {item.quantity} in stock",
+                reverse('store:product-detail', kwargs={'slug': item.slug}),
+                _score(term, item.name))
+        for item in items[:limit]
+    ]
+
+
+def search_customers(term, limit):
+    customers = lookup_customers(Customer.objects.all(), term)[:limit]
+    return [
+        _result('customer', customer.pk, customer.get_full_name(),
+                customer.email or (str(customer.phone) if customer.phone else ''),
+                reverse('accounts:customer-update', kwargs={'pk': customer.pk}),
+                _score(term, customer.get_full_name()))
+        for customer in customers
+    ]
+
+
+def search_vendors(term, limit):
+    vendors = Vendor.objects.filter(name__icontains=term).order_by('name')[:limit]
+    return [
+        _result('vendor', vendor.pk, vendor.name, str(vendor.phone_number or ''),
+                reverse('accounts:vendor-update', kwargs={'pk': vendor.pk}),
+                _score(term, vendor.name))
+        for vendor in vendors
+    ]
+
+
+def search_sales(term, limit):
+    match = SALE_ID_RE.match(term)
+    if not match:
+        return []
+    sales = Sale.objects.select_related('customer').filter(pk=int(match.group(1)))
+    return [
+        _result('sale', sale.pk, f"TX-{sale.pk}",
+                f"{sale.customer.get_full_name()} · {sale.date_added.date()} · {sale.grand_total}",
+                reverse('transactions:sale-detail', kwargs={'pk': sale.pk}), 3)
+        for sale in sales
+    ]
+
+
+def search_purchases(term, limit):
+    match = PURCHASE_ID_RE.match(term)
+    if match:
+        purchases = Purchase.objects.filter(pk=int(match.group(1)))
+    else:
+        slug = slugify(term)
+        if not slug:
+            return []
+        purchases = Purchase.objects.filter(slug__startswith=slug).order_by('slug')
+    purchases = purchases.select_related('item', 'vendor')[:limit]
+    return [
+        _result('purchase', purchase.pk, f"PO-{purchase.pk}",
+                f"{purchase.item.name} · {purchase.vendor} · {purchase.get_status_display()}",
+                reverse('transactions:purchase-detail', kwargs={'slug': purchase.slug}),
+                3 if match else _score(slugify(term), purchase.slug))
+        for purchase in purchases
+    ]
+
+
+def search_invoices(term, limit):
+    slug = slugify(term)
+    if not slug:
+        return []
+    invoices = Invoice.objects.filter(slug__startswith=slug).order_by('-date')[:limit]
+    return [
+        _result('invoice', invoice.pk, invoice.customer_name, f"{invoice.slug} · {invoice.grand_total}",
+                reverse('invoice:invoice-detail', kwargs={'slug': invoice.slug}),
+                _score(term, invoice.customer_name))
+        for invoice in invoices
+    ]
+
+
+def search_bills(term, limit):
+    bills = Bill.objects.filter(institution_name__icontains=term).order_by('-date')[:limit]
+    return [
+        _result('bill', bill.pk, bill.institution_name, f"{bill.get_status_display()} · {bill.amount}",
+                reverse('bills:bill-update', kwargs={'slug': bill.slug}),
+                _score(term, bill.institution_name))
+        for bill in bills
+    ]
+
+
+SOURCES = {
+    'item': search_items,
+    'customer': search_customers,
+    'vendor': search_vendors,
+    'sale': search_sales,
+    'purchase': search_purchases,
+    'invoice': search_invoices,
+    'bill': search_bills,
+}
+
+
+####################################################################################
+
+####################################################################################
+
+
+class _Slot:
+    """One of the _slots, given back once each source of a search has finished."""
+
+    def __init__(self, sources):
+        self._left = sources
+        self._lock = threading.Lock()
+
+    def finish(self):
+        """Mark one source as finished; the last one releases the slot."""
+        with self._lock:
+            self._left -= 1
+            last = self._left == 0
+        if last:
+            _slots.release()
+
+
+def _run_source(slot, source, term, limit, timeout):
+    """Run one source on a pool thread, with its own database connection."""
+    try:
+        close_old_connections()
+        if connection.vendor != 'postgresql':
+            return source(term, limit)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", [int(timeout * 1000)])
+            return source(term, limit)
+    finally:
+        slot.finish()
+
+
+def global_search(term, limit=20, per_source=5, timeout=None):
+    """
+    Search every source for `term` and return a dict with:
+    - results: up to `limit` hits, best score first
+    - timed_out: sources that did not answer within the budget
+    - failed: sources that raised an error
+    """
+    timeout = settings.GLOBAL_SEARCH_TIMEOUT if timeout is None else timeout
+    if not _slots.acquire(blocking=False):
+        return {'results': [], 'timed_out': sorted(SOURCES), 'failed': []}
+    slot = _Slot(len(SOURCES))
+    futures = {}
+    try:
+        for name, source in SOURCES.items():
+            futures[_executor.submit(_run_source, slot, source, term, per_source, timeout)] = name
+    except BaseException:
+        # Sources that were never submitted will not finish the slot themselves
+        for _ in range(len(SOURCES) - len(futures)):
+            slot.finish()
+        raise
+
+    done, pending = wait(futures, timeout=timeout)
+    # Sources that have not started yet would only keep the pool busy
+    for future in pending:
+        if future.cancel():
+            slot.finish()
+
+    results, failed = [], []
+    for future in futures:
+        if future not in done:
+            continue
+        try:
+            results.extend(future.result())
+        except Exception as e:
+            logger.error(f"Global search source {futures[future]} failed: {str(e)}", exc_info=True)
+            failed.append(futures[future])
+
+    order = list(SOURCES)
+    results.sort(key=lambda r: (-r['score'], order.index(r['type'])))
+    return {
+        'results': results[:limit],
+        'timed_out': sorted(futures[future] for future in pending),
+        'failed': sorted(failed),
+    }
@@ -0,0 +1,114 @@
+"""
+Benchmark conditional GET on the polled pages.
+
+Requests each page the way a polling browser does: once in full, then again
+with the ETag it got back. Reports the bytes sent and the database time and
+query count of both, so the saving of a 304 can be read off directly. Runs
+inside a transaction that is rolled back, so the login session it creates is
+not kept.
+
+Usage:
+    python manage.py benchmark_conditional_get --username admin --repeat 5
+    python manage.py benchmark_conditional_get --urls store:dashboard transactions:sale-list
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+DEFAULT_URLS = [
+    'store:dashboard',
+    'store:product-list',
+    'transactions:sale-list',
+    'transactions:purchase-list',
+    'invoice:invoice-list',
+    'bills:bill-list',
+]
+
+
+class Command(BaseCommand):
+    help = "Measure bytes and database time saved by 304 responses on list pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--urls', nargs='+', default=DEFAULT_URLS,
+            help="URL names to request"
+        )
+        parser.add_argument(
+            '--username',
+            help="User to request the pages as (default: the first superuser)"
+        )
+        parser.add_argument(
+            '--host', default='localhost',
+            help="Host header to send; must be in ALLOWED_HOSTS"
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help="Requests per page and mode; the median is reported"
+        )
+
+    def handle(self, *args, **options):
+        user = self._user(options['username'])
+        repeat = options['repeat']
+        # An address outside INTERNAL_IPS, so the debug toolbar is not measured
+        client = Client(HTTP_HOST=options['host'], REMOTE_ADDR='192.0.2.1')
+
+        self.stdout.write(
+            f"{'page':<28} {'full B':>9} {'304 B':>6} {'full q':>7} {'304 q':>6} "
+            f"{'full db ms':>11} {'304 db ms':>10} {'full ms':>8} {'304 ms':>7}"
+        )
+        with transaction.atomic():
+            client.force_login(user)
+            for name in options['urls']:
+                url = reverse(name)
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"{name} answered {response.status_code}")
+                etag = response.get('ETag')
+                if not etag:
+                    self.stdout.write(self.style.WARNING(f"{name}: no ETag, skipped"))
+                    continue
+
+                full = self._median(repeat, lambda: client.get(url))
+                cached = self._median(repeat, lambda: client.get(url, headers={'If-None-Match': etag}))
+                if cached['status'] != 304:
+                    self.stdout.write(self.style.WARNING(f"{name}: revalidation answered {cached['status']}"))
+                self.stdout.write(
+                    f"{name:<28} {full['bytes']:>9} {cached['bytes']:>6} "
+                    f"{full['queries']:>7} {cached['queries']:>6} "
+                    f"{full['db_ms']:>11.2f} {cached['db_ms']:>10.2f} "
+                    f"{full['ms']:>8.2f} {cached['ms']:>7.2f}"
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f"Done ({connection.vendor}); no data was kept."))
+
+    def _user(self, username):
+        users = get_user_model().objects.filter(is_active=True)
+        user = users.filter(username=username).first() if username else users.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("No such active user; pass --username")
+        return user
+
+    def _median(self, repeat, request):
+        runs = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = request()
+                elapsed = time.perf_counter() - start
+            runs.append({
+                'status': response.status_code,
+                'bytes': len(response.content),
+                'queries': len(queries),
+                'db_ms': sum(float(query['time']) for query in queries.captured_queries) * 1000,
+                'ms': elapsed * 1000,
+            })
+        runs.sort(key=lambda run: run['ms'])
+        return runs[len(runs) // 2]
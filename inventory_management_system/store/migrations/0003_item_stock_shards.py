@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_item_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='stock_sharded',
+            field=models.BooleanField(default=False, help_text='Spread stock over several shard rows so concurrent sales do not queue on this item', verbose_name='Striped Stock'),
+        ),
+        migrations.CreateModel(
+            name='ItemStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Shard Number')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Shard Quantity')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='store.item', verbose_name='Item')),
+            ],
+            options={
+                'verbose_name': 'Item Stock Shard',
+                'verbose_name_plural': 'Item Stock Shards',
+                'ordering': ['item', 'shard'],
+                'constraints': [models.UniqueConstraint(fields=('item', 'shard'), name='unique_item_stock_shard')],
+            },
+        ),
+    ]
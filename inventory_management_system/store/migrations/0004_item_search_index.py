@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from store import search
+    search.create_index(schema_editor.connection)
+    search.reindex_items(connection=schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from store import search
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_profile_telephone'),
+        ('store', '0003_item_stock_shards'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_trigram_index(apps, schema_editor):
+    from store import search
+    search.create_trigram_index(schema_editor.connection)
+
+
+def drop_trigram_index(apps, schema_editor):
+    from store import search
+    search.drop_trigram_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_item_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
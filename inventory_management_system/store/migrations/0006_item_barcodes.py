@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_item_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemBarcode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, unique=True, verbose_name='Barcode / SKU')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcodes', to='store.item', verbose_name='Item')),
+            ],
+            options={
+                'verbose_name': 'Item Barcode',
+                'verbose_name_plural': 'Item Barcodes',
+                'ordering': ['item', 'code'],
+            },
+        ),
+    ]
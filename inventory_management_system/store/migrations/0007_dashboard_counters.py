@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:53
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def count_existing_rows(apps, schema_editor):
+    """Start each counter at a fresh aggregate of its source table."""
+    DashboardCounter = apps.get_model('store', 'DashboardCounter')
+    Item = apps.get_model('store', 'Item')
+    ItemStockShard = apps.get_model('store', 'ItemStockShard')
+
+    plain_stock = Item.objects.filter(stock_sharded=False).aggregate(total=Sum('quantity'))['total']
+    striped_stock = ItemStockShard.objects.filter(item__stock_sharded=True).aggregate(total=Sum('quantity'))['total']
+    totals = {
+        'profiles': apps.get_model('accounts', 'Profile').objects.count(),
+        'items': Item.objects.count(),
+        'stock_on_hand': (plain_stock or 0) + (striped_stock or 0),
+        'deliveries': apps.get_model('store', 'Delivery').objects.count(),
+        'sales': apps.get_model('transactions', 'Sale').objects.count(),
+    }
+    DashboardCounter.objects.bulk_create([
+        DashboardCounter(name=name, shard=0, value=value) for name, value in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customer_lookup_keys'),
+        ('store', '0006_item_barcodes'),
+        ('transactions', '0008_purchase_received_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, verbose_name='Counter')),
+                ('shard', models.PositiveSmallIntegerField(default=0, verbose_name='Stripe')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Value')),
+            ],
+            options={
+                'verbose_name': 'Dashboard Counter',
+                'verbose_name_plural': 'Dashboard Counters',
+                'constraints': [models.UniqueConstraint(fields=('name', 'shard'), name='unique_dashboard_counter_shard')],
+            },
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:30
+
+from django.db import migrations
+
+
+def count_existing_lines(apps, schema_editor):
+    DashboardCounter = apps.get_model('store', 'DashboardCounter')
+    SaleDetail = apps.get_model('transactions', 'SaleDetail')
+    DashboardCounter.objects.filter(name='sale_lines').delete()
+    DashboardCounter.objects.create(name='sale_lines', shard=0, value=SaleDetail.objects.count())
+
+
+def forget_lines(apps, schema_editor):
+    apps.get_model('store', 'DashboardCounter').objects.filter(name='sale_lines').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_dashboard_counters'),
+        ('transactions', '0008_purchase_received_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_existing_lines, forget_lines),
+    ]
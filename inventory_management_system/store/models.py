@@ -6,6 +6,9 @@ Contains Django models for handling categories, items, and deliveries.
 Classes:
 - Category: Represents a category for items.
 - Item: Represents an item in the inventory.
+- ItemStockShard: Holds one stripe of a hot item's stock.
+- ItemBarcode: A scannable code (barcode/SKU) of an item.
+- DashboardCounter: One stripe of a running dashboard total.
 - Delivery: Represents a delivery of an item to a customer.
 
 Each class provides specific fields, behaviors, and metadata to support inventory and delivery functionality.
@@ -67,6 +70,11 @@ class Item(models.Model):
                                 validators=[MinValueValidator(0.01)], verbose_name="Unit Price")
     expiring_date = models.DateTimeField(blank=True, null=True, verbose_name="Expiration Date")
     vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, verbose_name="Vendor")
+    stock_sharded = models.BooleanField(
+        default=False,
+        verbose_name="Striped Stock",
+        help_text="Spread stock over several shard rows so concurrent sales do not queue on this item"
+    )
 
     class Meta:
         ordering = ['name']
@@ -95,7 +103,9 @@ class Item(models.Model):
         """
         Returns a dictionary representation of the item for serialization.
         """
-        product = model_to_dict(self)
+        # The image stays out of the autocomplete payload (a file object
+        # does not serialize to JSON, and the lookups never show it)
+        product = model_to_dict(self, exclude=['image'])
         product.update({
             'id': self.id,
             'text': self.name,
@@ -106,6 +116,60 @@ class Item(models.Model):
         return product
 
 
+class ItemStockShard(models.Model):
+    """
+    One stripe of the stock of an item with striped stock enabled.
+
+    Sales decrement a random shard instead of the Item row, so checkouts of
+    hot items do not serialize on one row lock. The item's stock is the sum
+    of its shards; Item.quantity is folded back from them periodically.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="stock_shards", verbose_name="Item")
+    shard = models.PositiveSmallIntegerField(verbose_name="Shard Number")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Shard Quantity")
+
+    class Meta:
+        ordering = ['item', 'shard']
+        verbose_name = "Item Stock Shard"
+        verbose_name_plural = "Item Stock Shards"
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'shard'], name='unique_item_stock_shard'),
+        ]
+
+    def __str__(self):
+        """
+        Returns a human-readable representation of the shard.
+        """
+        return f"{self.item_id}#{self.shard}: {self.quantity}"
+
+
+class ItemBarcode(models.Model):
+    """
+    A barcode or SKU that identifies an item at the till.
+
+    An item may carry several codes (e.g. the manufacturer's EAN and an
+    in-house SKU); each code belongs to exactly one item.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="barcodes", verbose_name="Item")
+    code = models.CharField(max_length=64, unique=True, verbose_name="Barcode / SKU")
+
+    class Meta:
+        ordering = ['item', 'code']
+        verbose_name = "Item Barcode"
+        verbose_name_plural = "Item Barcodes"
+
+    def __str__(self):
+        """
+        Returns a human-readable representation of the barcode.
+        """
+        return f"{self.code} ({self.item_id})"
+
+    def save(self, *args, **kwargs):
+        # Scanners sometimes send surrounding whitespace
+        self.code = self.code.strip()
+        super().save(*args, **kwargs)
+
+
 class Delivery(models.Model):
     """
     Represents a delivery of a particular item to a customer.
@@ -131,3 +195,28 @@ class Delivery(models.Model):
         Returns a human-readable representation of the delivery.
         """
         return f"Delivery of {self.item} to {self.customer_name} at {self.location} on {self.date}"
+
+
+class DashboardCounter(models.Model):
+    """
+    One stripe of a running total shown on the dashboard (see store/counters.py).
+
+    A counter is the sum of its stripes; writers bump a random stripe so
+    concurrent sales do not queue on a single row.
+    """
+    name = models.CharField(max_length=32, verbose_name="Counter")
+    shard = models.PositiveSmallIntegerField(default=0, verbose_name="Stripe")
+    value = models.BigIntegerField(default=0, verbose_name="Value")
+
+    class Meta:
+        verbose_name = "Dashboard Counter"
+        verbose_name_plural = "Dashboard Counters"
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'shard'], name='unique_dashboard_counter_shard'),
+        ]
+
+    def __str__(self):
+        """
+        Returns a human-readable representation of the counter stripe.
+        """
+        return f"{self.name}#{self.shard}: {self.value}"
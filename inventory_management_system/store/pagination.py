@@ -0,0 +1,374 @@
+"""
+Module: pagination.py
+
+Pagination for lists too long to count or to page with OFFSET.
+
+Django's Paginator selects a page with OFFSET and counts every row to
+number the pages, so both cost more the deeper and the larger the table.
+CursorPaginator instead remembers the ordering values of the last (or
+first) row shown and asks for the rows just after (or before) them:
+
+    WHERE date_added <= :v AND (date_added < :v OR id < :id)
+    ORDER BY date_added DESC, id DESC
+    LIMIT per_page + 1
+
+The first condition bounds a range scan on the date index, so every page
+costs the same however deep it is, and nothing is counted. The price is
+that pages have no numbers: a page only links to the next and previous
+ones, through opaque cursor tokens.
+
+Lists that keep numbered pages can use ApproximateCountPaginator instead.
+It takes the row count of a whole table from the running totals kept by
+signals (store/counters.py) and that of a filtered list from the query
+planner, and only counts exactly when the number is small; the template
+then shows "about N".
+
+Classes:
+- InvalidCursor: Raised for a cursor token that cannot be decoded.
+- CursorPage: One page of rows plus the tokens of its neighbours.
+- CursorPaginator: Paginates a queryset on an ordering ending in the pk.
+- CursorPaginationMixin: Switches a ListView or SingleTableView to cursors.
+- ApproximateCountPaginator: Paginator that estimates large counts.
+"""
+
+import base64
+import binascii
+import collections.abc
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.http import Http404
+from django_tables2.rows import BoundRows
+
+from . import counters
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(collections.abc.Sequence):
+    """
+    Quacks like Django's Page where the templates need it (iteration,
+    has_next, has_previous, has_other_pages). `cursor` is the token this
+    page was requested with ('' for the first page).
+    """
+
+    def __init__(self, object_list, paginator, cursor, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<Page after {self.cursor or 'start'}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginate `object_list` (a queryset, or django_tables2's rows over one)
+    on `ordering`, e.g. ('-date_added',). The pk is appended as the tie
+    break unless the ordering already ends with it, so the order is total.
+
+    `cursor` is the token page() falls back to when it is not given one;
+    django_tables2 always asks for page(1), so its cursor comes this way.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, ordering=(), cursor=None):
+        self.rows = None
+        if isinstance(object_list, BoundRows):
+            # django_tables2: paginate the queryset under the table's rows
+            self.rows = object_list
+            object_list = object_list.data.data
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.cursor = cursor
+
+        model = object_list.model
+        pk_name = model._meta.pk.name
+        ordering = [name[:-2] + pk_name if name.lstrip('-') == 'pk' else name for name in ordering]
+        if not ordering or ordering[-1].lstrip('-') != pk_name:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(('-' if descending else '') + pk_name)
+        # [(field, descending)]
+        self.ordering = [(model._meta.get_field(name.lstrip('-')), name.startswith('-')) for name in ordering]
+
+    def _order_by(self, reverse):
+        return [
+            ('-' if descending != reverse else '') + field.attname
+            for field, descending in self.ordering
+        ]
+
+    def _after(self, values, reverse):
+        """Rows strictly after `values` in the ordering (before, if `reverse`)."""
+        (first, first_descending), first_value = self.ordering[0], values[0]
+        # Bound the index range on the leading column
+        bound = Q(**{f"{first.attname}__{'lte' if first_descending != reverse else 'gte'}": first_value})
+
+        after = Q()
+        for position, ((field, descending), value) in enumerate(zip(self.ordering, values)):
+            step = Q(**{f"{field.attname}__{'lt' if descending != reverse else 'gt'}": value})
+            for earlier, earlier_value in zip(self.ordering[:position], values):
+                step &= Q(**{earlier[0].attname: earlier_value})
+            after |= step
+        return bound & after
+
+    def _encode(self, row, direction):
+        values = []
+        for field, _ in self.ordering:
+            value = getattr(row, field.attname)
+            if isinstance(value, (datetime.date, datetime.time)):
+                value = value.isoformat()
+            elif isinstance(value, decimal.Decimal):
+                value = str(value)
+            values.append(value)
+        payload = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            if direction not in ('n', 'p') or len(values) != len(self.ordering):
+                raise ValueError
+            return direction, [field.to_python(value) for (field, _), value in zip(self.ordering, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError) as exc:
+            raise InvalidCursor("That page cursor is not valid") from exc
+
+    def page(self, cursor=None):
+        """Return the CursorPage for `cursor`; the first page when there is none."""
+        if not isinstance(cursor, str):
+            cursor = self.cursor
+        cursor = cursor or ''
+        direction, values = self._decode(cursor) if cursor else ('n', None)
+        reverse = direction == 'p'
+
+        queryset = self.object_list.order_by(*self._order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            has_previous, has_next = more, True
+        else:
+            has_previous, has_next = values is not None, more
+
+        next_cursor = self._encode(rows[-1], 'n') if rows and has_next else None
+        previous_cursor = self._encode(rows[0], 'p') if rows and has_previous else None
+        if self.rows is not None:
+            rows = BoundRows(rows, self.rows.table)
+        return CursorPage(rows, self, cursor, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin: page with CursorPaginator on the view's ordering, reading
+    the token from the `cursor_kwarg` query parameter. Also configures the
+    table of a django_tables2 SingleTableView the same way (the table's own
+    column sorting then no longer applies).
+    """
+    paginator_class = CursorPaginator
+    cursor_kwarg = 'cursor'
+
+    def get_cursor_ordering(self):
+        ordering = self.get_ordering() or ()
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(
+            queryset, page_size, ordering=self.get_cursor_ordering(),
+            cursor=self.request.GET.get(self.cursor_kwarg),
+        )
+        try:
+            page = paginator.page()
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_table_pagination(self, table):
+        paginate = super().get_table_pagination(table)
+        if paginate is False:
+            return paginate
+        paginate = dict(paginate) if isinstance(paginate, dict) else {}
+        paginate.update(
+            paginator_class=self.paginator_class,
+            ordering=self.get_cursor_ordering(),
+            cursor=self.request.GET.get(self.cursor_kwarg),
+            silent=False,
+        )
+        return paginate
+
+
+####################################################################################
+
+####################################################################################
+
+
+# Whole tables whose row count signals keep as a running total
+RUNNING_TOTALS = {
+    'store.item': counters.ITEMS,
+    'transactions.sale': counters.SALES,
+    'transactions.saledetail': counters.SALE_LINES,
+}
+
+
+def _unfiltered(queryset):
+    query = queryset.query
+    return not query.where and not query.distinct and not query.is_sliced and query.combinator is None
+
+
+def _planner_estimate(queryset):
+    """Rows the database expects `queryset` to return, or None when it won't say."""
+    connection = connections[queryset.db]
+    try:
+        if connection.vendor == 'postgresql':
+            sql, params = queryset.order_by().query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        if connection.vendor == 'sqlite' and _unfiltered(queryset):
+            # Table sizes recorded by the last ANALYZE; the stat column starts with the row count
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    except (DatabaseError, LookupError, ValueError, TypeError):
+        return None
+    return None
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator whose count comes, when it is above APPROXIMATE_COUNT_THRESHOLD,
+    from a running total (whole tables in RUNNING_TOTALS) or the planner's
+    estimate, instead of COUNT(*). Smaller lists, and lists the database
+    cannot estimate, are counted exactly. `count_is_approximate` tells which.
+
+    An estimate may be off, so pages past the estimated last page are still
+    served while they have rows, and a page with no page after it replaces
+    the estimate with the exact count. Until then get_elided_page_range only
+    links pages up to `last_confirmed_page`, the furthest seen to have rows.
+    """
+    count_is_approximate = False
+    last_confirmed_page = 1
+
+    def _queryset(self):
+        if isinstance(self.object_list, BoundRows):
+            # django_tables2 hands over the table's rows
+            return self.object_list.data.data
+        return self.object_list
+
+    @cached_property
+    def count(self):
+        queryset = self._queryset()
+        if not hasattr(queryset, 'query'):
+            return super().count
+
+        threshold = settings.APPROXIMATE_COUNT_THRESHOLD
+        label = queryset.model._meta.label_lower
+        if label in RUNNING_TOTALS and _unfiltered(queryset):
+            estimate = counters.read_counter(RUNNING_TOTALS[label])
+        else:
+            estimate = _planner_estimate(queryset)
+
+        if estimate is not None and estimate > threshold:
+            self.count_is_approximate = True
+            return estimate
+        return queryset.count()
+
+    def validate_number(self, number):
+        # Reading self.count first settles count_is_approximate
+        if not self.count or not self.count_is_approximate:
+            return super().validate_number(number)
+        # The estimate may be short, so the last page is only known once reached
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        # One row more than the page holds tells whether another page follows
+        rows = self.object_list[bottom:bottom + self.per_page + 1]
+        if isinstance(rows, BoundRows):
+            records = list(rows.data)
+            object_list = BoundRows(records[:self.per_page], rows.table)
+        else:
+            records = list(rows)
+            object_list = records[:self.per_page]
+        if number > 1 and not records:
+            raise EmptyPage(self.error_messages['no_results'])
+        has_more = len(records) > self.per_page
+        if not has_more:
+            # This is the last page, so the count is now known exactly
+            self.__dict__['count'] = bottom + len(records)
+            self.__dict__.pop('num_pages', None)
+            self.count_is_approximate = False
+        self.last_confirmed_page = max(self.last_confirmed_page, number + 1 if has_more else number)
+        return ApproximatePage(object_list, number, self, has_more=has_more)
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        if not self.count_is_approximate:
+            yield from super().get_elided_page_range(number, on_each_side=on_each_side, on_ends=on_ends)
+            return
+        # Pages past the last one seen to have rows may not exist
+        number = self.validate_number(number)
+        last = max(number, self.last_confirmed_page)
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, min(number + on_each_side, last) + 1)
+        else:
+            yield from range(1, min(number + on_each_side, last) + 1)
+
+
+class ApproximatePage(Page):
+    """Page of a list whose count is estimated; knows if a next page exists."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
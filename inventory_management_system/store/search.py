@@ -0,0 +1,263 @@
+"""
+Module: search.py
+
+Ranked full-text search over items, backed by a database-specific index.
+
+SQLite keeps an FTS5 table (store_item_fts) whose rowid is the item id.
+PostgreSQL keeps a side table (store_item_search) with one weighted tsvector
+per item behind a GIN index. Both index the item name, description, category
+and vendor, and are kept current by the signals in store/signals.py. On any
+other database search_items returns None and callers fall back to icontains
+filtering.
+
+For misspelt names, similar_items matches item names by trigram similarity:
+with pg_trgm and a trigram GIN index on PostgreSQL, and with the in-process
+trigram index of store/autocomplete.py elsewhere.
+
+Functions:
+- search_available: Whether the database has a full-text index.
+- create_index: Creates the index table (used by the migration).
+- drop_index: Drops the index table (used by the migration).
+- reindex_items: Rebuilds the index rows of some or all items.
+- remove_items: Deletes the index rows of deleted items.
+- search_items: Filters an Item queryset by a query and orders it by relevance.
+- create_trigram_index: Enables pg_trgm and indexes item names (used by the migration).
+- drop_trigram_index: Drops the trigram index (used by the migration).
+- similar_items: Filters an Item queryset to names similar to a query.
+"""
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from accounts.models import Vendor
+from .autocomplete import index
+from .models import Category, Item
+
+
+FTS_TABLE = 'store_item_fts'
+TSVECTOR_TABLE = 'store_item_search'
+
+# Relative weight of each column when ranking: name, description, category, vendor
+FTS_WEIGHTS = (10.0, 1.0, 4.0, 4.0)
+
+
+def search_available(connection=default_connection):
+    """Return True if the database supports the full-text index."""
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def create_index(connection=default_connection):
+    """Create the index table for the current database, if supported."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "name, description, category, vendor, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TSVECTOR_TABLE} ("
+                f"item_id bigint PRIMARY KEY REFERENCES {Item._meta.db_table} (id) "
+                "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TSVECTOR_TABLE}_document "
+                f"ON {TSVECTOR_TABLE} USING GIN (document)"
+            )
+
+
+def drop_index(connection=default_connection):
+    """Drop the index table for the current database, if supported."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP TABLE IF EXISTS {TSVECTOR_TABLE}")
+
+
+def _documents_sql(where):
+    """SELECT of (item id, name, description, category, vendor) rows to index."""
+    return (
+        "SELECT i.id, i.name, i.description, c.name, COALESCE(v.name, '') "
+        f"FROM {Item._meta.db_table} i "
+        f"INNER JOIN {Category._meta.db_table} c ON c.id = i.category_id "
+        f"LEFT OUTER JOIN {Vendor._meta.db_table} v ON v.id = i.vendor_id "
+        f"WHERE {where}"
+    )
+
+
+def reindex_items(item_ids=None, category_id=None, vendor_id=None, connection=default_connection):
+    """
+    Rebuild the index rows of the given items, of every item in a category
+    or of a vendor, or of all items when no filter is given.
+    """
+    if not search_available(connection):
+        return
+
+    if item_ids is not None:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+        where = f"i.id IN ({', '.join(['%s'] * len(item_ids))})"
+        params = item_ids
+    elif category_id is not None:
+        where, params = "i.category_id = %s", [category_id]
+    elif vendor_id is not None:
+        where, params = "i.vendor_id = %s", [vendor_id]
+    else:
+        where, params = "1 = 1", []
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                f"(SELECT i.id FROM {Item._meta.db_table} i WHERE {where})",
+                params
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, category, vendor) "
+                + _documents_sql(where),
+                params
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {TSVECTOR_TABLE} (item_id, document) "
+                "SELECT id, "
+                "setweight(to_tsvector('simple', name), 'A') || "
+                "setweight(to_tsvector('simple', category), 'B') || "
+                "setweight(to_tsvector('simple', vendor), 'B') || "
+                "setweight(to_tsvector('simple', description), 'C') "
+                f"FROM ({_documents_sql(where)}) AS docs (id, name, description, category, vendor) "
+                "ON CONFLICT (item_id) DO UPDATE SET document = EXCLUDED.document",
+                params
+            )
+
+
+def remove_items(item_ids, connection=default_connection):
+    """Delete the index rows of the given (deleted) items."""
+    item_ids = list(item_ids)
+    if not item_ids or not search_available(connection):
+        return
+
+    placeholders = ', '.join(['%s'] * len(item_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", item_ids)
+        else:
+            cursor.execute(f"DELETE FROM {TSVECTOR_TABLE} WHERE item_id IN ({placeholders})", item_ids)
+
+
+def _fts_query(terms):
+    # Every term must match, as a prefix so results follow the user's typing
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join("'{}':*".format(term.replace("'", "''").replace('\\', '')) for term in terms)
+
+
+def search_items(queryset, query, connection=default_connection):
+    """
+    Restrict an Item queryset to items matching every word of `query`,
+    ordered by relevance (best first).
+
+    Returns None if the database has no full-text index or the query has no
+    searchable words, so the caller can fall back to substring matching.
+    """
+    terms = [term for term in query.split() if any(ch.isalnum() for ch in term)]
+    if not terms or not search_available(connection):
+        return None
+
+    item_table = Item._meta.db_table
+    if connection.vendor == 'sqlite':
+        match = _fts_query(terms)
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        matching = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        # bm25() is lower for better matches
+        rank = RawSQL(
+            f"SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {item_table}.id",
+            [match]
+        )
+        ordering = ('search_rank', 'pk')
+    else:
+        tsquery = _tsquery(terms)
+        matching = RawSQL(
+            f"SELECT item_id FROM {TSVECTOR_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+            [tsquery]
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {TSVECTOR_TABLE} "
+            f"WHERE item_id = {item_table}.id",
+            [tsquery]
+        )
+        ordering = ('-search_rank', 'pk')
+
+    return queryset.filter(pk__in=matching).annotate(search_rank=rank).order_by(*ordering)
+
+
+####################################################################################
+
+####################################################################################
+
+
+TRIGRAM_INDEX = 'store_item_name_trgm'
+
+# Most similar items a fuzzy search returns
+MAX_SIMILAR = 100
+
+
+def create_trigram_index(connection=default_connection):
+    """Enable pg_trgm and add a trigram GIN index on item names (PostgreSQL only)."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} "
+            f"ON {Item._meta.db_table} USING GIN (name gin_trgm_ops)"
+        )
+
+
+def drop_trigram_index(connection=default_connection):
+    """Drop the trigram index on item names (PostgreSQL only)."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+def similar_items(queryset, query, threshold=None, connection=default_connection):
+    """
+    Restrict an Item queryset to items whose name has a trigram similarity
+    of at least `threshold` (default ITEM_FUZZY_THRESHOLD) with `query`,
+    most similar first.
+    """
+    threshold = settings.ITEM_FUZZY_THRESHOLD if threshold is None else threshold
+    item_table = Item._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        # The % operator is what the GIN index serves. Its threshold is set
+        # for this transaction only, so pooled connections don't keep it.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL pg_trgm.similarity_threshold = {float(threshold)}")
+            cursor.execute(
+                f"SELECT id, similarity(name, %s) FROM {item_table} WHERE name %% %s "
+                f"ORDER BY 2 DESC, id LIMIT {MAX_SIMILAR}",
+                [query, query],
+            )
+            similar = cursor.fetchall()
+    else:
+        index.ensure_built()
+        similar = index.similar(query, threshold, MAX_SIMILAR)
+    return queryset.filter(pk__in=[item_id for item_id, _ in similar]).annotate(
+        similarity=Case(
+            *[When(pk=item_id, then=Value(score)) for item_id, score in similar],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    ).order_by('-similarity', 'pk')
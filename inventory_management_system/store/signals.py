@@ -0,0 +1,198 @@
+"""
+Keeps the full-text item search index (store/search.py), the in-process
+autocomplete index (store/autocomplete.py) and the barcode scan cache
+(store/barcodes.py) in step with the items, categories, vendors and
+barcodes they are built from, the dashboard counters
+(store/counters.py) in step with the rows they count, and the model
+versions (store/versions.py) that key cached list fragments.
+"""
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Customer, Profile, Vendor
+from bills.models import Bill
+from invoice.models import Invoice
+from transactions.models import Purchase, Sale, SaleDetail
+from . import counters
+from .autocomplete import index as autocomplete_index
+from .barcodes import forget_codes, forget_item_codes
+from .models import Category, Delivery, Item, ItemBarcode, ItemStockShard
+from .search import reindex_items, remove_items
+from .versions import CATALOG, bump_version
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, raw=False, **kwargs):
+    """Re-index an item whenever it is saved."""
+    if not raw:
+        reindex_items([instance.pk])
+        transaction.on_commit(lambda: autocomplete_index.update(instance))
+        transaction.on_commit(lambda: forget_item_codes(item_id=instance.pk))
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance, **kwargs):
+    """Drop a deleted item from the index."""
+    item_id = instance.pk
+    remove_items([item_id])
+    transaction.on_commit(lambda: autocomplete_index.remove(item_id))
+
+
+@receiver(post_save, sender=Category)
+def index_category_items(sender, instance, created, raw=False, **kwargs):
+    """Re-index the items of a renamed category."""
+    if not created and not raw:
+        reindex_items(category_id=instance.pk)
+        transaction.on_commit(lambda: _refresh_autocomplete(category=instance))
+        transaction.on_commit(lambda: forget_item_codes(item__category=instance))
+
+
+@receiver(post_save, sender=Vendor)
+def index_vendor_items(sender, instance, created, raw=False, **kwargs):
+    """Re-index the items of a renamed vendor."""
+    if not created and not raw:
+        reindex_items(vendor_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Vendor)
+def remember_vendor_items(sender, instance, **kwargs):
+    """Note the items of a vendor about to be deleted (their vendor is set to NULL)."""
+    instance._indexed_item_ids = list(instance.item_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Vendor)
+def index_former_vendor_items(sender, instance, **kwargs):
+    """Re-index the items that lost their vendor."""
+    reindex_items(getattr(instance, '_indexed_item_ids', []))
+
+
+@receiver(pre_save, sender=ItemBarcode)
+def remember_previous_code(sender, instance, raw=False, **kwargs):
+    """Note the code a barcode had before an edit, so its cached lookup can be dropped."""
+    if instance.pk and not raw:
+        instance._previous_code = ItemBarcode.objects.filter(
+            pk=instance.pk
+        ).values_list('code', flat=True).first()
+
+
+@receiver(post_save, sender=ItemBarcode)
+def forget_saved_code(sender, instance, **kwargs):
+    """Drop the cached lookups of a new, edited or reassigned code."""
+    codes = {instance.code, getattr(instance, '_previous_code', None)} - {None}
+    transaction.on_commit(lambda: forget_codes(codes))
+
+
+@receiver(post_delete, sender=ItemBarcode)
+def forget_deleted_code(sender, instance, **kwargs):
+    """Drop the cached lookup of a deleted code (also runs when its item is deleted)."""
+    code = instance.code
+    transaction.on_commit(lambda: forget_codes([code]))
+
+
+def _refresh_autocomplete(**lookup):
+    if not autocomplete_index.is_built:
+        return
+    for item in Item.objects.filter(**lookup).select_related('category').iterator():
+        autocomplete_index.update(item)
+
+
+####################################################################################
+
+####################################################################################
+
+
+# What an item shows in the catalog; editing any of these moves CATALOG
+CATALOG_FIELDS = ('name', 'price', 'category_id')
+
+
+@receiver(pre_save, sender=Item)
+def remember_item_quantity(sender, instance, raw=False, **kwargs):
+    """Note the stored quantity and catalog fields of an item about to be edited."""
+    if instance.pk and not raw:
+        stored = Item.objects.filter(pk=instance.pk).values_list('quantity', *CATALOG_FIELDS).first()
+        if stored is not None:
+            instance._previous_quantity = stored[0]
+            instance._previous_catalog = stored[1:]
+
+
+@receiver(post_save, sender=Item)
+def count_item(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Count a new item and its stock, or the stock entered on an edited one."""
+    if raw or (update_fields is not None and 'quantity' not in update_fields):
+        return
+    if created:
+        counters.bump(counters.ITEMS)
+        counters.bump(counters.STOCK_ON_HAND, instance.quantity)
+    elif not instance.stock_sharded:
+        previous = getattr(instance, '_previous_quantity', None)
+        if previous is not None:
+            counters.bump(counters.STOCK_ON_HAND, instance.quantity - previous)
+
+
+@receiver(pre_delete, sender=Item)
+def uncount_item(sender, instance, **kwargs):
+    """Take a deleted item and the stock it held off the counters."""
+    if instance.stock_sharded:
+        on_hand = ItemStockShard.objects.filter(item=instance).aggregate(total=Sum('quantity'))['total'] or 0
+    else:
+        on_hand = Item.objects.filter(pk=instance.pk).values_list('quantity', flat=True).first() or 0
+    counters.bump(counters.ITEMS, -1)
+    counters.bump(counters.STOCK_ON_HAND, -on_hand)
+
+
+def _count_rows(model, name):
+    """Keep counter `name` equal to the number of `model` rows."""
+    def on_save(sender, instance, created, raw=False, **kwargs):
+        if created and not raw:
+            counters.bump(name)
+
+    def on_delete(sender, instance, **kwargs):
+        counters.bump(name, -1)
+
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f'count_{name}')
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=f'uncount_{name}')
+
+
+_count_rows(Profile, counters.PROFILES)
+_count_rows(Delivery, counters.DELIVERIES)
+_count_rows(Sale, counters.SALES)
+# write_sale_lines() counts the lines it bulk-inserts itself
+_count_rows(SaleDetail, counters.SALE_LINES)
+
+
+####################################################################################
+
+####################################################################################
+
+
+def _version_rows(model):
+    """Move the version of `model` forward whenever one of its rows changes."""
+    def on_change(sender, instance, raw=False, **kwargs):
+        if not raw:
+            bump_version(sender)
+
+    post_save.connect(on_change, sender=model, weak=False, dispatch_uid=f'version_{model._meta.label}')
+    post_delete.connect(on_change, sender=model, weak=False, dispatch_uid=f'unversion_{model._meta.label}')
+
+
+for _model in (Item, Category, Delivery, Profile, Vendor, Customer, Sale, Purchase, Invoice, Bill):
+    _version_rows(_model)
+
+
+@receiver(post_save, sender=Item)
+def version_catalog(sender, instance, created, raw=False, **kwargs):
+    """Move the catalog version for a new item or an edit to what the catalog shows."""
+    if raw:
+        return
+    current = tuple(getattr(instance, field) for field in CATALOG_FIELDS)
+    if created or getattr(instance, '_previous_catalog', None) != current:
+        bump_version(CATALOG)
+
+
+@receiver(post_delete, sender=Item)
+def unversion_catalog(sender, instance, **kwargs):
+    """Move the catalog version once an item is gone."""
+    bump_version(CATALOG)
@@ -0,0 +1,20 @@
+from django import template
+
+from store.versions import get_versions
+
+register = template.Library()
+
+
+@register.simple_tag
+def model_versions(*models):
+    """
+    Versions of the given models as one string, for {% cache %} keys:
+
+        {% model_versions 'store.Delivery' 'store.ItemCatalog' as rows_version %}
+        {% cache 600 delivery_rows rows_version page_obj.cursor %}
+
+    'store.ItemCatalog' is the catalog version (CATALOG in store/versions.py);
+    use it instead of 'store.Item' for rows that show no stock, as every
+    sale moves the Item version.
+    """
+    return get_versions(*models)
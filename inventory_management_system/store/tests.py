@@ -1,3 +1,302 @@
-from django.test import TestCase
+import datetime
+import json
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Customer
+from transactions.services import enable_stock_sharding, record_sale, save_item, set_stock
+from . import counters, global_search as global_search_module
+from .autocomplete import index as autocomplete_index
+from .cache import LOCK_PREFIX, get_or_compute
+from .catalog import get_catalog
+from .choices import label_choices, search_choices
+from .global_search import global_search
+from .models import Category, Delivery, Item
+from .pagination import CursorPaginator
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        # Three deliveries share each timestamp, so pages split ties on date
+        Delivery.objects.bulk_create([
+            Delivery(customer_name=f'Customer {i}', date=now - datetime.timedelta(days=i // 3))
+            for i in range(17)
+        ])
+
+    def walk(self, ordering, per_page):
+        """Page forward to the end, then back to the start; returns both lists of pages."""
+        paginator = CursorPaginator(Delivery.objects.all(), per_page, ordering=ordering)
+        page = paginator.page()
+        forward = [[delivery.pk for delivery in page]]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            forward.append([delivery.pk for delivery in page])
+        backward = []
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward.append([delivery.pk for delivery in page])
+        return forward, backward
+
+    def test_pages_forward_and_back_across_equal_timestamps(self):
+        for ordering, tie_break, per_page in ((['-date'], '-id', 4), (['date'], 'id', 5)):
+            forward, backward = self.walk(ordering, per_page)
+            expected = list(Delivery.objects.order_by(*ordering, tie_break).values_list('pk', flat=True))
+            self.assertEqual([pk for page in forward for pk in page], expected)
+            self.assertTrue(all(len(page) == per_page for page in forward[:-1]))
+            self.assertEqual(backward, forward[-2::-1])
+
+    def test_invalid_cursor_is_not_found(self):
+        user = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(user)
+        url = reverse('store:deliveries')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Not base64, then valid base64 of a cursor with the wrong number of values
+        for cursor in ('not-a-cursor!!', 'WyJuIixbMV1d'):
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_single_flight(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute('answer', compute, 10)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_copy_served_while_another_caller_recomputes(self):
+        # An entry past its expiry (value, compute time, expires at) ...
+        cache.set('answer', (41, 0.0, time.time() - 1), 60)
+        # ... whose recomputation another caller holds the lock for
+        cache.add(f'{LOCK_PREFIX}answer', 'other-caller', 60)
+
+        self.assertEqual(get_or_compute('answer', lambda: 42, 10), 41)
+
+        cache.delete(f'{LOCK_PREFIX}answer')
+        self.assertEqual(get_or_compute('answer', lambda: 42, 10), 42)
+        self.assertEqual(get_or_compute('answer', lambda: 43, 10), 42)
+
+
+class DashboardCounterTests(TestCase):
+    def test_counters_follow_writes(self):
+        category = Category.objects.create(name='Drinks')
+        customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        water = Item.objects.create(name='Water', description='Still', category=category, quantity=5, price=1)
+        juice = Item.objects.create(name='Juice', description='Fresh', category=category, quantity=4, price=2)
+        enable_stock_sharding(juice.pk, shards=2)
+        with transaction.atomic():
+            record_sale(
+                customer_id=customer.pk,
+                lines=[{'id': water.pk, 'price': '1', 'quantity': 2}, {'id': juice.pk, 'price': '2', 'quantity': 1}],
+                sub_total=Decimal('4'), tax_percentage=Decimal('0'), amount_paid=Decimal('4'),
+            )
+        Delivery.objects.create(customer_name='Ada', date=timezone.now())
+
+        totals = counters.read_counters()
+        self.assertEqual(totals[counters.ITEMS], 2)
+        self.assertEqual(totals[counters.STOCK_ON_HAND], 6)
+        self.assertEqual(totals[counters.SALES], 1)
+        self.assertEqual(totals[counters.SALE_LINES], 2)
+        self.assertEqual(totals[counters.DELIVERIES], 1)
+        self.assertEqual(totals, counters.compute_totals())
+
+        Item.objects.create(name='Soda', description='Fizzy', category=category, quantity=3, price=1).delete()
+        self.assertEqual(counters.read_counters(), counters.compute_totals())
+
+
+class ItemCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=self.category, quantity=5, price=1
+        )
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def test_sales_leave_the_catalog_alone(self):
+        before = get_catalog()
+        self.assertEqual(json.loads(before['content'])['items'], [[self.item.pk, 'Water', '1.00']])
+        with self.captureOnCommitCallbacks(execute=True):
+            record_sale(
+                customer_id=self.customer.pk,
+                lines=[{'id': self.item.pk, 'price': '1', 'quantity': 2}],
+                sub_total=Decimal('2'), tax_percentage=Decimal('0'), amount_paid=Decimal('2'),
+            )
+        self.assertEqual(get_catalog()['version'], before['version'])
+
+        # Saving without touching name, price or category keeps it too
+        item = Item.objects.get(pk=self.item.pk)
+        item.description = 'Sparkling'
+        with self.captureOnCommitCallbacks(execute=True):
+            save_item(item)
+        self.assertEqual(get_catalog()['version'], before['version'])
+
+    def test_price_edit_moves_the_catalog(self):
+        before = get_catalog()
+        item = Item.objects.get(pk=self.item.pk)
+        item.price = Decimal('1.50')
+        with self.captureOnCommitCallbacks(execute=True):
+            save_item(item)
+        after = get_catalog()
+        self.assertNotEqual(after['version'], before['version'])
+        self.assertEqual(json.loads(after['content'])['items'], [[self.item.pk, 'Water', '1.50']])
+
+
+class ProductRowsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['template_fragments'].clear()
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=5, price=1
+        )
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def page(self):
+        response = self.client.get(reverse('store:product-list'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_rows_show_the_current_quantity(self):
+        self.assertIn('<td>5</td>', self.page())
+        with self.captureOnCommitCallbacks(execute=True):
+            record_sale(
+                customer_id=self.customer.pk,
+                lines=[{'id': self.item.pk, 'price': '1', 'quantity': 2}],
+                sub_total=Decimal('2'), tax_percentage=Decimal('0'), amount_paid=Decimal('2'),
+            )
+        self.assertIn('<td>3</td>', self.page())
+
+
+class DashboardConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=5, price=1
+        )
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse('store:dashboard'), headers=headers)
+
+    def test_stock_changes_are_seen_but_other_item_edits_are_not(self):
+        first = self.get()
+        self.assertContains(first, '<div class="card-value">5</div>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            set_stock(self.item.pk, 8)
+        second = self.get(first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertContains(second, '<div class="card-value">8</div>')
+
+        item = Item.objects.get(pk=self.item.pk)
+        item.description = 'Sparkling'
+        with self.captureOnCommitCallbacks(execute=True):
+            save_item(item)
+        self.assertEqual(self.get(second['ETag']).status_code, 304)
+
+
+class SearchChoicesTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Drinks')
+        Item.objects.bulk_create([
+            Item(name=f'Water {i:02}', description='Still', category=category, quantity=i, price=1)
+            for i in range(25)
+        ] + [Item(name='Juice', description='Fresh', category=category, quantity=1, price=2)])
+        Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def test_pages_are_answered_by_a_limited_prefix_query(self):
+        with self.assertNumQueries(1) as captured:
+            first, more = search_choices('store.Item', 'wat')
+        self.assertIn('LIMIT 21', captured.captured_queries[0]['sql'])
+        self.assertEqual((len(first), more), (20, True))
+        self.assertEqual(first[0][1], 'Water 00 - Category: Drinks')
+
+        second, more = search_choices('store.Item', 'WAT', page=2)
+        self.assertEqual([label for _, label in second][-1], 'Water 24 - Category: Drinks')
+        self.assertEqual((len(second), more), (5, False))
+        # Names starting with the term only
+        self.assertEqual(search_choices('store.Item', 'ice'), ([], False))
+
+    def test_customers_match_either_name_first(self):
+        for term in ('ada lo', 'Lovelace A'):
+            self.assertEqual([label for _, label in search_choices('accounts.Customer', term)[0]], ['Ada Lovelace'])
+
+    def test_selected_options_are_looked_up_by_pk(self):
+        juice = Item.objects.get(name='Juice')
+        self.assertEqual(label_choices('store.Item', [str(juice.pk), 'not-a-pk']), [(juice.pk, 'Juice - Category: Drinks')])
+
+
+class ItemAutocompleteTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('till', password='password'))
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=5, price=1, image='items/water.png'
+        )
+        autocomplete_index.rebuild()
+
+    def test_payload_leaves_the_image_out(self):
+        response = self.client.post(
+            reverse('store:get_items'), {'term': 'wat'}, headers={'x-requested-with': 'XMLHttpRequest'}
+        )
+        self.assertEqual(response.status_code, 200)
+        [payload] = response.json()
+        self.assertEqual((payload['id'], payload['text'], payload['category']), (self.item.pk, 'Water', 'Drinks'))
+        self.assertNotIn('image', payload)
+
+
+class GlobalSearchSlotTests(SimpleTestCase):
+    def test_slot_is_held_until_overrunning_sources_finish(self):
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow(term, limit):
+            release.wait(5)
+            finished.set()
+            return []
+
+        sources = {'item': slow, 'vendor': lambda term, limit: []}
+        with mock.patch.object(global_search_module, 'SOURCES', sources), \
+                mock.patch.object(global_search_module, '_slots', threading.BoundedSemaphore(1)) as slots:
+            self.assertEqual(global_search('water', timeout=0.05)['timed_out'], ['item'])
+            # The slow source still runs on the pool, so the next search is turned away
+            self.assertEqual(global_search('water', timeout=0.05)['timed_out'], ['item', 'vendor'])
+
+            release.set()
+            finished.wait(5)
+            for _ in range(100):
+                if slots.acquire(blocking=False):
+                    slots.release()
+                    break
+                time.sleep(0.01)
+            self.assertEqual(global_search('water', timeout=1)['timed_out'], [])
@@ -29,6 +29,7 @@ urlpatterns = [
 
     # Item search
     path('search/', ItemSearchListView.as_view(), name='item_search_list_view'),
+    path('search/all/', views.global_search_view, name='global-search'),
 
     # Delivery URLs
     path('deliveries/', DeliveryListView.as_view(), name='deliveries'),
@@ -38,6 +39,9 @@ urlpatterns = [
 
     # AJAX view
     path('get-items/', views.get_items_ajax_view, name='get_items'),
+    path('scan/', views.item_scan_view, name='item-scan'),
+    path('catalog/', views.item_catalog_view, name='item-catalog'),
+    path('choices/<str:provider>/', views.choices_view, name='choices'),
 
     # Category URLs
     path('categories/', CategoryListView.as_view(), name='category-list'),
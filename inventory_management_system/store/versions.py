@@ -0,0 +1,76 @@
+"""
+Module: versions.py
+
+Version numbers of model data, for keying cached renderings of it.
+
+Every tracked model has a version in the default cache that moves forward
+when one of its rows is saved or deleted (see store/signals.py) or when the
+stock ledger changes item quantities in bulk. List templates put the
+versions of the models they show into their {% cache %} keys, so a change
+makes the old fragments unreachable instead of having to find and delete
+them; the LRU-bounded template_fragments cache then evicts them.
+
+Besides the model labels there is CATALOG, the version of what the item
+catalog shows: item names, prices and categories, and which items exist.
+It moves on those edits only, not on the stock changes every sale makes,
+so renderings that leave quantities out (or fetch them live) survive a
+sale.
+
+A version is the time in nanoseconds at which it was last set, so a version
+that was evicted or lost on restart never comes back to a value an old
+fragment was stored under. Bumps overwrite the version with a new time
+instead of incrementing it: on caches without an atomic incr (the
+file-based fallback when REDIS_URL is unset) two concurrent increments can
+land on the same value, leaving two different states under one version.
+
+Functions:
+- get_versions: Returns one key combining the versions of some models.
+- bump_version: Moves the versions of some models forward.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+CACHE_PREFIX = 'model-version:'
+
+# Moved by store/signals.py when an item is added, removed, renamed,
+# repriced or moved to another category
+CATALOG = 'store.ItemCatalog'
+
+_last_version = 0
+
+
+def _label(model):
+    """Accepts a model class or an 'app_label.ModelName' string."""
+    return model if isinstance(model, str) else model._meta.label
+
+
+def _key(model):
+    return f'{CACHE_PREFIX}{_label(model)}'
+
+
+def get_versions(*models):
+    """Return the versions of `models` joined into one string, e.g. '17.9'."""
+    keys = [_key(model) for model in models]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def bump_version(*models):
+    """Move the versions of `models` forward, once the transaction commits."""
+    keys = [_key(model) for model in models]
+
+    def bump():
+        global _last_version
+        # Strictly increasing within the process, even on a coarse clock
+        version = _last_version = max(time.time_ns(), _last_version + 1)
+        cache.set_many({key: version for key in keys}, None)
+
+    transaction.on_commit(bump)
@@ -5,16 +5,19 @@ from django.views.decorators.http import require_http_methods
 from django.core.exceptions import BadRequest
 
 # Django core imports
+from django.conf import settings
 from django.urls import reverse, reverse_lazy
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count
 from django.utils import timezone
 from datetime import timedelta
 
 # Authentication and permissions
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 
 # Class-based views
@@ -34,34 +37,60 @@ from django.core.exceptions import PermissionDenied, BadRequest
 from django.views.decorators.http import require_http_methods
 
 # Local app imports
-from accounts.models import Profile
+from accounts.permissions import AdminRequiredMixin
 from transactions.models import Sale
 from .models import Category, Item, Delivery
 from .forms import ItemForm, CategoryForm, DeliveryForm
 from .tables import ItemTable, DeliveryTable
+from .search import search_items, similar_items
+from .autocomplete import autocomplete_items
+from .global_search import global_search
+from .barcodes import lookup_barcode
+from .cache import get_or_compute
+from .choices import PROVIDERS, search_choices
+from .catalog import get_catalog
+from .conditional import ConditionalGetMixin, condition_on_versions, versions_etag
+from .pagination import ApproximateCountPaginator, CursorPaginationMixin
+from .versions import get_versions
+from . import counters
 
 import logging
+import re
 
 
 logger = logging.getLogger(__name__)
 
+# Same Accept-Encoding test as django.middleware.gzip
+GZIP_RE = re.compile(r'\bgzip\b')
+
 
 # Create your views here.
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
     template_name = "store/dashboard.html"
-    
+    # The models whose row counts the page shows; the catalog version covers
+    # items being added and removed, but not stock, which is read live
+    etag_models = ('accounts.Profile', 'store.ItemCatalog', 'store.Delivery', 'transactions.Sale')
+
+    def get_etag(self, request):
+        self.stock_on_hand = counters.read_counter(counters.STOCK_ON_HAND)
+        return versions_etag(request, self.etag_models, extra=(self.stock_on_hand,))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Basic counts
-        context['profiles_count'] = Profile.objects.count()
-        context['total_items'] = Item.objects.aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        context['delivery_count'] = Delivery.objects.count()
-        context['sales_count'] = Sale.objects.count()
-        context['items_count'] = Item.objects.count()
+        # Basic counts, kept as running totals (see store/counters.py) and
+        # shared by every worker until one of the counted models changes
+        totals = get_or_compute(
+            f"dashboard-counters:{get_versions(*self.etag_models)}",
+            counters.read_counters,
+            settings.DASHBOARD_CACHE_TIMEOUT,
+        )
+        context['profiles_count'] = totals[counters.PROFILES]
+        context['total_items'] = self.stock_on_hand
+        context['delivery_count'] = totals[counters.DELIVERIES]
+        context['sales_count'] = totals[counters.SALES]
+        context['items_count'] = totals[counters.ITEMS]
 
         
         # Optimized queries with select_related
@@ -99,20 +128,12 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
         return super().form_invalid(form)
 
 
-class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class ProductUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
     model = Item
     form_class = ItemForm
     template_name = "store/product_form.html"
     success_url = reverse_lazy('store:product-list')
-
-    def test_func(self):
-        """Allow superusers, admins, and users with change permission"""
-        user = self.request.user
-        return (
-            user.is_superuser or 
-            user.has_perm('store.change_item') or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
+    permission_required = 'store.change_item'
 
     def form_valid(self, form):
         """Handle successful form submission"""
@@ -131,19 +152,11 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 
-class ProductDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class ProductDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     model = Item
     template_name = "store/product_confirm_delete.html"
     success_url = reverse_lazy('store:product-list')
-
-    def test_func(self):
-        """Allow superusers, admins, and users with delete permission"""
-        user = self.request.user
-        return (
-            user.is_superuser or 
-            user.has_perm('store.delete_item') or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
+    permission_required = 'store.delete_item'
 
     def form_valid(self, form):
         """Handle successful deletion"""
@@ -164,7 +177,7 @@ class ProductDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return context
     
 
-class ProductListView(LoginRequiredMixin, ExportMixin, SingleTableView):
+class ProductListView(LoginRequiredMixin, ConditionalGetMixin, ExportMixin, SingleTableView):
     """
     Enhanced product list view with optimized queries and export options
     
@@ -178,9 +191,11 @@ class ProductListView(LoginRequiredMixin, ExportMixin, SingleTableView):
     template_name = "store/products_list.html"
     context_object_name = "items"
     paginate_by = 10
+    paginator_class = ApproximateCountPaginator  # No COUNT(*) over a large catalog
     export_name = "products"  # Base filename for exports
     export_trigger_param = "export"  # URL parameter for exports
     context_object_name = "items"
+    etag_models = ('store.Item', 'store.Category', 'accounts.Vendor')
     
     # Optimize database queries
     def get_queryset(self):
@@ -188,8 +203,10 @@ class ProductListView(LoginRequiredMixin, ExportMixin, SingleTableView):
             'category', 'vendor'
         ).only(
             'name', 
+            'slug',
             'price', 
             'quantity',
+            'expiring_date',
             'category__name',
             'vendor__name'
         )
@@ -202,14 +219,18 @@ class ProductListView(LoginRequiredMixin, ExportMixin, SingleTableView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['products'] = Item.objects.all()  # Or filter as needed
+        if context.get('is_paginated'):
+            # Links around the current page only; the count may run to millions
+            context['elided_page_range'] = context['paginator'].get_elided_page_range(context['page_obj'].number)
         return context
     
 
 class ItemSearchListView(ProductListView):
     """
     Enhanced item search with:
-    - Search across multiple fields (name, category, vendor)
-    - More flexible search logic
+    - Ranked full-text search over name, description, category and vendor
+    - Typo-tolerant trigram matching on the name when nothing matches as typed
+    - Substring matching on databases without a full-text index
     - Preserved original filtering capabilities
     """
     paginate_by = 10
@@ -217,7 +238,17 @@ class ItemSearchListView(ProductListView):
     def get_queryset(self):
         queryset = super().get_queryset()
         query = self.request.GET.get("q")
-        
+
+        if query:
+            ranked = search_items(queryset, query)
+            if ranked is not None and ranked.exists():
+                return ranked
+
+            # Nothing matched as typed; try names that look like a misspelling
+            similar = similar_items(queryset, query)
+            if similar.exists():
+                return similar
+
         if query:
             query_list = query.split()
             # Search across multiple fields with OR between terms
@@ -273,21 +304,13 @@ class DeliveryCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class DeliveryUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class DeliveryUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
     model = Delivery
     form_class = DeliveryForm
     template_name = "store/delivery_form.html"
     success_url = reverse_lazy('store:deliveries')
-    
-    def test_func(self):
-        """Allow superusers, admins, and users with change permission"""
-        user = self.request.user
-        return (
-            user.is_superuser or
-            user.has_perm('store.change_delivery') or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
-    
+    permission_required = 'store.change_delivery'
+
     def form_valid(self, form):
         """Handle successful form submission with rich message"""
         response = super().form_valid(form)
@@ -298,20 +321,12 @@ class DeliveryUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         )
         return response
 
-class DeliveryDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class DeliveryDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     model = Delivery
     template_name = "store/delivery_confirm_delete.html"
     success_url = reverse_lazy('store:deliveries')
-    
-    def test_func(self):
-        """Allow superusers, admins, and users with delete permission"""
-        user = self.request.user
-        return (
-            user.is_superuser or
-            user.has_perm('store.delete_delivery') or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
-    
+    permission_required = 'store.delete_delivery'
+
     def form_valid(self, form):
         """Handle successful deletion with rich message"""
         delivery = self.get_object()
@@ -330,12 +345,13 @@ class DeliveryDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return context
     
 
-class DeliveryListView(LoginRequiredMixin, ExportMixin, tables.SingleTableView):
+class DeliveryListView(LoginRequiredMixin, ExportMixin, CursorPaginationMixin, tables.SingleTableView):
     model = Delivery
     table_class = DeliveryTable  # Add custom table configuration
     template_name = "store/deliveries.html"
     context_object_name = "deliveries"
     paginate_by = 10
+    ordering = ['-date']  # Cursor pages on the date index
     export_name = "deliveries_export"  # Better export filename
     
     def get_queryset(self):
@@ -374,20 +390,12 @@ class CategoryCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class CategoryUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class CategoryUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
     model = Category
     form_class = CategoryForm
     template_name = 'store/category_form.html'
     success_url = reverse_lazy('store:category-list')
-
-    def test_func(self):
-        """Allow superusers, admins, and staff to delete categories"""
-        user = self.request.user
-        return (
-            user.is_superuser or 
-            user.is_staff or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
+    allow_staff = True  # Staff may manage categories too
 
     def form_valid(self, form):
         """Handle successful form submission with rich message"""
@@ -403,20 +411,12 @@ class CategoryUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     #     return reverse_lazy('store:category-detail', kwargs={'pk': self.object.pk})
 
 
-class CategoryDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class CategoryDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     model = Category
     template_name = 'store/category_confirm_delete.html'
     context_object_name = 'category'
     success_url = reverse_lazy('store:category-list')
-
-    def test_func(self):
-        """Allow superusers, admins, and staff to delete categories"""
-        user = self.request.user
-        return (
-            user.is_superuser or 
-            user.is_staff or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
+    allow_staff = True  # Staff may manage categories too
 
     def form_valid(self, form):
         """Handle successful deletion with rich message"""
@@ -457,6 +457,7 @@ class CategoryListView(LoginRequiredMixin, ListView):
 # (used for real-time suggestions or dynamic filtering).
 @require_http_methods(["GET", "POST"])
 @login_required
+@condition_on_versions('store.Item', 'store.Category')
 def item_search(request):
     """AJAX endpoint for item search with better error handling"""
     if not request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -467,12 +468,7 @@ def item_search(request):
         return JsonResponse({'error': 'Search term too short'}, status=400)
 
     try:
-        items = Item.objects.filter(
-            Q(name__icontains=term) |
-            Q(category__name__icontains=term)
-        )[:10]
-        data = [item.to_json() for item in items]
-        return JsonResponse(data, safe=False)
+        return JsonResponse(autocomplete_items(term), safe=False)
     except Exception as e:
         return JsonResponse({'error': 'Server error'}, status=500)
     
@@ -496,14 +492,7 @@ def get_items_ajax_view(request):
         if not search_term:
             return JsonResponse([], safe=False)
         
-        items = Item.objects.filter(
-            name__icontains=search_term
-        ).select_related('category', 'vendor')[:10]
-        
-        return JsonResponse(
-            [item.to_json() for item in items],
-            safe=False
-        )
+        return JsonResponse(autocomplete_items(search_term), safe=False)
         
     except Exception as e:
         logger.error(f"Error in item search: {str(e)}")
@@ -512,3 +501,88 @@ def get_items_ajax_view(request):
             status=500
         )
 
+
+
+# Barcode scanner lookup at the till: one exact code, one item
+@require_http_methods(["GET"])
+@login_required
+def item_scan_view(request):
+    """
+    Resolve a scanned barcode/SKU to the item's JSON payload.
+    Answers from the cache when the code was scanned recently.
+    """
+    payload = lookup_barcode(request.GET.get('code'))
+    if payload is None:
+        return JsonResponse({'error': 'Unknown barcode'}, status=404)
+    return JsonResponse(payload)
+
+
+# One search box over items, customers, vendors, sales, purchases, invoices and bills
+@require_http_methods(["GET"])
+@login_required
+@condition_on_versions(
+    'store.Item', 'store.Category', 'accounts.Customer', 'accounts.Vendor',
+    'transactions.Sale', 'transactions.Purchase', 'invoice.Invoice', 'bills.Bill',
+)
+def global_search_view(request):
+    """
+    JSON endpoint for the global search box.
+    Returns typed results ranked across every source, plus the sources
+    that timed out or failed.
+    """
+    term = request.GET.get('q', '').strip()
+    if len(term) < 2:
+        return JsonResponse({'error': 'Search term too short'}, status=400)
+
+    return JsonResponse({'query': term, **global_search(term)})
+
+
+# Item catalog of the sale screen: cached JSON, revalidated by ETag
+@require_http_methods(["GET"])
+@login_required
+def item_catalog_view(request):
+    """
+    Serve the item catalog of the sale screen (see store/catalog.py).
+    Answers 304 when the client's copy is current, and gzips the body for
+    clients that accept it.
+    """
+    catalog = get_catalog()
+    gzip_etag = catalog['etag'][:-1] + '-gzip"'
+    use_gzip = bool(GZIP_RE.search(request.headers.get('Accept-Encoding', '')))
+
+    # Both encodings carry the same catalog, so either tag means "current"
+    if set(parse_etags(request.headers.get('If-None-Match', ''))) & {catalog['etag'], gzip_etag, '*'}:
+        response = HttpResponseNotModified()
+    elif use_gzip:
+        response = HttpResponse(catalog['gzipped'], content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(catalog['content'], content_type='application/json')
+
+    response['ETag'] = gzip_etag if use_gzip else catalog['etag']
+    # Keep a copy, but check with the server before using it
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+# Paged options of a large relation, for RemoteSelect widgets
+@require_http_methods(["GET"])
+@login_required
+def choices_view(request, provider):
+    """
+    JSON endpoint behind RemoteSelect (see store/choices.py).
+    Returns one page of the options whose name starts with `term`.
+    """
+    if provider not in PROVIDERS:
+        return JsonResponse({'error': 'Unknown choice list'}, status=404)
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page number'}, status=400)
+
+    results, more = search_choices(provider, request.GET.get('term', ''), page)
+    return JsonResponse({
+        'results': [{'id': pk, 'text': label} for pk, label in results],
+        'more': more,
+    })
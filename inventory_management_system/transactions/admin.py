@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Sale, SaleDetail, Purchase
+from .models import Sale, SaleDetail, Purchase, StockMovement, StockReservation, QueuedTask
+from .services import receive_purchases
 
 
 @admin.register(Sale)
@@ -36,4 +37,54 @@ class PurchaseAdmin(admin.ModelAdmin):
     search_fields = ('item__name', 'vendor__name', 'slug')
     list_filter = ('order_date', 'vendor', 'status')
     ordering = ('-order_date',)
-    readonly_fields = ('total_cost',)
+    readonly_fields = ('total_cost', 'received_at')
+    actions = ('mark_received',)
+
+    @admin.action(description="Mark selected purchases as received")
+    def mark_received(self, request, queryset):
+        received = receive_purchases(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f"{len(received)} purchase(s) received into stock.")
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at', 'item', 'delta',
+        'reason', 'sale', 'purchase'
+    )
+    search_fields = ('item__name',)
+    list_filter = ('reason', 'created_at')
+    ordering = ('-created_at',)
+    date_hierarchy = 'created_at'
+    list_select_related = ('item', 'sale', 'purchase')
+
+    # The ledger is append-only; it is written by the stock services
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('cart_key', 'item', 'quantity', 'expires_at')
+    search_fields = ('cart_key', 'item__name')
+    list_filter = ('expires_at',)
+    ordering = ('expires_at',)
+    list_select_related = ('item',)
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'name', 'status', 'attempts',
+        'run_after', 'locked_until', 'completed_at'
+    )
+    search_fields = ('name',)
+    list_filter = ('status', 'name')
+    ordering = ('-run_after',)
+    readonly_fields = ('created_at', 'completed_at', 'last_error')
@@ -3,8 +3,4 @@ from django.apps import AppConfig
 
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'transactions'
-
-
-    def ready(self):
-            import transactions.signals   # this triggers the signal registration
\ No newline at end of file
+    name = 'transactions'
\ No newline at end of file
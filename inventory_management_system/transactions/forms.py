@@ -1,16 +1,21 @@
 from django import forms
 from django.forms import ModelForm
 from decimal import Decimal
+from store.choices import CachedChoicesMixin
 from .models import Sale, SaleDetail, Purchase
 
 
-class SaleForm(ModelForm):
+class SaleForm(CachedChoicesMixin, ModelForm):
     """
     Enhanced form with:
     - Automatic calculations
     - Crispy forms integration
     - Better field validation
+    - Customers searched page by page instead of listed in full
     """
+    cached_choices = {'customer': 'accounts.Customer'}
+    remote_choices = ('customer',)
+
     class Meta:
         model = Sale
         fields = ['customer', 'sub_total', 'tax_percentage', 'amount_paid']
@@ -59,11 +64,14 @@ class SaleForm(ModelForm):
 
 
 #################################################################################
-class SaleDetailForm(forms.ModelForm):
+class SaleDetailForm(CachedChoicesMixin, forms.ModelForm):
     """
     Form for individual line items in a sale (SaleDetail).
     total_detail is auto-calculated and not included in the form.
     """
+    cached_choices = {'item': 'store.Item'}
+    remote_choices = ('item',)
+
     class Meta:
         model = SaleDetail
         fields = ['item', 'price', 'quantity']
@@ -75,11 +83,14 @@ class SaleDetailForm(forms.ModelForm):
 
 
 #################################################################################
-class PurchaseForm(forms.ModelForm):
+class PurchaseForm(CachedChoicesMixin, forms.ModelForm):
     """
     Form for creating or updating an inventory purchase.
     total_cost is auto-calculated in the model's save() method.
     """
+    cached_choices = {'item': 'store.Item', 'vendor': 'accounts.Vendor'}
+    remote_choices = ('item',)
+
     class Meta:
         model = Purchase
         fields = ['item', 'vendor', 'quantity', 'unit_price', 'status', 'notes']
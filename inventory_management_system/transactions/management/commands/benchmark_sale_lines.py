@@ -0,0 +1,94 @@
+"""
+Benchmark sale line-item insertion.
+
+Compares the old one-INSERT-per-line path (SaleDetail.objects.create) with
+services.write_sale_lines (one bulk_create per cart) for growing cart sizes.
+Everything runs inside a transaction that is rolled back, so the database
+is left untouched.
+
+Usage:
+    python manage.py benchmark_sale_lines --lines 1 10 50 200 500 --repeat 5
+"""
+
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import Customer
+from store.models import Category, Item
+from transactions.models import Sale, SaleDetail
+from transactions.services import write_sale_lines
+
+
+class Command(BaseCommand):
+    help = "Measure sale line-item insert latency against cart size"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines', type=int, nargs='+', default=[1, 10, 50, 100, 200, 500],
+            help="Cart sizes (number of lines) to measure"
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help="Runs per cart size; the median is reported"
+        )
+
+    def handle(self, *args, **options):
+        sizes = options['lines']
+        repeat = options['repeat']
+
+        self.stdout.write(f"{'lines':>6} {'per-row ms':>12} {'bulk ms':>10} {'speedup':>8}")
+        with transaction.atomic():
+            items, customer = self._fixtures(max(sizes))
+            for size in sizes:
+                lines = [
+                    {'id': item.id, 'price': item.price, 'quantity': 1}
+                    for item in items[:size]
+                ]
+                per_row = self._median(repeat, lambda sale: self._per_row(sale, lines), customer)
+                bulk = self._median(repeat, lambda sale: write_sale_lines(sale, lines), customer)
+                self.stdout.write(
+                    f"{size:>6} {per_row * 1000:>12.2f} {bulk * 1000:>10.2f} "
+                    f"{per_row / bulk if bulk else 0:>7.1f}x"
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f"Done ({connection.vendor}); no data was kept."))
+
+    def _fixtures(self, count):
+        category = Category.objects.create(name="Benchmark")
+        Item.objects.bulk_create([
+            Item(
+                name=f"bench-item-{i}",
+                slug=f"bench-item-{i}",
+                description="benchmark",
+                category=category,
+                quantity=1_000_000,
+                price=Decimal('9.99'),
+            )
+            for i in range(count)
+        ])
+        items = list(Item.objects.filter(category=category).order_by('id'))
+        customer = Customer.objects.create(first_name="Benchmark", email="benchmark@example.invalid")
+        return items, customer
+
+    def _median(self, repeat, write, customer):
+        timings = []
+        for _ in range(repeat):
+            sale = Sale.objects.create(customer=customer, amount_paid=Decimal('0'))
+            start = time.perf_counter()
+            write(sale)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2]
+
+    def _per_row(self, sale, lines):
+        for line in lines:
+            SaleDetail.objects.create(
+                sale=sale,
+                item_id=line['id'],
+                price=line['price'],
+                quantity=line['quantity'],
+            )
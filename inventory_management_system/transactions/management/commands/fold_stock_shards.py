@@ -0,0 +1,38 @@
+"""
+Fold striped stock back into Item.quantity.
+
+Items with striped stock take their sales on shard rows; this command
+writes the shard totals back to Item.quantity so listings and reports
+show current balances. The run_tasks worker already folds every
+STOCK_FOLD_INTERVAL seconds; run this command where no worker runs, from
+cron or with --loop, or to fold at once.
+
+Usage:
+    python manage.py fold_stock_shards
+    python manage.py fold_stock_shards --loop 30
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from transactions.services import fold_stock_shards
+
+
+class Command(BaseCommand):
+    help = "Fold shard totals of striped items back into Item.quantity"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=int, metavar='SECONDS',
+            help="Keep folding every SECONDS seconds until interrupted"
+        )
+
+    def handle(self, *args, **options):
+        interval = options['loop']
+        while True:
+            folded = fold_stock_shards()
+            self.stdout.write(f"Folded {folded} striped item(s)")
+            if not interval:
+                break
+            time.sleep(interval)
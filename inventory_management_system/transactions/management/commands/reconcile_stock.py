@@ -0,0 +1,148 @@
+"""
+Reconcile Item.quantity against purchases and sales.
+
+The expected balance of an item is the quantity of its received purchases
+minus the quantity sold in SaleDetail rows. Both are computed with one
+grouped aggregate each, ordered by item id, and merge-joined with the items
+(and the shard totals of striped items) as they stream in with
+.iterator(chunk_size=...). Memory stays bounded by --chunk-size no matter
+how many items or sale lines there are.
+
+Discrepancies are written as CSV. --fix applies them as ADJUSTMENT
+movements through the stock ledger, one batch per --chunk-size items.
+Stock counted in by hand (an adjustment, or a quantity stored before the
+ledger existed) is not a purchase and is therefore corrected away, so
+--fix asks for confirmation unless --noinput is given; review the report
+first.
+
+Usage:
+    python manage.py reconcile_stock --output discrepancies.csv
+    python manage.py reconcile_stock --fix
+    python manage.py reconcile_stock --fix --noinput
+"""
+
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from store.models import Item, ItemStockShard
+from transactions.models import Purchase, SaleDetail, StockMovement
+from transactions.services import InsufficientStockError, StockLedger
+
+
+def _totals(queryset, chunk_size):
+    """Stream (item_id, total) pairs of a per-item quantity sum, by item id."""
+    return queryset.values('item_id').annotate(
+        total=Sum('quantity')
+    ).order_by('item_id').values_list('item_id', 'total').iterator(chunk_size=chunk_size)
+
+
+def _lookup(stream):
+    """
+    Turn a sorted (item_id, total) stream into a function that returns the
+    total for ascending item ids, consuming the stream as it goes.
+    """
+    current = next(stream, None)
+
+    def total_for(item_id):
+        nonlocal current
+        while current is not None and current[0] < item_id:
+            current = next(stream, None)
+        if current is not None and current[0] == item_id:
+            return current[1] or 0
+        return 0
+
+    return total_for
+
+
+class Command(BaseCommand):
+    help = "Compare Item.quantity with received purchases minus sales"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="Rows fetched per round-trip, and items fixed per transaction"
+        )
+        parser.add_argument(
+            '--output', metavar='PATH',
+            help="Write the discrepancy report here instead of stdout"
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help="Apply the corrections as stock ledger adjustments"
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help="Apply --fix without asking for confirmation"
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if options['fix'] and options['interactive']:
+            confirm = input(
+                "--fix resets every mismatched item to received purchases minus sales.\n"
+                "Stock counted in by hand rather than purchased will be lost.\n"
+                "Type 'yes' to continue, or 'no' to cancel: "
+            )
+            if confirm != 'yes':
+                raise CommandError("Reconciliation cancelled.")
+
+        output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        writer = csv.writer(output)
+        writer.writerow(['item_id', 'name', 'actual', 'expected', 'difference'])
+
+        received = _lookup(_totals(Purchase.objects.filter(received_at__isnull=False), chunk_size))
+        sold = _lookup(_totals(SaleDetail.objects.all(), chunk_size))
+        sharded = _lookup(_totals(ItemStockShard.objects.all(), chunk_size))
+
+        items = Item.objects.order_by('pk').values_list(
+            'pk', 'name', 'quantity', 'stock_sharded'
+        ).iterator(chunk_size=chunk_size)
+
+        checked = mismatched = fixed = 0
+        pending = []
+        for item_id, name, quantity, stock_sharded in items:
+            checked += 1
+            actual = sharded(item_id) if stock_sharded else quantity
+            expected = received(item_id) - sold(item_id)
+            if actual == expected:
+                continue
+
+            mismatched += 1
+            writer.writerow([item_id, name, actual, expected, expected - actual])
+            if options['fix'] and expected >= 0:
+                pending.append((item_id, expected - actual))
+                if len(pending) >= chunk_size:
+                    fixed += self._fix(pending)
+                    pending = []
+
+        if pending:
+            fixed += self._fix(pending)
+
+        if output is not self.stdout:
+            output.close()
+
+        summary = f"Checked {checked} item(s): {mismatched} discrepancy(ies)"
+        if options['fix']:
+            summary += f", {fixed} fixed"
+        self.stderr.write(self.style.SUCCESS(summary))
+
+    def _fix(self, corrections):
+        """
+        Apply one batch of corrections; items whose stock moved below the
+        correction in the meantime are skipped. Returns the number fixed.
+        """
+        while corrections:
+            ledger = StockLedger()
+            for item_id, delta in corrections:
+                ledger.add(item_id, delta, StockMovement.Reason.ADJUSTMENT)
+            try:
+                ledger.commit()
+                return len(corrections)
+            except InsufficientStockError as e:
+                short = {shortage['id'] for shortage in e.shortages}
+                for shortage in e.shortages:
+                    self.stderr.write(f"Skipped {shortage['name']}: stock changed during reconciliation")
+                corrections = [c for c in corrections if c[0] not in short]
+        return 0
@@ -0,0 +1,73 @@
+"""
+Drain the post-commit task queue.
+
+Workers lease pending QueuedTask rows, run them on a thread pool and record
+the outcome; failed tasks are retried with exponential backoff. Run it under
+a process supervisor, or with --once from cron.
+
+Every STOCK_FOLD_INTERVAL seconds (--fold-every) the worker also folds
+striped stock back into Item.quantity, so Item.quantity of sharded items
+does not drift while no one runs the fold_stock_shards command.
+
+Usage:
+    python manage.py run_tasks --workers 4
+    python manage.py run_tasks --once
+    python manage.py run_tasks --fold-every 0   # leave folding to cron
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from transactions.services import fold_stock_shards
+from transactions.tasks import claim_tasks, run_task
+
+
+class Command(BaseCommand):
+    help = "Run queued post-commit tasks with a pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Worker threads")
+        parser.add_argument('--batch', type=int, default=20, help="Tasks claimed per poll")
+        parser.add_argument('--lease', type=int, default=60, help="Seconds a claimed task stays leased")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty")
+        parser.add_argument(
+            '--fold-every', type=float, default=settings.STOCK_FOLD_INTERVAL, metavar='SECONDS',
+            help="Fold striped stock into Item.quantity this often (0 disables)"
+        )
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        fold_every = options['fold_every']
+        folded_at = None
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                if fold_every and (folded_at is None or time.monotonic() - folded_at >= fold_every):
+                    fold_stock_shards()
+                    folded_at = time.monotonic()
+
+                tasks = claim_tasks(options['batch'], options['lease'])
+                if not tasks:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                for ok in pool.map(self._run, tasks):
+                    if ok:
+                        done += 1
+                    else:
+                        failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} task(s), {failed} failed"))
+
+    def _run(self, task):
+        try:
+            return run_task(task)
+        finally:
+            # Each worker thread owns its own connection
+            connection.close()
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    """One ADJUSTMENT movement per item for the stock it holds before the ledger."""
+    Item = apps.get_model('store', 'Item')
+    StockMovement = apps.get_model('transactions', 'StockMovement')
+    db = schema_editor.connection.alias
+    items = Item.objects.using(db).exclude(quantity=0).values_list('pk', 'quantity').iterator(chunk_size=2000)
+    batch = []
+    for item_id, quantity in items:
+        batch.append(StockMovement(item_id=item_id, delta=quantity, reason='AD'))
+        if len(batch) >= 2000:
+            StockMovement.objects.using(db).bulk_create(batch)
+            batch = []
+    StockMovement.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_item_image'),
+        ('transactions', '0003_alter_purchase_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(help_text='Signed change applied to the item quantity')),
+                ('reason', models.CharField(choices=[('SA', 'Sale'), ('PU', 'Purchase'), ('AD', 'Adjustment')], max_length=2)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='store.item', verbose_name='Product')),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='transactions.purchase')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='transactions.sale')),
+            ],
+            options={
+                'verbose_name': 'Stock Movement',
+                'verbose_name_plural': 'Stock Movements',
+                'db_table': 'stock_movements',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['item', 'created_at'], name='stock_movem_item_id_bbae3b_idx'), models.Index(fields=['created_at'], name='stock_movem_created_07bdcc_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
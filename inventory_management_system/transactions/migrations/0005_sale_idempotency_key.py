@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_stockmovement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, help_text='Client-generated key that makes checkout retries safe', max_length=64, null=True, unique=True),
+        ),
+    ]
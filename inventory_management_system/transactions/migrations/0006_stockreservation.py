@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:34
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_item_image'),
+        ('transactions', '0005_sale_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cart_key', models.CharField(help_text='Client cart key (the checkout idempotency key)', max_length=64)),
+                ('quantity', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('expires_at', models.DateTimeField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='store.item', verbose_name='Product')),
+            ],
+            options={
+                'verbose_name': 'Stock Reservation',
+                'verbose_name_plural': 'Stock Reservations',
+                'db_table': 'stock_reservations',
+                'indexes': [models.Index(fields=['item', 'expires_at'], name='stock_reser_item_id_999f60_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cart_key', 'item'), name='unique_cart_item_reservation')],
+            },
+        ),
+    ]
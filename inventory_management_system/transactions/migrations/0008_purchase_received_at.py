@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:37
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def mark_delivered_as_received(apps, schema_editor):
+    # Stock of purchases delivered before this migration was already added
+    Purchase = apps.get_model('transactions', 'Purchase')
+    Purchase.objects.filter(status='D').update(
+        received_at=Coalesce(F('delivery_date'), F('order_date'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_queuedtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='received_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the delivered stock was added to inventory', null=True),
+        ),
+        migrations.RunPython(mark_delivered_as_received, migrations.RunPython.noop),
+    ]
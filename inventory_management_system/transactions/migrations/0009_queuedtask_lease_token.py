@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_purchase_received_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedtask',
+            name='lease_token',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -8,7 +8,6 @@ from store.models import Item
 from accounts.models import Vendor
 
 from django.db import transaction 
-from django.db.models import F
 from django.core.exceptions import ValidationError
 
 
@@ -85,6 +84,16 @@ class Sale(models.Model):
         help_text="Change due to customer"
     )
 
+    # Client-generated key; a retried checkout returns the original sale
+    idempotency_key = models.CharField(
+        max_length=64,
+        unique=True,  # Unique index doubles as the lookup index
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Client-generated key that makes checkout retries safe"
+    )
+
     class Meta:
         db_table = "sales"  # Maintains same table name
         verbose_name = "Sales Transaction"
@@ -226,6 +235,13 @@ class Purchase(models.Model):
         default='P'
     )
     notes = models.TextField(blank=True, null=True)
+    # Set once, when the stock of this purchase is added to the item
+    received_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the delivered stock was added to inventory"
+    )
 
     class Meta:
         ordering = ['-order_date']
@@ -240,20 +256,30 @@ class Purchase(models.Model):
             raise ValidationError("Delivery date cannot be before order date")
 
     def save(self, *args, **kwargs):
+        from .services import receive_purchases  # Avoids a circular import
+
         with transaction.atomic():
             self.full_clean()
             self.total_cost = self.unit_price * Decimal(self.quantity)
             
             if not self.slug:
                 self.slug = self.generate_slug()
-                
-            if self.status == 'D' and not self.delivery_date:
-                self.delivery_date = timezone.now()
-                self.item.quantity = F('quantity') + self.quantity
-                self.item.save(update_fields=['quantity'])
-                
+
+            # Never overwrite a receipt recorded by another request
+            if self.pk:
+                self.received_at = Purchase.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('received_at', flat=True).first()
+
             super().save(*args, **kwargs)
 
+            # Receiving stamps delivery_date after order_date is set
+            if self.status == 'D' and not self.received_at:
+                receive_purchases([self.pk])
+                self.received_at, self.delivery_date = Purchase.objects.filter(
+                    pk=self.pk
+                ).values_list('received_at', 'delivery_date').get()
+
     def generate_slug(self):
         base = f"{self.vendor.name}-{self.item.name}"
         date = self.order_date.strftime('%Y%m%d') if self.order_date else timezone.now().strftime('%Y%m%d')
@@ -265,3 +291,165 @@ class Purchase(models.Model):
     @property
     def status_display(self):
         return dict(self.DELIVERY_STATUS).get(self.status, 'Unknown')
+
+
+###############################################################
+
+###############################################################
+
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of every change to Item.quantity.
+
+    Item.quantity is the materialized balance; each row here records
+    why it moved. Rows are written in batches by services.StockLedger
+    and are never updated or deleted.
+    """
+    class Reason(models.TextChoices):
+        SALE = 'SA', 'Sale'
+        PURCHASE = 'PU', 'Purchase'
+        ADJUSTMENT = 'AD', 'Adjustment'
+
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="stock_movements",
+        verbose_name="Product"
+    )
+    delta = models.IntegerField(
+        help_text="Signed change applied to the item quantity"
+    )
+    reason = models.CharField(
+        max_length=2,
+        choices=Reason.choices
+    )
+    sale = models.ForeignKey(
+        Sale,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_movements"
+    )
+    purchase = models.ForeignKey(
+        Purchase,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_movements"
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False
+    )
+
+    class Meta:
+        db_table = "stock_movements"
+        verbose_name = "Stock Movement"
+        verbose_name_plural = "Stock Movements"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['item', 'created_at']),  # Per-item history
+            models.Index(fields=['created_at']),  # Audits by date range
+        ]
+
+    def __str__(self):
+        return f"{self.delta:+d} {self.item_id} ({self.get_reason_display()})"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValidationError("Stock movements are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Stock movements are append-only")
+
+
+class StockReservation(models.Model):
+    """
+    Temporary hold on stock for an open cart on the sale screen.
+
+    Reservations expire on their own after STOCK_RESERVATION_MINUTES and
+    are released when the cart becomes a sale. Available-to-sell is
+    Item.quantity minus the active reservations of other carts.
+    """
+    cart_key = models.CharField(
+        max_length=64,
+        help_text="Client cart key (the checkout idempotency key)"
+    )
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Product"
+    )
+    quantity = models.PositiveIntegerField(
+        validators=[MinValueValidator(1)]
+    )
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "stock_reservations"
+        verbose_name = "Stock Reservation"
+        verbose_name_plural = "Stock Reservations"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart_key', 'item'],
+                name='unique_cart_item_reservation'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['item', 'expires_at']),  # Active holds per item
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.item_id} for cart {self.cart_key}"
+
+
+class QueuedTask(models.Model):
+    """
+    Deferred side effect of a transaction, run by the run_tasks workers.
+
+    Rows are inserted by tasks.enqueue() once the triggering transaction
+    commits. A worker claims a row by setting locked_until (its lease) and a
+    new lease_token; an expired lease makes the row claimable again, and
+    only the holder of the current token can record the outcome.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'P', 'Pending'
+        DONE = 'D', 'Done'
+        FAILED = 'F', 'Failed'
+
+    name = models.CharField(
+        max_length=100,
+        help_text="Registered task name"
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Keyword arguments for the task"
+    )
+    status = models.CharField(
+        max_length=1,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    lease_token = models.UUIDField(null=True, blank=True, editable=False)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "queued_tasks"
+        verbose_name = "Queued Task"
+        verbose_name_plural = "Queued Tasks"
+        ordering = ['run_after']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),  # Worker polling
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
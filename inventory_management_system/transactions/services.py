@@ -0,0 +1,562 @@
+"""
+Module: services.py
+
+Write paths shared by the transaction views.
+
+Classes:
+- StockLedger: Buffers stock movements and applies them in one batch.
+
+Functions:
+- stock_on_hand: Expression for the stock of an item, shards included.
+- commit_stock: Atomically decrements stock for a list of sale lines.
+- write_sale_lines: Inserts all line items of a sale with one bulk_create.
+- record_sale: Creates a sale, its line items and its stock movements.
+- record_sale_once: record_sale guarded by a client idempotency key.
+- set_stock: Brings the stock of an item to a count through the ledger.
+- save_item: Saves a hand-edited item, routing its quantity through set_stock.
+- reserve_stock: Holds stock for an open cart until it expires.
+- release_reservations: Drops the holds of a cart.
+- enable_stock_sharding / disable_stock_sharding: Toggle striped stock for an item.
+- fold_stock_shards: Folds shard totals back into Item.quantity.
+- receive_purchases: Marks purchases delivered and adds their stock exactly once.
+
+Exceptions:
+- InsufficientStockError: Raised when a sale asks for more stock than is on hand.
+"""
+
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from store import counters
+from store.models import Item, ItemStockShard
+from store.versions import bump_version
+from .models import Purchase, Sale, SaleDetail, StockMovement, StockReservation
+from .tasks import check_low_stock, enqueue
+
+
+class InsufficientStockError(Exception):
+    """
+    Raised when one or more sale lines cannot be covered by current stock.
+
+    `shortages` is a list of dicts (id, name, requested, available),
+    one per offending item, so callers can report every problem at once.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        names = ", ".join(shortage['name'] for shortage in shortages)
+        super().__init__(f"Insufficient stock for {names}")
+
+    def as_json(self):
+        """Returns the error in the shape used by the sale AJAX endpoints."""
+        return {
+            'success': False,
+            'error': str(self),
+            'items': self.shortages,
+        }
+
+
+class StockLedger:
+    """
+    Collects the stock movements of one transaction and applies them together.
+
+    Item.quantity is a materialized balance of the StockMovement ledger:
+    commit() folds the buffered deltas into one UPDATE per item and inserts
+    every movement with a single bulk_create, all in one atomic block.
+    Decrements are conditional (quantity - n WHERE quantity >= n), so the
+    balance can never go negative under concurrent writers. Items with
+    striped stock are applied to one of their shard rows instead.
+
+    Sales commit with respect_holds, so they cannot take stock that other
+    carts hold (StockReservation); the cart being checked out is named by
+    cart_key and its own holds do not count against it. The held quantity
+    is a subquery of the same conditional UPDATE, so no row is locked
+    beforehand and a sale still costs one statement per item.
+    """
+
+    def __init__(self):
+        self._movements = []
+
+    def add(self, item_id, delta, reason, sale=None, purchase=None):
+        """Buffer one movement. Returns the ledger so calls can be chained."""
+        if delta:
+            self._movements.append(StockMovement(
+                item_id=item_id,
+                delta=delta,
+                reason=reason,
+                sale=sale,
+                purchase=purchase,
+            ))
+        return self
+
+    def commit(self, items=None, respect_holds=False, cart_key=None):
+        """
+        Apply all buffered movements.
+
+        `items` optionally maps item id to an already fetched Item, letting
+        batch callers skip the per-commit lookup. With `respect_holds`,
+        decrements may only use stock not held by carts other than
+        `cart_key`.
+
+        Returns a dict mapping item id to the Item fetched before the update.
+        Raises InsufficientStockError, writing nothing, if any item would go
+        below zero.
+        """
+        deltas = defaultdict(int)
+        for movement in self._movements:
+            deltas[movement.item_id] += movement.delta
+
+        with transaction.atomic():
+            if items is None:
+                items = Item.objects.only(
+                    'id', 'name', 'quantity', 'stock_sharded'
+                ).in_bulk(list(deltas))
+
+            shortages = []
+            # Update rows in primary key order so two tills selling the same
+            # items always lock them in the same order.
+            for item_id in sorted(deltas):
+                delta = deltas[item_id]
+                item = items.get(item_id)
+                if item is None:
+                    shortages.append({
+                        'id': item_id,
+                        'name': f"Item #{item_id}",
+                        'requested': -delta,
+                        'available': 0,
+                    })
+                    continue
+
+                if not delta:
+                    continue
+                holds = respect_holds and delta < 0
+                if item.stock_sharded:
+                    applied = _apply_to_shards(item_id, delta, holds, cart_key)
+                else:
+                    queryset = Item.objects.filter(pk=item_id)
+                    if delta < 0:
+                        floor = Value(-delta) + _held_by_others(cart_key) if holds else -delta
+                        queryset = queryset.filter(quantity__gte=floor)
+                    applied = queryset.update(quantity=F('quantity') + delta)
+
+                if not applied:
+                    # Only a failed decrement pays for working out what is left
+                    left = Item.objects.filter(pk=item_id).annotate(
+                        left=stock_on_hand() - _held_by_others(cart_key) if holds else stock_on_hand()
+                    ).values_list('left', flat=True).first() or 0
+                    shortages.append({
+                        'id': item_id,
+                        'name': item.name,
+                        'requested': -delta,
+                        'available': max(left, 0),
+                    })
+
+            if shortages:
+                raise InsufficientStockError(shortages)
+
+            StockMovement.objects.bulk_create(self._movements)
+            counters.bump(counters.STOCK_ON_HAND, sum(deltas.values()))
+            # Quantities changed through UPDATEs, which send no signals
+            bump_version(Item)
+
+        self._movements = []
+        return items
+
+
+def _shard_totals(item_ref='pk'):
+    return ItemStockShard.objects.filter(
+        item_id=OuterRef(item_ref)
+    ).order_by().values('item_id').annotate(total=Sum('quantity')).values('total')
+
+
+def stock_on_hand():
+    """
+    Expression for the stock on hand of an Item row: the sum of its shards
+    for striped items (whose Item.quantity lags until the next fold), else
+    Item.quantity.
+    """
+    return Case(
+        When(stock_sharded=True, then=Coalesce(Subquery(_shard_totals()), Value(0))),
+        default=F('quantity'),
+    )
+
+
+def _held_by_others(cart_key=None, item_ref='pk'):
+    """
+    Expression for the quantity of the item `item_ref` points at that the
+    active holds of carts other than `cart_key` keep back.
+    """
+    holds = StockReservation.objects.filter(item_id=OuterRef(item_ref), expires_at__gt=timezone.now())
+    if cart_key:
+        holds = holds.exclude(cart_key=cart_key)
+    total = holds.order_by().values('item_id').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(total), Value(0))
+
+
+def _apply_to_shards(item_id, delta, respect_holds=False, cart_key=None):
+    """
+    Apply a stock delta to the shards of a striped item. With
+    `respect_holds`, a decrement keeps back what carts other than
+    `cart_key` hold.
+
+    The fast path is one conditional UPDATE on a random shard; with holds,
+    its condition also asks the item's shard total to cover them. When that
+    cannot pass, the shards of the item (never the Item row) are locked and
+    drained in order. Returns False if the item is short of stock.
+    """
+    shards = ItemStockShard.objects.filter(item_id=item_id)
+    shard = random.randrange(settings.STOCK_SHARD_COUNT)
+    fast = shards.filter(shard=shard)
+    if delta < 0:
+        fast = fast.filter(quantity__gte=-delta)
+        if respect_holds:
+            fast = fast.filter(GreaterThanOrEqual(
+                Subquery(_shard_totals('item')), Value(-delta) + _held_by_others(cart_key, item_ref='item')
+            ))
+    if fast.update(quantity=F('quantity') + delta):
+        return True
+
+    rows = list(shards.select_for_update().order_by('shard'))
+    if not rows:
+        return False
+    if delta > 0:
+        shards.filter(pk=rows[0].pk).update(quantity=F('quantity') + delta)
+        return True
+    reserved = 0
+    if respect_holds:
+        reserved = Item.objects.filter(pk=item_id).annotate(
+            held=_held_by_others(cart_key)
+        ).values_list('held', flat=True).first()
+    if sum(row.quantity for row in rows) - reserved < -delta:
+        return False
+
+    remaining = -delta
+    for row in rows:
+        take = min(row.quantity, remaining)
+        if take:
+            shards.filter(pk=row.pk).update(quantity=F('quantity') - take)
+            remaining -= take
+        if not remaining:
+            break
+    return True
+
+
+def commit_stock(lines, sale=None, items=None, cart_key=None):
+    """
+    Decrement stock for the given sale lines.
+
+    Each line is a dict with at least 'id' and 'quantity'. Repeated items are
+    merged, all items are fetched in one query, and each item is decremented
+    with a conditional UPDATE, so concurrent checkouts can never oversell or
+    lose an update. Stock held by other carts than `cart_key` cannot be
+    sold. One SALE movement per line is written to the ledger.
+
+    Must be called inside transaction.atomic(); on any shortage an
+    InsufficientStockError is raised and the caller's transaction rolls back.
+
+    `items` is passed through to StockLedger.commit().
+
+    Returns a dict mapping item id to the fetched Item.
+    """
+    ledger = StockLedger()
+    for line in lines:
+        quantity = int(line['quantity'])
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1")
+        ledger.add(int(line['id']), -quantity, StockMovement.Reason.SALE, sale=sale)
+    return ledger.commit(items, respect_holds=True, cart_key=cart_key)
+
+
+def write_sale_lines(sale, lines):
+    """
+    Insert every line item of a sale with a single bulk_create.
+
+    Each line is a dict with 'id', 'price' and 'quantity'. total_detail is
+    computed here because bulk_create bypasses SaleDetail.save(), and the
+    lines are counted here because it bypasses the post_save signal too.
+
+    Returns the list of created SaleDetail instances.
+    """
+    details = []
+    for line in lines:
+        price = Decimal(str(line['price']))
+        quantity = int(line['quantity'])
+        details.append(SaleDetail(
+            sale=sale,
+            item_id=int(line['id']),
+            price=price,
+            quantity=quantity,
+            total_detail=price * Decimal(quantity),
+        ))
+    details = SaleDetail.objects.bulk_create(details)
+    counters.bump(counters.SALE_LINES, len(details))
+    return details
+
+
+def record_sale(customer_id, lines, sub_total, tax_percentage, amount_paid,
+                items=None, idempotency_key=None):
+    """
+    Create a sale with its line items and stock movements.
+
+    Totals are derived the same way as the sale form: tax and grand total
+    from sub_total, change floored at zero. Must be called inside
+    transaction.atomic(); raises InsufficientStockError on any shortage.
+    The idempotency key doubles as the cart key of the sale screen, so the
+    cart's own holds are not counted against it.
+    Non-critical follow-ups are queued to run after the commit.
+
+    Returns the created Sale.
+    """
+    tax_amount = sub_total * (tax_percentage / Decimal('100'))
+    grand_total = sub_total + tax_amount
+    amount_change = amount_paid - grand_total
+
+    sale = Sale.objects.create(
+        customer_id=customer_id,
+        sub_total=sub_total,
+        tax_percentage=tax_percentage,
+        tax_amount=tax_amount,
+        grand_total=grand_total,
+        amount_paid=amount_paid,
+        amount_change=amount_change if amount_change > 0 else Decimal('0'),
+        idempotency_key=idempotency_key
+    )
+    commit_stock(lines, sale=sale, items=items, cart_key=idempotency_key)
+    write_sale_lines(sale, lines)
+
+    # Side effects run after commit, outside the checkout request
+    enqueue(check_low_stock, item_ids=sorted({int(line['id']) for line in lines}))
+    return sale
+
+
+def record_sale_once(idempotency_key=None, **kwargs):
+    """
+    Call record_sale at most once per idempotency key.
+
+    A retry carrying a key that already produced a sale gets that sale back
+    without any stock being touched. Concurrent retries are settled by the
+    unique index on Sale.idempotency_key.
+
+    Returns (sale, created).
+    """
+    if not idempotency_key:
+        return record_sale(**kwargs), True
+
+    existing = Sale.objects.filter(idempotency_key=idempotency_key).first()
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            return record_sale(idempotency_key=idempotency_key, **kwargs), True
+    except IntegrityError:
+        # A concurrent request with the same key committed first
+        existing = Sale.objects.filter(idempotency_key=idempotency_key).first()
+        if existing is None:
+            raise
+        return existing, False
+
+
+def set_stock(item_id, quantity):
+    """
+    Bring the stock on hand of an item to `quantity` (a count entered by
+    hand) with one ADJUSTMENT movement, so the ledger keeps explaining the
+    balance. Returns the delta applied.
+    """
+    with transaction.atomic():
+        item = Item.objects.select_for_update().only(
+            'id', 'name', 'quantity', 'stock_sharded'
+        ).annotate(on_hand=stock_on_hand()).get(pk=item_id)
+        delta = quantity - item.on_hand
+        if delta:
+            StockLedger().add(item_id, delta, StockMovement.Reason.ADJUSTMENT).commit({item_id: item})
+    return delta
+
+
+def save_item(item, quantity=None):
+    """
+    Save an Item edited through a form without writing Item.quantity
+    directly: a new item starts empty and `quantity` (None keeps the stock
+    as is) is then applied with set_stock. Striped stock is toggled only by
+    enable_stock_sharding / disable_stock_sharding, so stock_sharded is not
+    saved either.
+    """
+    with transaction.atomic():
+        if item._state.adding:
+            item.quantity = 0
+            item.save()
+        else:
+            item.save(update_fields=[
+                field.name for field in Item._meta.concrete_fields
+                if not field.primary_key and field.name not in ('quantity', 'stock_sharded')
+            ])
+        if quantity is not None:
+            set_stock(item.pk, quantity)
+    item.refresh_from_db(fields=['quantity'])
+    return item
+
+
+def reserve_stock(cart_key, item_id, quantity):
+    """
+    Set the hold of a cart on one item to `quantity` (0 releases it).
+
+    The item row is locked and the active holds of other carts are summed
+    in the same query, so two tills racing for the last units get a clean
+    InsufficientStockError instead of failing later at checkout. Shrinking
+    or releasing a hold always succeeds, even when stock has since dropped
+    below what the carts hold. Expired holds on the item are purged on the
+    way.
+
+    Returns a dict with the reserved quantity, what is left to sell and
+    when the hold expires.
+    """
+    now = timezone.now()
+    held_by_others = StockReservation.objects.filter(
+        item=OuterRef('pk'), expires_at__gt=now
+    ).exclude(
+        cart_key=cart_key
+    ).values('item').annotate(total=Sum('quantity')).values('total')
+
+    own_hold = StockReservation.objects.filter(
+        item=OuterRef('pk'), expires_at__gt=now, cart_key=cart_key
+    ).values('quantity')[:1]
+
+    with transaction.atomic():
+        item = Item.objects.select_for_update().only(
+            'id', 'name', 'quantity', 'stock_sharded'
+        ).annotate(
+            held=Coalesce(Subquery(held_by_others), Value(0)),
+            own=Coalesce(Subquery(own_hold), Value(0)),
+            on_hand=stock_on_hand(),
+        ).get(pk=item_id)
+
+        available = item.on_hand - item.held
+        if quantity > item.own and quantity > available:
+            raise InsufficientStockError([{
+                'id': item.id,
+                'name': item.name,
+                'requested': quantity,
+                'available': max(available, 0),
+            }])
+
+        StockReservation.objects.filter(item_id=item_id, expires_at__lte=now).delete()
+        expires_at = now + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+        if quantity:
+            StockReservation.objects.update_or_create(
+                cart_key=cart_key,
+                item_id=item_id,
+                defaults={'quantity': quantity, 'expires_at': expires_at},
+            )
+        else:
+            StockReservation.objects.filter(cart_key=cart_key, item_id=item_id).delete()
+
+    return {
+        'id': item.id,
+        'reserved': quantity,
+        'available': max(available - quantity, 0),
+        'expires_at': expires_at if quantity else None,
+    }
+
+
+def release_reservations(cart_key, item_id=None):
+    """Drop the holds of a cart, or only its hold on `item_id`."""
+    reservations = StockReservation.objects.filter(cart_key=cart_key)
+    if item_id is not None:
+        reservations = reservations.filter(item_id=item_id)
+    reservations.delete()
+
+
+def enable_stock_sharding(item_id, shards=None):
+    """
+    Spread the stock of an item over `shards` shard rows (default
+    STOCK_SHARD_COUNT) and route its future movements to them.
+    """
+    shards = shards or settings.STOCK_SHARD_COUNT
+    with transaction.atomic():
+        item = Item.objects.select_for_update().only('id', 'quantity', 'stock_sharded').get(pk=item_id)
+        if item.stock_sharded:
+            return
+
+        base, extra = divmod(item.quantity, shards)
+        ItemStockShard.objects.filter(item_id=item_id).delete()
+        ItemStockShard.objects.bulk_create([
+            ItemStockShard(item_id=item_id, shard=shard, quantity=base + (1 if shard < extra else 0))
+            for shard in range(shards)
+        ])
+        Item.objects.filter(pk=item_id).update(stock_sharded=True)
+
+
+def disable_stock_sharding(item_id):
+    """Fold the shards of an item back into Item.quantity and drop them."""
+    with transaction.atomic():
+        Item.objects.select_for_update().only('id').get(pk=item_id)
+        fold_stock_shards([item_id])
+        ItemStockShard.objects.filter(item_id=item_id).delete()
+        Item.objects.filter(pk=item_id).update(stock_sharded=False)
+
+
+def fold_stock_shards(item_ids=None):
+    """
+    Set Item.quantity to the sum of its shards for items with striped stock.
+
+    Runs as a single UPDATE; call it periodically (see the fold_stock_shards
+    command) or before reading balances that must be exact.
+    Returns the number of items folded.
+    """
+    items = Item.objects.filter(stock_sharded=True)
+    if item_ids is not None:
+        items = items.filter(pk__in=item_ids)
+    folded = items.update(quantity=Coalesce(Subquery(_shard_totals()), Value(0)))
+    if folded:
+        bump_version(Item)
+    return folded
+
+
+def receive_purchases(purchase_ids):
+    """
+    Mark purchases delivered and add their stock to inventory exactly once.
+
+    The rows are locked, and only those without a received_at marker (and
+    not cancelled) are claimed; the marker is set in the same transaction
+    as the stock increments, so a purchase can never be counted twice, no
+    matter how often it is received or re-saved. Increments are grouped
+    into one UPDATE per item by the ledger.
+
+    Returns the ids of the purchases received by this call.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        purchases = list(
+            Purchase.objects.select_for_update().filter(
+                pk__in=purchase_ids, received_at__isnull=True
+            ).exclude(status='C').only('id', 'item_id', 'quantity')
+        )
+        if not purchases:
+            return []
+
+        received = [purchase.pk for purchase in purchases]
+        Purchase.objects.filter(pk__in=received).update(
+            status='D',
+            received_at=now,
+            delivery_date=Coalesce(F('delivery_date'), Value(now)),
+        )
+        bump_version(Purchase)
+
+        ledger = StockLedger()
+        for purchase in purchases:
+            ledger.add(
+                purchase.item_id, purchase.quantity,
+                StockMovement.Reason.PURCHASE, purchase=purchase
+            )
+        ledger.commit()
+
+    return received
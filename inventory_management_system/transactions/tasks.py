@@ -0,0 +1,147 @@
+"""
+Module: tasks.py
+
+Lightweight post-commit task queue backed by the QueuedTask table.
+
+Non-critical side effects of a sale (low-stock checks today; loyalty points
+or dashboard refreshes later) are pushed here instead of running inside the
+request, so checkout latency only covers the stock and sale writes.
+
+Functions:
+- register_task: Decorator that makes a function runnable by the workers.
+- enqueue: Queues a task once the current transaction commits.
+- claim_tasks: Leases pending tasks to a worker.
+- run_task: Executes a claimed task and records the outcome.
+
+Tasks:
+- check_low_stock: Logs items that dropped below LOW_STOCK_THRESHOLD.
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from store.models import Item
+from .models import QueuedTask
+
+
+logger = logging.getLogger(__name__)
+
+# Task name -> function
+registry = {}
+
+# Failed tasks are retried with exponential backoff up to this many runs
+MAX_ATTEMPTS = 5
+
+
+def register_task(func):
+    """Register `func` under its name so workers can run it."""
+    registry[func.__name__] = func
+    return func
+
+
+def enqueue(func, **payload):
+    """
+    Queue `func(**payload)` to run after the current transaction commits.
+
+    Nothing is queued if the transaction rolls back. Outside a transaction
+    the task is inserted immediately. The payload must be JSON-serializable.
+    """
+    name = func.__name__
+    if name not in registry:
+        raise ValueError(f"Task {name} is not registered")
+    transaction.on_commit(
+        lambda: QueuedTask.objects.create(name=name, payload=payload)
+    )
+
+
+def _claimable(now):
+    return QueuedTask.objects.filter(
+        status=QueuedTask.Status.PENDING,
+        run_after__lte=now,
+    ).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+
+
+def claim_tasks(limit, lease_seconds):
+    """
+    Lease up to `limit` pending tasks for `lease_seconds`.
+
+    Each row is claimed with a conditional UPDATE, so concurrent workers
+    never run the same task twice while a lease is live. Every claim gets a
+    new lease_token; run_task only records the outcome under that token.
+    """
+    now = timezone.now()
+    candidates = list(
+        _claimable(now).order_by('run_after').values_list('pk', flat=True)[:limit]
+    )
+
+    claimed = []
+    for pk in candidates:
+        if _claimable(now).filter(pk=pk).update(
+            locked_until=now + timedelta(seconds=lease_seconds),
+            lease_token=uuid.uuid4(),
+            attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+    return list(QueuedTask.objects.filter(pk__in=claimed))
+
+
+def _finish(task, **fields):
+    """
+    Record the outcome of `task` if its lease is still the one it was claimed
+    under; a worker whose lease expired and was claimed again leaves the row
+    to the new holder. Returns whether the row was updated.
+    """
+    finished = QueuedTask.objects.filter(
+        pk=task.pk, status=QueuedTask.Status.PENDING, lease_token=task.lease_token,
+    ).update(locked_until=None, lease_token=None, **fields)
+    if not finished:
+        logger.warning(f"Task {task} lost its lease before finishing; outcome not recorded")
+    return bool(finished)
+
+
+def run_task(task):
+    """Run a claimed task, then mark it done or schedule a retry."""
+    func = registry.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {task.name}")
+        func(**task.payload)
+    except Exception as e:
+        logger.error(f"Task {task} failed: {str(e)}", exc_info=True)
+        failed = task.attempts >= MAX_ATTEMPTS or func is None
+        _finish(
+            task,
+            status=QueuedTask.Status.FAILED if failed else QueuedTask.Status.PENDING,
+            run_after=timezone.now() + timedelta(seconds=2 ** task.attempts),
+            last_error=str(e),
+        )
+        return False
+
+    return _finish(task, status=QueuedTask.Status.DONE, completed_at=timezone.now())
+
+
+####################################################################################
+
+####################################################################################
+
+
+@register_task
+def check_low_stock(item_ids):
+    """
+    Log a warning for every sold item now below LOW_STOCK_THRESHOLD, counting
+    the shards of items with striped stock (their Item.quantity lags).
+    """
+    from .services import stock_on_hand  # Avoids a circular import
+    low = Item.objects.filter(pk__in=item_ids).annotate(
+        on_hand=stock_on_hand()
+    ).filter(on_hand__lt=settings.LOW_STOCK_THRESHOLD).values_list('name', 'on_hand')
+    for name, quantity in low:
+        logger.warning(f"Low stock: {name} has {quantity} left")
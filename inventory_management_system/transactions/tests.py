@@ -1,3 +1,329 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import DataError, transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Customer, Vendor
+from store.models import Category, Item
+from . import views
+from .models import Purchase, QueuedTask, Sale, StockMovement, StockReservation
+from .services import (
+    InsufficientStockError, StockLedger, enable_stock_sharding, record_sale, record_sale_once,
+    release_reservations, reserve_stock, stock_on_hand,
+)
+from .tasks import check_low_stock, claim_tasks, run_task
+
+
+class ReserveStockTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=3, price=1
+        )
+
+    def holds(self):
+        return dict(StockReservation.objects.values_list('cart_key', 'quantity'))
+
+    def test_reserve_resize_and_release(self):
+        self.assertEqual(reserve_stock('cart-a', self.item.pk, 2)['available'], 1)
+        with self.assertRaises(InsufficientStockError) as raised:
+            reserve_stock('cart-b', self.item.pk, 2)
+        self.assertEqual(raised.exception.shortages[0]['available'], 1)
+        self.assertEqual(reserve_stock('cart-b', self.item.pk, 1)['available'], 0)
+
+        # Growing a hold only needs the extra units; none are left
+        with self.assertRaises(InsufficientStockError):
+            reserve_stock('cart-a', self.item.pk, 3)
+        reserve_stock('cart-a', self.item.pk, 1)
+        self.assertEqual(reserve_stock('cart-b', self.item.pk, 2)['available'], 0)
+        self.assertEqual(self.holds(), {'cart-a': 1, 'cart-b': 2})
+
+        reserve_stock('cart-b', self.item.pk, 0)
+        release_reservations('cart-a')
+        self.assertEqual(self.holds(), {})
+
+    def test_overcommitted_holds_can_shrink_and_release(self):
+        reserve_stock('cart-a', self.item.pk, 2)
+        reserve_stock('cart-b', self.item.pk, 1)
+        # Stock drops below what the carts hold (e.g. a sale through another till)
+        Item.objects.filter(pk=self.item.pk).update(quantity=1)
+
+        # Keeping or shrinking a hold still works ...
+        self.assertEqual(reserve_stock('cart-a', self.item.pk, 2)['reserved'], 2)
+        self.assertEqual(reserve_stock('cart-a', self.item.pk, 1)['available'], 0)
+        # ... growing one again does not
+        with self.assertRaises(InsufficientStockError):
+            reserve_stock('cart-a', self.item.pk, 2)
+        self.assertEqual(reserve_stock('cart-b', self.item.pk, 0)['reserved'], 0)
+        self.assertEqual(self.holds(), {'cart-a': 1})
+
+
+class CheckoutHoldTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=4, price=1
+        )
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def sell(self, quantity, cart_key=None):
+        with transaction.atomic():
+            return record_sale(
+                customer_id=self.customer.pk,
+                lines=[{'id': self.item.pk, 'price': '1', 'quantity': quantity}],
+                sub_total=Decimal(quantity), tax_percentage=Decimal('0'), amount_paid=Decimal(quantity),
+                idempotency_key=cart_key,
+            )
+
+    def on_hand(self):
+        return Item.objects.annotate(on_hand=stock_on_hand()).values_list('on_hand', flat=True).get(pk=self.item.pk)
+
+    def assert_holds_respected(self):
+        reserve_stock('cart-a', self.item.pk, 3)
+        with self.assertRaises(InsufficientStockError) as raised:
+            self.sell(2)
+        self.assertEqual(raised.exception.shortages[0]['available'], 1)
+        self.sell(1)
+        # The cart's own hold does not count against its checkout
+        self.sell(3, cart_key='cart-a')
+        self.assertEqual(self.on_hand(), 0)
+
+    def test_sale_cannot_take_held_stock(self):
+        self.assert_holds_respected()
+
+    def test_striped_sale_cannot_take_held_stock(self):
+        enable_stock_sharding(self.item.pk, shards=2)
+        # Shard 0 exists, so each decrement tries the single-shard UPDATE first
+        with mock.patch('transactions.services.random.randrange', return_value=0):
+            self.assert_holds_respected()
+
+    def test_expired_holds_do_not_count(self):
+        reserve_stock('cart-a', self.item.pk, 4)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.sell(4)
+        self.assertEqual(self.on_hand(), 0)
+
+
+class SaleBatchCreateTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('till', password='password'))
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=10, price=1
+        )
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def sale(self, price='1.00', quantity=1, **extra):
+        return {
+            'customer': self.customer.pk,
+            'items': [{'id': self.item.pk, 'price': price, 'quantity': quantity}],
+            **extra,
+        }
+
+    def post(self, sales):
+        response = self.client.post(
+            reverse('transactions:sale-batch-create'), json.dumps({'sales': sales}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_values_that_do_not_fit_the_sale_fields_are_rejected_per_sale(self):
+        result = self.post([
+            self.sale(price='1e999999'),
+            self.sale(tax_percentage='12345678901234'),
+            self.sale(quantity=1.7),
+            self.sale(price='1.005'),
+            self.sale(price='NaN'),
+            self.sale(sub_total='-5'),
+            self.sale(price='99999999.99', quantity=10),
+            self.sale(quantity=2.0),
+        ])
+        self.assertEqual([r['success'] for r in result['results']], [False] * 7 + [True])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 8)
+
+    def test_database_error_is_reported_against_its_sale(self):
+        real = views.record_sale_once
+        calls = []
+
+        def flaky(**kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise DataError("numeric field overflow")
+            return real(**kwargs)
+
+        with mock.patch.object(views, 'record_sale_once', flaky):
+            result = self.post([self.sale(), self.sale()])
+        self.assertEqual([r['success'] for r in result['results']], [False, True])
+        self.assertEqual(result['results'][0]['error'], 'Sale could not be stored')
+        self.assertEqual(Sale.objects.count(), 1)
+
+
+class CheckoutMixin:
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('till', password='password'))
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=3, price=2
+        )
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def checkout(self, quantity, **headers):
+        """Post the sale screen's AJAX checkout for `quantity` units of the item."""
+        return self.client.post(reverse('transactions:sale-create'), {
+            'customer': self.customer.pk,
+            'sub_total': str(2 * quantity),
+            'tax_percentage': '0',
+            'amount_paid': str(2 * quantity),
+            'items[0][id]': self.item.pk,
+            'items[0][price]': '2',
+            'items[0][quantity]': quantity,
+        }, headers={'x-requested-with': 'XMLHttpRequest', **headers})
+
+    def stock(self):
+        self.item.refresh_from_db()
+        return self.item.quantity
+
+
+class CheckoutStockTests(CheckoutMixin, TestCase):
+    def test_oversell_is_rejected_with_409(self):
+        response = self.checkout(4)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['items'], [
+            {'id': self.item.pk, 'name': 'Water', 'requested': 4, 'available': 3},
+        ])
+        self.assertEqual(self.stock(), 3)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_decrement_is_conditional_on_current_stock(self):
+        self.assertEqual(self.checkout(2).status_code, 200)
+        # A second till still holding the old count cannot take the same units
+        self.assertEqual(self.checkout(2).status_code, 409)
+        self.assertEqual(self.checkout(1).status_code, 200)
+        self.assertEqual(self.stock(), 0)
+        self.assertEqual(Sale.objects.count(), 2)
+
+
+class IdempotentCheckoutTests(CheckoutMixin, TestCase):
+    def test_retry_returns_the_original_sale_without_a_second_decrement(self):
+        self.assertEqual(self.checkout(2, **{'Idempotency-Key': 'till-1-0001'}).status_code, 200)
+        self.assertEqual(self.checkout(2, **{'Idempotency-Key': 'till-1-0001'}).status_code, 200)
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(self.stock(), 1)
+
+        sale = Sale.objects.get()
+        with transaction.atomic():
+            replayed, created = record_sale_once(
+                'till-1-0001', customer_id=self.customer.pk,
+                lines=[{'id': self.item.pk, 'price': '2', 'quantity': 1}],
+                sub_total=Decimal('2'), tax_percentage=Decimal('0'), amount_paid=Decimal('2'),
+            )
+        self.assertEqual((replayed.pk, created), (sale.pk, False))
+        self.assertEqual(self.stock(), 1)
+
+    def test_bad_input_gets_a_fixed_message(self):
+        response = self.client.post(reverse('transactions:sale-create'), {
+            'customer': self.customer.pk,
+            'items[0][id]': self.item.pk,
+            'items[0][price]': '2',
+            'items[0][quantity]': 'two',
+        }, headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid or missing fields')
+        self.assertEqual(self.stock(), 3)
+
+
+class ReceivePurchaseTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Drinks')
+        self.vendor = Vendor.objects.create(name='Water Co')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=0, price=1, vendor=self.vendor
+        )
+        self.admin = User.objects.create_superuser('admin', password='password')
+
+    def purchase(self, quantity, **fields):
+        # Purchase slugs are not made unique automatically
+        slug = f'water-{Purchase.objects.count()}'
+        return Purchase.objects.create(
+            item=self.item, vendor=self.vendor, quantity=quantity, unit_price=Decimal('1'), slug=slug, **fields
+        )
+
+    def stock(self):
+        self.item.refresh_from_db()
+        return self.item.quantity
+
+    def test_delivered_purchase_adds_stock_once(self):
+        purchase = self.purchase(5)
+        self.assertEqual(self.stock(), 0)
+        purchase.status = 'D'
+        purchase.save()
+        self.assertEqual(self.stock(), 5)
+        # Saving the delivered purchase again (e.g. editing its notes) adds nothing
+        purchase.save()
+        Purchase.objects.get(pk=purchase.pk).save()
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(StockMovement.objects.filter(purchase=purchase).count(), 1)
+
+    def test_bulk_receive_is_idempotent(self):
+        purchases = [self.purchase(2), self.purchase(3)]
+        url = reverse('transactions:purchase-receive')
+        self.client.force_login(self.admin)
+        body = json.dumps({'purchases': [purchase.pk for purchase in purchases]})
+        first = self.client.post(url, body, content_type='application/json').json()
+        second = self.client.post(url, body, content_type='application/json').json()
+        self.assertEqual(sorted(first['received']), sorted(purchase.pk for purchase in purchases))
+        self.assertEqual(second['received'], [])
+        self.assertEqual(self.stock(), 5)
+
+    def test_bulk_receive_needs_an_admin(self):
+        purchase = self.purchase(2)
+        self.client.force_login(User.objects.create_user('clerk', password='password'))
+        response = self.client.post(reverse('transactions:purchase-receive'), {'purchases': [purchase.pk]})
+        self.assertEqual(response.status_code, 403)
+        purchase.refresh_from_db()
+        self.assertIsNone(purchase.received_at)
+        self.assertEqual(self.stock(), 0)
+
+
+class QueuedTaskTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Drinks')
+        self.item = Item.objects.create(
+            name='Water', description='Still', category=category, quantity=20, price=1
+        )
+
+    def test_low_stock_counts_the_shards_of_striped_items(self):
+        enable_stock_sharding(self.item.pk, shards=2)
+        StockLedger().add(self.item.pk, -18, StockMovement.Reason.ADJUSTMENT).commit()
+        # Item.quantity still says 20 until the next fold
+        self.assertEqual(Item.objects.get(pk=self.item.pk).quantity, 20)
+        with self.assertLogs('transactions.tasks', 'WARNING') as logs:
+            check_low_stock(item_ids=[self.item.pk])
+        self.assertEqual(logs.output, ['WARNING:transactions.tasks:Low stock: Water has 2 left'])
+
+    def test_a_worker_that_lost_its_lease_cannot_complete_the_task(self):
+        QueuedTask.objects.create(name='check_low_stock', payload={'item_ids': [self.item.pk]})
+        [stale] = claim_tasks(1, lease_seconds=60)
+        # The lease runs out and another worker claims the task
+        QueuedTask.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [current] = claim_tasks(1, lease_seconds=60)
+        self.assertNotEqual(stale.lease_token, current.lease_token)
+
+        with self.assertLogs('transactions.tasks', 'WARNING'):
+            self.assertFalse(run_task(stale))
+        task = QueuedTask.objects.get()
+        self.assertEqual((task.status, task.lease_token), (QueuedTask.Status.PENDING, current.lease_token))
 
-# Create your tests here.
+        self.assertTrue(run_task(current))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.lease_token), (QueuedTask.Status.DONE, None))
+        self.assertFalse(claim_tasks(1, lease_seconds=60))
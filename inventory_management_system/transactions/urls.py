@@ -4,8 +4,9 @@ from django.urls import path
 # Local app imports
 from .views import (
     PurchaseListView, PurchaseDetailView, PurchaseCreateView,
-    PurchaseUpdateView, PurchaseDeleteView, SaleListView,
-    SaleDetailView, SaleCreateView, SaleDeleteView,
+    PurchaseUpdateView, PurchaseDeleteView, purchase_receive, SaleListView,
+    SaleDetailView, SaleCreateView, SaleDeleteView, sale_batch_create,
+    stock_reserve, stock_release,
     export_sales_to_excel, export_purchases_to_excel
 )
 
@@ -20,12 +21,18 @@ urlpatterns = [
     path('new-purchase/', PurchaseCreateView.as_view(), name='purchase-create'),
     path('purchase/<int:pk>/update/', PurchaseUpdateView.as_view(), name='purchase-update'),
     path('purchase/<int:pk>/delete/', PurchaseDeleteView.as_view(), name='purchase-delete'),
+    path('purchases/receive/', purchase_receive, name='purchase-receive'),
 
     # Sale URLs
     path('sales/', SaleListView.as_view(), name='sale-list'),
     path('sale/<int:pk>/', SaleDetailView.as_view(), name='sale-detail'),
     path('new-sale/', SaleCreateView.as_view(), name='sale-create'),
     path('sale/<int:pk>/delete/', SaleDeleteView.as_view(), name='sale-delete'),
+    path('sales/batch/', sale_batch_create, name='sale-batch-create'),
+
+    # Cart stock reservations
+    path('reservations/', stock_reserve, name='stock-reserve'),
+    path('reservations/release/', stock_release, name='stock-release'),
 
     # Sales and purchases export
     path('sales/export/', export_sales_to_excel, name='sale-export'),
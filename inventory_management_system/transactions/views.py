@@ -1,19 +1,26 @@
 # Standard library imports
+import json
 import logging
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from io import BytesIO
 
 # Django core imports
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.http import JsonResponse, HttpResponse
 from django.urls import reverse, reverse_lazy
-from django.db import transaction
+from django.shortcuts import redirect
+from django.db import DatabaseError, transaction
 from django.utils.timezone import localtime
+from django.views.decorators.http import require_http_methods
 
 # Class-based views
 from django.views.generic import DetailView, ListView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 
 # Authentication and permissions
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin
 
 # Messaging framework
 from django.contrib import messages
@@ -23,9 +30,18 @@ from openpyxl import Workbook
 
 # Local app imports
 from store.models import Item
-from accounts.models import Customer
-from .models import Sale, Purchase, SaleDetail
+from store.cache import get_or_compute
+from store.conditional import ConditionalGetMixin
+from store.pagination import CursorPaginationMixin
+from store.versions import CATALOG, get_versions
+from accounts.permissions import AdminRequiredMixin, get_access
+from accounts.models import Customer, Vendor
+from .models import Sale, SaleDetail, Purchase
 from .forms import PurchaseForm, SaleForm
+from .services import (
+    InsufficientStockError, commit_stock, record_sale_once, write_sale_lines,
+    reserve_stock, release_reservations, receive_purchases,
+)
 
 
 # Create your views here.
@@ -33,57 +49,74 @@ from .forms import PurchaseForm, SaleForm
 
 logger = logging.getLogger(__name__)
 
+# Offline POS sync: sales committed per transaction, and per request
+SALE_BATCH_CHUNK_SIZE = 100
+SALE_BATCH_MAX_SALES = 1000
+
 
 ####################################################################################
 
 ####################################################################################
 
+def _sales_report():
+    """Build the sales report workbook and return it as .xlsx bytes."""
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Sales Report'
+    
+    # Define headers and column widths
+    headers = [
+        ('ID', 8),
+        ('Date', 20),
+        ('Customer', 25),
+        ('Sub Total', 15),
+        ('Grand Total', 15),
+        ('Tax Amount', 15),
+        ('Tax Percentage', 15),
+        ('Amount Paid', 15),
+        ('Amount Change', 15)
+    ]
+    
+    # Write headers and set column widths
+    worksheet.append([header[0] for header in headers])
+    for col_num, (_, width) in enumerate(headers, 1):
+        worksheet.column_dimensions[chr(64 + col_num)].width = width
+    
+    # Fetch data - FIXED QUERY
+    sales = Sale.objects.select_related('customer').all()
+    
+    for sale in sales:
+        worksheet.append([
+            sale.id,
+            localtime(sale.date_added).replace(tzinfo=None),
+            str(sale.customer),  # This will use customer's __str__ method
+            sale.sub_total,
+            sale.grand_total,
+            sale.tax_amount,
+            sale.tax_percentage,
+            sale.amount_paid,
+            sale.amount_change
+        ])
+
+    content = BytesIO()
+    workbook.save(content)
+    return content.getvalue()
+
+
 def export_sales_to_excel(request):
     """Export sales data to Excel with improved error handling and performance"""
     try:
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Sales Report'
-        
-        # Define headers and column widths
-        headers = [
-            ('ID', 8),
-            ('Date', 20),
-            ('Customer', 25),
-            ('Sub Total', 15),
-            ('Grand Total', 15),
-            ('Tax Amount', 15),
-            ('Tax Percentage', 15),
-            ('Amount Paid', 15),
-            ('Amount Change', 15)
-        ]
-        
-        # Write headers and set column widths
-        worksheet.append([header[0] for header in headers])
-        for col_num, (_, width) in enumerate(headers, 1):
-            worksheet.column_dimensions[chr(64 + col_num)].width = width
-        
-        # Fetch data - FIXED QUERY
-        sales = Sale.objects.select_related('customer').all()
-        
-        for sale in sales:
-            worksheet.append([
-                sale.id,
-                localtime(sale.date_added).replace(tzinfo=None),
-                str(sale.customer),  # This will use customer's __str__ method
-                sale.sub_total,
-                sale.grand_total,
-                sale.tax_amount,
-                sale.tax_percentage,
-                sale.amount_paid,
-                sale.amount_change
-            ])
-        
+        # Rebuilt once per change to the sales, however many people export
+        content = get_or_compute(
+            f"report:sales:{get_versions(Sale, Customer)}",
+            _sales_report,
+            settings.REPORT_CACHE_TIMEOUT,
+        )
         response = HttpResponse(
+            content,
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             headers={'Content-Disposition': 'attachment; filename="sales_report.xlsx"'},
         )
-        workbook.save(response)
         return response
         
     except Exception as e:
@@ -91,54 +124,65 @@ def export_sales_to_excel(request):
         return HttpResponse("Error generating report. Please try again later.", status=500)
 
 
+def _purchases_report():
+    """Build the purchases report workbook and return it as .xlsx bytes."""
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Purchases Report'
+    
+    headers = [
+        ('ID', 8),
+        ('Item', 25),
+        ('Vendor', 25),
+        ('Order Date', 20),
+        ('Delivery Date', 20),
+        ('Quantity', 10),
+        ('Status', 15),
+        ('Unit Price', 15),
+        ('Total Value', 15)
+    ]
+    
+    worksheet.append([header[0] for header in headers])
+    for col_num, (_, width) in enumerate(headers, 1):
+        worksheet.column_dimensions[chr(64 + col_num)].width = width
+    
+    purchases = Purchase.objects.select_related('item', 'vendor').only(
+        'id', 'item__name', 'vendor__name',
+        'order_date', 'delivery_date', 'quantity',
+        'status', 'unit_price', 'total_cost'
+    )
+    
+    for purchase in purchases:
+        worksheet.append([
+            purchase.id,
+            purchase.item.name,
+            purchase.vendor.name,
+            localtime(purchase.order_date).replace(tzinfo=None),
+            localtime(purchase.delivery_date).replace(tzinfo=None) if purchase.delivery_date else '',
+            purchase.quantity,
+            purchase.get_status_display(),
+            purchase.unit_price,
+            purchase.total_cost
+        ])
+
+    content = BytesIO()
+    workbook.save(content)
+    return content.getvalue()
+
+
 def export_purchases_to_excel(request):
     """Export purchase data to Excel with improved structure"""
     try:
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Purchases Report'
-        
-        headers = [
-            ('ID', 8),
-            ('Item', 25),
-            ('Vendor', 25),
-            ('Order Date', 20),
-            ('Delivery Date', 20),
-            ('Quantity', 10),
-            ('Status', 15),
-            ('Unit Price', 15),
-            ('Total Value', 15)
-        ]
-        
-        worksheet.append([header[0] for header in headers])
-        for col_num, (_, width) in enumerate(headers, 1):
-            worksheet.column_dimensions[chr(64 + col_num)].width = width
-        
-        purchases = Purchase.objects.select_related('item', 'vendor').only(
-            'id', 'item__name', 'vendor__name',
-            'order_date', 'delivery_date', 'quantity',
-            'status', 'unit_price', 'total_cost'
+        content = get_or_compute(
+            f"report:purchases:{get_versions(Purchase, CATALOG, Vendor)}",
+            _purchases_report,
+            settings.REPORT_CACHE_TIMEOUT,
         )
-        
-        for purchase in purchases:
-            worksheet.append([
-                purchase.id,
-                purchase.item.name,
-                purchase.vendor.name,
-                localtime(purchase.order_date).replace(tzinfo=None),
-                localtime(purchase.delivery_date).replace(tzinfo=None) if purchase.delivery_date else '',
-                purchase.quantity,
-                purchase.get_status_display(),
-                purchase.unit_price,
-                purchase.total_cost
-            ])
-
-        
         response = HttpResponse(
+            content,
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             headers={'Content-Disposition': 'attachment; filename="purchases_report.xlsx"'},
         )
-        workbook.save(response)
         return response
         
     except Exception as e:
@@ -158,83 +202,77 @@ class SaleCreateView(LoginRequiredMixin, CreateView):
 
 
     def get_context_data(self, **kwargs):
-        """Add products to the template context"""
+        """
+        Add the catalog version; the page loads the products themselves
+        from the cached catalog (store/catalog.py) only when it changed.
+        """
         context = super().get_context_data(**kwargs)
-        context['products'] = Item.objects.all()  # This makes products available in template
+        context['catalog_version'] = get_versions(CATALOG)
         return context
     
     def post(self, request, *args, **kwargs):
         if not request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return super().post(request, *args, **kwargs)
         
-        try:
-            # Get and validate customer
-            customer_id = request.POST.get('customer')
-            if not customer_id:
-                return JsonResponse({'error': 'Customer is required'}, status=400)
-
-            # Convert to Decimal safely
-            try:
-                sub_total = Decimal(request.POST.get('sub_total', '0'))
-                tax_percentage = Decimal(request.POST.get('tax_percentage', '0'))
-                amount_paid = Decimal(request.POST.get('amount_paid', '0'))
-            except (ValueError, TypeError) as e:
-                return JsonResponse({'error': 'Invalid numeric input'}, status=400)
-
-            # Get items
-            items = []
-            i = 0
-            while f'items[{i}][id]' in request.POST:
-                items.append({
-                    'id': request.POST[f'items[{i}][id]'],
-                    'price': Decimal(request.POST[f'items[{i}][price]']),
-                    'quantity': int(request.POST[f'items[{i}][quantity]'])
-                })
-                i += 1
-
-            if not items:
-                return JsonResponse({'error': 'No items in sale'}, status=400)
+        # Get and validate customer
+        if not request.POST.get('customer'):
+            return JsonResponse({'error': 'Customer is required'}, status=400)
+
+        # Collect the item lines, then check them like a batch sale
+        data = {
+            'customer': request.POST['customer'],
+            'sub_total': request.POST.get('sub_total', '0'),
+            'tax_percentage': request.POST.get('tax_percentage', '0'),
+            'amount_paid': request.POST.get('amount_paid', '0'),
+            'items': [],
+        }
+        i = 0
+        while f'items[{i}][id]' in request.POST:
+            data['items'].append({
+                field: request.POST.get(f'items[{i}][{field}]') for field in ('id', 'price', 'quantity')
+            })
+            i += 1
+
+        # Retries of a timed-out checkout reuse the key and get the
+        # original sale back instead of a second one
+        idempotency_key = (
+            request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key')
+        )
+        if idempotency_key and len(idempotency_key) > 64:
+            return JsonResponse({'error': 'Idempotency key too long'}, status=400)
 
+        sale, error = _parse_batch_sale(data)
+        if error:
+            return JsonResponse({'success': False, 'error': error}, status=400)
+        if not Customer.objects.filter(pk=sale['customer_id']).exists():
+            return JsonResponse({'success': False, 'error': 'Unknown customer'}, status=400)
+
+        try:
             with transaction.atomic():
-                # Calculate values FIRST
-                tax_amount = sub_total * (tax_percentage / Decimal('100'))
-                grand_total = sub_total + tax_amount
-                amount_change = amount_paid - grand_total
-
-                # Create sale with ALL values
-                sale = Sale.objects.create(
-                    customer_id=customer_id,
-                    sub_total=sub_total,
-                    tax_percentage=tax_percentage,
-                    tax_amount=tax_amount,
-                    grand_total=grand_total,
-                    amount_paid=amount_paid,
-                    amount_change=amount_change if amount_change > 0 else Decimal('0')
+                record_sale_once(
+                    idempotency_key or None,
+                    customer_id=sale['customer_id'],
+                    lines=sale['lines'],
+                    sub_total=sale['sub_total'],
+                    tax_percentage=sale['tax_percentage'],
+                    amount_paid=sale['amount_paid'],
                 )
-                
-                # Add items
-                for item in items:
-                    item_obj = Item.objects.get(id=item['id'])
-                    SaleDetail.objects.create(
-                        sale=sale,
-                        item=item_obj,
-                        price=item['price'],
-                        quantity=item['quantity'],
-                        total_detail=item['price'] * item['quantity']
-                    )
-                    # Update stock
-                    item_obj.quantity -= item['quantity']
-                    item_obj.save()
-                    
-            return JsonResponse({'success': True,
-                                 'redirect_url': reverse('transactions:sale-list')})
-            
+                # The cart's holds become the sale itself
+                if idempotency_key:
+                    release_reservations(idempotency_key)
+
+        except InsufficientStockError as e:
+            return JsonResponse(e.as_json(), status=409)
+
         except Exception as e:
-            # Only show errors when something actually fails
+            logger.error(f"Failed to record sale: {str(e)}", exc_info=True)
             return JsonResponse({
                 'success': False,
-                'error': str(e)  # Show what went wrong
-            }, status=400)
+                'error': 'The sale could not be recorded'
+            }, status=500)
+
+        return JsonResponse({'success': True,
+                             'redirect_url': reverse('transactions:sale-list')})
 
    
     def create_sale(self, data):
@@ -258,25 +296,253 @@ class SaleCreateView(LoginRequiredMixin, CreateView):
         for item in items:
             if not all(k in item for k in ["id", "price", "quantity", "total_item"]):
                 raise ValueError("Item missing required fields")
-                
-            item_instance = Item.objects.get(id=int(item["id"]))
-            if item_instance.quantity < int(item["quantity"]):
-                raise ValueError(f"Insufficient stock for {item_instance.name}")
-                
-            SaleDetail.objects.create(
-                sale=sale,
-                item=item_instance,
-                price=float(item["price"]),
-                quantity=int(item["quantity"]),
-                total_detail=float(item["total_item"])
-            )
-            
-            # Update inventory
-            item_instance.quantity -= int(item["quantity"])
-            item_instance.save()
 
+        # Update inventory; raises InsufficientStockError on any shortage
+        commit_stock(items, sale=sale)
+        write_sale_lines(sale, items)
+
+
+def _parse_quantity(value):
+    """A whole number of units; 1.7 is an error, not 1."""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError
+    return int(value)
+
+
+def _field_error(model, values, derived=False):
+    """
+    Check `values` (field name -> value) against the fields of `model` that
+    will store them: digits, decimal places and range. Derived amounts are
+    rounded to the field's decimal places first, as saving them would.
+    Returns an error message, or None.
+    """
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        try:
+            if derived:
+                value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+            field.run_validators(value)
+        except InvalidOperation:
+            return f'{name} is out of range'
+        except ValidationError as e:
+            return f'{name}: {" ".join(e.messages)}'
+    return None
+
+
+def _parse_batch_sale(data):
+    """Validate one sale of a batch payload. Returns (sale, error)."""
+    if not isinstance(data, dict):
+        return None, 'Sale must be an object'
+    try:
+        customer_id = int(data['customer'])
+        tax_percentage = Decimal(str(data.get('tax_percentage', '0')))
+        amount_paid = Decimal(str(data.get('amount_paid', '0')))
+        lines = [
+            {
+                'id': int(line['id']),
+                'price': Decimal(str(line['price'])),
+                'quantity': _parse_quantity(line['quantity']),
+            }
+            for line in data['items']
+        ]
+        # NaN and Infinity parse as Decimals but cannot be compared or stored
+        if not all(value.is_finite() for value in (
+            tax_percentage, amount_paid, *(line['price'] for line in lines)
+        )):
+            raise ValueError
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        return None, 'Invalid or missing fields'
+
+    if not lines:
+        return None, 'No items in sale'
+    if any(line['quantity'] < 1 or line['price'] <= 0 for line in lines):
+        return None, 'Line quantities and prices must be positive'
+    if tax_percentage < 0 or amount_paid < 0:
+        return None, 'Amounts cannot be negative'
+
+    idempotency_key = data.get('idempotency_key')
+    if idempotency_key is not None and (
+        not isinstance(idempotency_key, str) or len(idempotency_key) > 64
+    ):
+        return None, 'Idempotency key must be a string of at most 64 characters'
+
+    if 'sub_total' in data:
+        try:
+            sub_total = Decimal(str(data['sub_total']))
+        except InvalidOperation:
+            return None, 'Invalid or missing fields'
+        if not sub_total.is_finite():
+            return None, 'Invalid or missing fields'
+        if sub_total < 0:
+            return None, 'Amounts cannot be negative'
+    else:
+        sub_total = sum((line['price'] * line['quantity'] for line in lines), Decimal('0'))
+
+    # Everything record_sale will store must fit its column
+    tax_amount = sub_total * (tax_percentage / Decimal('100'))
+    error = (
+        _field_error(Sale, {'tax_percentage': tax_percentage, 'amount_paid': amount_paid})
+        or _field_error(Sale, {'sub_total': sub_total}, derived='sub_total' not in data)
+        or _field_error(Sale, {'tax_amount': tax_amount, 'grand_total': sub_total + tax_amount}, derived=True)
+    )
+    for line in lines:
+        if error:
+            break
+        error = (
+            _field_error(SaleDetail, {'price': line['price'], 'quantity': line['quantity']})
+            or _field_error(SaleDetail, {'total_detail': line['price'] * line['quantity']}, derived=True)
+        )
+    if error:
+        return None, error
+
+    return {
+        'customer_id': customer_id,
+        'lines': lines,
+        'sub_total': sub_total,
+        'tax_percentage': tax_percentage,
+        'amount_paid': amount_paid,
+        'idempotency_key': idempotency_key,
+    }, None
+
+
+@require_http_methods(["POST"])
+@login_required
+def sale_batch_create(request):
+    """
+    JSON endpoint for replaying sales queued by offline POS terminals.
+
+    Expects {"sales": [{"customer", "tax_percentage", "amount_paid",
+    "sub_total" (optional), "items": [{"id", "price", "quantity"}]}]}.
+
+    Every sale is validated before anything is written, and all referenced
+    customers and items are resolved with one query each. Sales are then
+    committed in chunks of SALE_BATCH_CHUNK_SIZE per transaction, each in
+    its own savepoint so one short-stocked sale (or one the database
+    rejects) does not undo the others.
+    A sale may carry an "idempotency_key"; replaying a batch after a lost
+    response reports the already recorded sales with "replayed": true.
+    Returns one result per sale, in request order.
+    """
+    try:
+        payload = json.loads(request.body)
+        sales = payload['sales']
+        if not isinstance(sales, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON object with a "sales" list'}, status=400)
+
+    if len(sales) > SALE_BATCH_MAX_SALES:
+        return JsonResponse(
+            {'error': f'At most {SALE_BATCH_MAX_SALES} sales per request'}, status=400
+        )
+
+    results = [None] * len(sales)
+    parsed = []
+    for index, data in enumerate(sales):
+        sale, error = _parse_batch_sale(data)
+        if error:
+            results[index] = {'index': index, 'success': False, 'error': error}
+        else:
+            parsed.append((index, sale))
+
+    # Resolve every referenced customer and item up front
+    customer_ids = set(
+        Customer.objects.filter(
+            pk__in={sale['customer_id'] for _, sale in parsed}
+        ).values_list('pk', flat=True)
+    )
+    items = Item.objects.only('id', 'name', 'quantity', 'stock_sharded').in_bulk(
+        list({line['id'] for _, sale in parsed for line in sale['lines']})
+    )
+
+    valid = []
+    for index, sale in parsed:
+        missing = [line['id'] for line in sale['lines'] if line['id'] not in items]
+        if sale['customer_id'] not in customer_ids:
+            results[index] = {'index': index, 'success': False, 'error': 'Unknown customer'}
+        elif missing:
+            results[index] = {
+                'index': index, 'success': False,
+                'error': f"Unknown items: {', '.join(map(str, missing))}"
+            }
+        else:
+            valid.append((index, sale))
+
+    for start in range(0, len(valid), SALE_BATCH_CHUNK_SIZE):
+        with transaction.atomic():
+            for index, data in valid[start:start + SALE_BATCH_CHUNK_SIZE]:
+                try:
+                    with transaction.atomic():
+                        sale, created = record_sale_once(items=items, **data)
+                    results[index] = {'index': index, 'success': True, 'sale_id': sale.pk}
+                    if not created:
+                        results[index]['replayed'] = True
+                except InsufficientStockError as e:
+                    results[index] = {'index': index, **e.as_json()}
+                except DatabaseError as e:
+                    # The savepoint is rolled back; the rest of the chunk goes on
+                    logger.error(f"Batch sale {index} could not be stored: {str(e)}", exc_info=True)
+                    results[index] = {'index': index, 'success': False, 'error': 'Sale could not be stored'}
+
+    return JsonResponse({
+        'created': sum(1 for result in results if result['success'] and not result.get('replayed')),
+        'replayed': sum(1 for result in results if result.get('replayed')),
+        'failed': sum(1 for result in results if not result['success']),
+        'results': results,
+    })
+
+
+@require_http_methods(["POST"])
+@login_required
+def stock_reserve(request):
+    """
+    AJAX endpoint holding stock for an open cart on the sale screen.
+
+    Expects 'cart' (the cart key), 'item' and 'quantity' (the new total for
+    that item in the cart, 0 to release). Responds with what is left to sell,
+    or 409 with the per-item error when the stock is held elsewhere.
+    """
+    if not request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'error': 'AJAX requests only'}, status=400)
+
+    cart_key = request.POST.get('cart', '')
+    try:
+        item_id = int(request.POST['item'])
+        quantity = int(request.POST['quantity'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Item and quantity are required'}, status=400)
+    if not cart_key or len(cart_key) > 64 or quantity < 0:
+        return JsonResponse({'error': 'Invalid reservation'}, status=400)
+
+    try:
+        reservation = reserve_stock(cart_key, item_id, quantity)
+    except Item.DoesNotExist:
+        return JsonResponse({'error': 'Item not found'}, status=404)
+    except InsufficientStockError as e:
+        return JsonResponse(e.as_json(), status=409)
+
+    return JsonResponse({'success': True, **reservation})
 
-class SaleDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+
+@require_http_methods(["POST"])
+@login_required
+def stock_release(request):
+    """
+    Drop the holds of a cart (or of one item in it).
+
+    Also accepts navigator.sendBeacon() requests sent when the sale screen
+    is closed, so it does not require the AJAX header.
+    """
+    cart_key = request.POST.get('cart', '')
+    if not cart_key:
+        return JsonResponse({'error': 'Cart is required'}, status=400)
+
+    item_id = request.POST.get('item')
+    release_reservations(cart_key, int(item_id) if item_id and item_id.isdigit() else None)
+    return JsonResponse({'success': True})
+
+
+class SaleDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     """Delete a sale (superusers and admins only)."""
     model = Sale
     template_name = "transactions/sale_delete.html"
@@ -285,16 +551,7 @@ class SaleDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     
     def get_success_url(self):
         return reverse("transactions:sale-list")
-    
-    def test_func(self):
-        """Allow superusers and admins to delete sales"""
-        user = self.request.user
-        return (
-            user.is_superuser or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
-    
-    
+
     def form_valid(self, form):
         """Handle successful deletion with rich message"""
         sale = self.get_object()
@@ -314,10 +571,11 @@ class SaleDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return context
     
 
-class SaleListView(LoginRequiredMixin, ListView):
-    """Display paginated list of sales, newest first."""
+class SaleListView(LoginRequiredMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
+    """Display paginated list of sales, newest first (cursor pages on the date_added index)."""
     model = Sale
     template_name = "transactions/sale_list.html"
+    etag_models = ('transactions.Sale', 'accounts.Customer')
     context_object_name = "sales"
     paginate_by = 10
     ordering = ['-date_added']  # Changed to newest first (more common for sales)
@@ -356,17 +614,9 @@ class PurchaseCreateView(LoginRequiredMixin, PurchaseCreateUpdateMixin, CreateVi
     # All shared functionality comes from the mixin
 
 
-class PurchaseUpdateView(LoginRequiredMixin, UserPassesTestMixin, PurchaseCreateUpdateMixin, UpdateView):
+class PurchaseUpdateView(LoginRequiredMixin, AdminRequiredMixin, PurchaseCreateUpdateMixin, UpdateView):
     """Update existing purchase records (superusers and admins)"""
-    
-    def test_func(self):
-        """Allow superusers and admins to update purchases"""
-        user = self.request.user
-        return (
-            user.is_superuser or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
-    
+
     def form_valid(self, form):
         """Handle successful update with rich message"""
         response = super().form_valid(form)
@@ -377,21 +627,13 @@ class PurchaseUpdateView(LoginRequiredMixin, UserPassesTestMixin, PurchaseCreate
         )
         return response
 
-class PurchaseDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class PurchaseDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     """Delete purchase records (superusers and admins)"""
     model = Purchase
     template_name = "transactions/purchase_confirm_delete.html"
     context_object_name = "purchase"
     success_url = reverse_lazy("transactions:purchase-list")
 
-    def test_func(self):
-        """Allow superusers and admins to delete purchases"""
-        user = self.request.user
-        return (
-            user.is_superuser or
-            (hasattr(user, 'profile') and user.profile.role == 'AD')
-        )
-    
     def form_valid(self, form):
         """Handle successful deletion with rich message"""
         purchase = self.get_object()
@@ -410,10 +652,49 @@ class PurchaseDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         context['warning_message'] = "This action cannot be undone!"
         return context
 
-class PurchaseListView(LoginRequiredMixin, ListView):
-    """List all purchases with pagination."""
+@require_http_methods(["POST"])
+@login_required
+def purchase_receive(request):
+    """
+    Receive many purchases at once (e.g. every line of one delivery).
+
+    Accepts the ids as repeated 'purchases' form fields, or as
+    {"purchases": [...]} JSON. All of them are received in one transaction;
+    purchases that were already received or are cancelled are skipped.
+    Only superusers and admins may receive, as for editing a purchase.
+    """
+    if not get_access(request).is_admin:
+        raise PermissionDenied("Only admins can receive purchases")
+
+    if request.content_type == 'application/json':
+        try:
+            ids = [int(pk) for pk in json.loads(request.body)['purchases']]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Expected {"purchases": [ids]}'}, status=400)
+    else:
+        ids = [int(pk) for pk in request.POST.getlist('purchases') if pk.isdigit()]
+
+    received = receive_purchases(ids)
+
+    if request.content_type == 'application/json':
+        return JsonResponse({
+            'received': received,
+            'skipped': sorted(set(ids) - set(received)),
+        })
+
+    messages.success(
+        request,
+        f"{len(received)} purchase(s) received into stock.",
+        extra_tags='alert-success'
+    )
+    return redirect('transactions:purchase-list')
+
+
+class PurchaseListView(LoginRequiredMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
+    """List all purchases with pagination (cursor pages on the order_date index)."""
     model = Purchase
     template_name = "transactions/purchase_list.html"  # Singular for consistency
+    etag_models = ('transactions.Purchase', 'store.ItemCatalog', 'accounts.Vendor')
     context_object_name = "purchases"
     paginate_by = 10
     ordering = ['-order_date']  # Added ordering (newest first by default)